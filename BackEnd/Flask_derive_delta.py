@@ -1,76 +1,213 @@
-#import os to handle file paths, pandas to handle structured data, re to extract allele frequency data, matplotlib for plotting, 
-#seaborn for statistical plots, io for in memory files, base64 to encode plots in website and sqlite3 to connect to database for queries
+#import os and sys to handle file paths, pandas to handle structured data, matplotlib for plotting, 
+#seaborn for statistical plots, io for in memory files, base64 to encode plots in website, db_access to connect to database for queries
+#threading to rebuild the cached data without blocking requests, hashlib to fingerprint the database and weakref to track the caches
 import os
+import sys
 import pandas as pd
-import re
 import matplotlib.pyplot as plt
 import seaborn as sns
 import io
 import base64
-import sqlite3
+import threading
+import hashlib
+import logging
+import weakref
 
-# connect to the database
-db_path = os.path.join(os.path.abspath(os.path.dirname(__file__)), "instance", "genetics.db")
-conn = sqlite3.connect(db_path)#open connection to SQLite database
+# the allele frequency parser and the per-chromosome runner are shared with the SummaryStatsCalculations scripts
+sys.path.append(os.path.join(os.path.abspath(os.path.dirname(__file__)), "..", "SummaryStatsCalculations"))
+from allele_freq import derive_daf_delta
+from parallel import CHROMOSOME_ORDER, run_by_chromosome, report_timings
+from chromosome_stats import chromosome_table
+from db_access import connect_read_only, read_sql
 
-# load SNP data from database
-query = "SELECT * FROM snp"
-df = pd.read_sql_query(query, conn)
-conn.close()
+# failed background rebuilds are reported here, the requests keep the previous snapshot
+logger = logging.getLogger(__name__)
 
-# clean column
-df.columns = [col.strip().replace(" ", "_").lower() for col in df.columns]
-#extract allele frequency data
-def extract_frequency(allele_freq_str, allele):
+# number of processes used to derive DAF and delta_af, 1 keeps the work in the web process
+workers = int(os.environ.get("SUMMARY_STATS_WORKERS", "1"))
+
+# Define the correct order for chromosomes
+chromosome_order = CHROMOSOME_ORDER
+
+# long lived connections (one per database path) used only to read PRAGMA data_version, which changes when another connection commits
+_version_conns = {}
+_version_lock = threading.Lock()
+
+#function to fingerprint the database files, the same in every process for the same data
+def get_data_fingerprint(db_path):
+    """Returns a short hex digest of the modification time and size of the database and its WAL file."""
+    stats = []
+    for path in (db_path, db_path + "-wal"):
+        try:
+            stat = os.stat(path)
+            stats.append(f"{stat.st_mtime_ns}:{stat.st_size}")
+        except FileNotFoundError:
+            stats.append("-")
+    return hashlib.sha1("|".join(stats).encode()).hexdigest()[:16]
+
+#function to tell whether the database changed
+def get_data_version(db_path):
     """
-    Extracts the frequency of a given allele from a formatted string like 'A: 0.802, G: 0.198'.
-    Returns None if not found.
+    Returns (data_version, fingerprint), which changes whenever the database at db_path is modified:
+    PRAGMA data_version of a long lived connection plus get_data_fingerprint(db_path).
+    Only the fingerprint is comparable between processes.
     """
-    try:
-        match = re.findall(rf"{allele}:\s*([\d\.]+)", str(allele_freq_str))
-        return float(match[0]) if match else None
-    except Exception as e:
-        print(f"Error extracting frequency: {e}")
-        return None
-#function to compute derived allele frequency 
-def calculate_daf(row):
+    with _version_lock:
+        conn = _version_conns.get(db_path)
+        if conn is None:
+            conn = _version_conns[db_path] = connect_read_only(db_path, check_same_thread=False)
+        data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+    return (data_version, get_data_fingerprint(db_path))
+
+#function to close the data version connections, e.g. before forking worker processes
+def close_version_connection():
+    with _version_lock:
+        for conn in _version_conns.values():
+            conn.close()
+        _version_conns.clear()
+
+#function to load SNP data from the database and derive the summary statistics
+def load_processed_data(db_path):
+    """Reads the snp table of db_path and adds daf_beb, daf_pjl, delta_af and an ordered chromosome column."""
+    df = read_sql("SELECT * FROM snp", path=db_path)#pooled read-only connection to the SQLite database
+
+    # clean column
+    df.columns = [col.strip().replace(" ", "_").lower() for col in df.columns]
+
+    # Compute the DAF for beb and pjl (risk allele is the derived allele) and the absolute difference (delta_af),
+    # one chromosome per process when more than one worker is configured
+    if workers > 1:
+        df, timings = run_by_chromosome(df, derive_daf_delta, workers)
+        report_timings(timings)
+    else:
+        df = derive_daf_delta(df)
+
+    df["chromosome"] = df["chromosome"].astype(str).str.strip()
+    df["chromosome"] = pd.Categorical(df["chromosome"], categories=chromosome_order, ordered=True)
+    return df
+
+class ProcessedDataCache:
     """
-    Computes the Derived Allele Frequency (DAF) for beb and pjl populations.
-    Returns daf_beb and daf_pjl.
+    Holds the processed DataFrame together with the data version it was built from. The first
+    call builds it; after that a change in the data version starts a rebuild in a background
+    thread and readers keep getting the previous snapshot until the new one is ready. A rebuild
+    that fails is logged and not retried until the data version changes again.
+    Snapshots are shared between requests and must be treated as read-only.
     """
-    try:
-        derived_allele = row["risk_allele"]
-        beb_daf = extract_frequency(row["beb"], derived_allele)
-        pjl_daf = extract_frequency(row["pjl"], derived_allele)
-        return beb_daf, pjl_daf
-    except Exception as e:
-        print(f"Error processing SNP {row.get('snp_id', 'Unknown')}: {e}")
-        return None, None
-
-# Apply the DAF calculation to each row
-df[["daf_beb", "daf_pjl"]] = df.apply(calculate_daf, axis=1, result_type="expand")
-df["daf_beb"] = pd.to_numeric(df["daf_beb"], errors="coerce")
-df["daf_pjl"] = pd.to_numeric(df["daf_pjl"], errors="coerce")
-
-# Calculate the absolute difference (delta_af)
-df["delta_af"] = abs(df["daf_beb"].fillna(0) - df["daf_pjl"].fillna(0))
-df.loc[df["daf_beb"].isna() | df["daf_pjl"].isna(), "delta_af"] = None
 
-# Define the correct order for chromosomes
-chromosome_order = [str(i) for i in range(1, 23)] + ["X", "Y"]
-df["chromosome"] = df["chromosome"].astype(str).str.strip()
-df["chromosome"] = pd.Categorical(df["chromosome"], categories=chromosome_order, ordered=True)
+    # every cache of the process, reset by after_fork()
+    instances = weakref.WeakSet()
+
+    def __init__(self, build, version):
+        self._build = build
+        self._version_of = version
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._version = None
+        self._rebuilding = False
+        self._failed = None  # data version whose rebuild raised
+        ProcessedDataCache.instances.add(self)
+
+    def _rebuild(self, version):
+        try:
+            snapshot = self._build()
+            with self._lock:
+                self._snapshot, self._version = snapshot, version
+        except Exception:
+            logger.exception("rebuild for data version %s failed, keeping the previous snapshot", version)
+            self._failed = version
+        finally:
+            self._rebuilding = False
+
+    def get(self):
+        version = self._version_of()
+        if self._snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._snapshot, self._version = self._build(), version
+            return self._snapshot
+        with self._lock:
+            start = version != self._version and version != self._failed and not self._rebuilding
+            if start:
+                self._rebuilding = True
+        if start:
+            threading.Thread(target=self._rebuild, args=(version,), daemon=True).start()
+        return self._snapshot
+
+    def snapshot(self):
+        """Returns (DataFrame, version it was built from) as one consistent pair."""
+        self.get()
+        with self._lock:
+            return self._snapshot, self._version
+
+    @property
+    def version(self):
+        return self._version
+
+    def after_fork(self):
+        """
+        Called in a forked process: a rebuild thread of the parent did not survive the fork, and the
+        data_version of the new process connection is not comparable with the parent's, so a snapshot
+        is kept (without a rebuild) while the database fingerprint is unchanged.
+        """
+        self._lock = threading.Lock()
+        self._rebuilding = False
+        self._failed = None
+        if self._version is not None:
+            version = self._version_of()
+            if version[1] == self._version[1]:
+                self._version = version
+
+# derived read-only state of the process by (name, database path), each one a ProcessedDataCache built on first use
+_caches = {}
+_caches_lock = threading.Lock()
+
+#function to return a lazily built value that is rebuilt in the background when the database changes
+def cached_snapshot(name, build, db_path):
+    """
+    Returns (value, data version it was built from) of the cache called name for the database at
+    db_path, which build(db_path) fills on the first call. Used for the processed data and the
+    column store, region index, selection scan and FST background of the web app.
+    """
+    key = (name, db_path)
+    cache = _caches.get(key)
+    if cache is None:
+        with _caches_lock:
+            cache = _caches.get(key)
+            if cache is None:
+                cache = _caches[key] = ProcessedDataCache(lambda: build(db_path), lambda: get_data_version(db_path))
+    return cache.snapshot()
+
+#function to reset the process-wide state in a forked worker process
+def after_fork():
+    """Drops the parent's data version connection and lock, then resets every ProcessedDataCache."""
+    global _version_lock
+    _version_conns.clear()
+    _version_lock = threading.Lock()
+    for cache in list(ProcessedDataCache.instances):
+        cache.after_fork()
+
 #function to return processed data
-def get_processed_data():
-    """Returns the processed DataFrame."""
-    return df
+def get_processed_data(db_path):
+    """Returns the processed DataFrame of db_path, rebuilt in the background when the database has changed."""
+    return cached_snapshot("processed_data", load_processed_data, db_path)[0]
+
+#function to return processed data with the fingerprint of the data it was built from
+def get_processed_snapshot(db_path):
+    """Returns (DataFrame, fingerprint) for caches keyed on the data a result was computed from."""
+    df, version = cached_snapshot("processed_data", load_processed_data, db_path)
+    return df, version[1]
+
+#function to pick the per-chromosome means the plots draw
+def chromosome_means(stats, columns):
+    """Returns chromosome plus the mean of each statistic in columns ({statistic: column name})."""
+    means = chromosome_table(stats, "mean")
+    return means[["chromosome"] + list(columns)].rename(columns=columns)
+
 #function to plot histogram 
-def plot_daf_histogram(df):
-    df_filtered = df.dropna(subset=["daf_beb", "daf_pjl"])
-    df_aggregated = df_filtered.groupby("chromosome").agg(
-        daf_beb_mean=("daf_beb", "mean"),
-        daf_pjl_mean=("daf_pjl", "mean")
-    ).reset_index()
+def plot_daf_histogram(stats):
+    """Bar chart of the mean daf_beb and daf_pjl per chromosome, from the chromosome_stats rows."""
+    df_aggregated = chromosome_means(stats, {"daf_beb": "daf_beb_mean", "daf_pjl": "daf_pjl_mean"})
     plt.figure(figsize=(12, 6))
     sns.barplot(data=df_aggregated, x="chromosome", y="daf_beb_mean", color="blue", alpha=0.5, label="beb")
     sns.barplot(data=df_aggregated, x="chromosome", y="daf_pjl_mean", color="orange", alpha=0.5, label="pjl")
@@ -84,12 +221,9 @@ def plot_daf_histogram(df):
     plt.close()
     return base64.b64encode(img.getvalue()).decode('utf8')
 #fucntion to plot line chart
-def plot_daf_line_chart(df):
-    df_filtered = df.dropna(subset=["daf_beb", "daf_pjl"])
-    df_aggregated = df_filtered.groupby("chromosome").agg(
-        daf_beb_mean=("daf_beb", "mean"),
-        daf_pjl_mean=("daf_pjl", "mean")
-    ).reset_index()
+def plot_daf_line_chart(stats):
+    """Line chart of the mean daf_beb and daf_pjl per chromosome, from the chromosome_stats rows."""
+    df_aggregated = chromosome_means(stats, {"daf_beb": "daf_beb_mean", "daf_pjl": "daf_pjl_mean"})
     plt.figure(figsize=(12, 6))
     sns.lineplot(data=df_aggregated, x="chromosome", y="daf_beb_mean", color="blue", label="beb", marker="o")
     sns.lineplot(data=df_aggregated, x="chromosome", y="daf_pjl_mean", color="orange", label="pjl", marker="o")
@@ -103,11 +237,9 @@ def plot_daf_line_chart(df):
     plt.close()
     return base64.b64encode(img.getvalue()).decode('utf8')
 #function to plot bar chart
-def plot_delta_af_bar_chart(df):
-    df_filtered = df.dropna(subset=["delta_af"])
-    df_aggregated = df_filtered.groupby("chromosome").agg(
-        delta_af_mean=("delta_af", "mean")
-    ).reset_index()
+def plot_delta_af_bar_chart(stats):
+    """Bar chart of the mean delta_af per chromosome, from the chromosome_stats rows."""
+    df_aggregated = chromosome_means(stats, {"delta_af": "delta_af_mean"})
     plt.figure(figsize=(12, 6))
     sns.barplot(data=df_aggregated, x="chromosome", y="delta_af_mean", color="green", alpha=0.5)
     plt.xlabel("Chromosome")
@@ -127,11 +259,13 @@ def plot_pvalues_by_chromosome(df):
     if not all(col in df.columns for col in ["chromosome", "p_value", "snp_id"]):
         raise ValueError("The database table does not contain the required columns ('chromosome', 'p_value', 'snp_id').")
 
+    # Work on a copy of the needed columns, the processed data is shared between requests
+    df = df[["chromosome", "p_value", "snp_id"]].copy()
+
     # Clean the chromosome column (remove spaces and ensure it's a string)
     df["chromosome"] = df["chromosome"].astype(str).str.strip()
 
-    # Define the correct order for chromosomes
-    chromosome_order = [str(i) for i in range(1, 23)] + ["X", "Y"]
+    # the correct order for chromosomes is the shared chromosome_order
     df["chromosome"] = pd.Categorical(df["chromosome"], categories=chromosome_order, ordered=True)
 
     # Sort the DataFrame by chromosome
@@ -1,37 +1,82 @@
 # ------------------ Import all necessary packages ------------------
 import os
-import pandas as pd
+import sys
+import numpy as np
 import re
 import matplotlib.pyplot as plt
 import seaborn as sns
 import io
 import base64
-import sqlite3
+import hashlib
+from datetime import datetime, timezone
 import plotly.express as px
-from flask import Flask, render_template, render_template_string, request, flash, redirect, url_for, Response, jsonify, abort, send_from_directory
+import plotly.graph_objects as go
+from flask import Flask, render_template, render_template_string, request, flash, redirect, url_for, Response, jsonify, abort, send_from_directory, g, current_app, has_request_context, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_bcrypt import Bcrypt
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
-from sqlalchemy import text  
-from sqlalchemy.orm import joinedload
+from sqlalchemy import text, literal_column, false, event, or_
+from sqlalchemy.orm import selectinload
 
 # Import FST plotting functions from a separate module
 from fst_plotting import plot_fst_comparison, get_fst_data
+from figure_cache import FigureCache
+from lod import downsample_scatter, screen_width
+from pagination import keyset_page, count_estimate, page_size
+from export import EXPORT_FORMATS, EXPORT_BATCH_SIZE, export_chunks, gzip_chunks
+from region_index import load_region_index, parse_region, is_region_query, parse_size
+from chromosome_stats import get_chromosome_stats, plot_box
+from db_access import set_write_pragmas, close_connections
+from response_cache import ResponseCache
+from selection_scan import SCAN_STATISTICS, check_scan, load_selection_scan
+from window_scan import check_window_scan, scan_windows, parse_window
 
-# ------------------ INITIALIZE FLASK APP ------------------
-app = Flask(__name__)
-app.config['SECRET_KEY'] = 'mysecretkey'
-db_path = os.path.join(os.path.abspath(os.path.dirname(__file__)), "instance", "genetics.db")
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{db_path}"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-os.makedirs("instance", exist_ok=True)
+# Import the schema migrations that live next to the database loader
+sys.path.append(os.path.join(os.path.abspath(os.path.dirname(__file__)), "..", "instance"))
+from migrations import migrate
+from column_store import open_column_store
+
+# Wright's FST categories are shared with the FST calculation script
+sys.path.append(os.path.join(os.path.abspath(os.path.dirname(__file__)), "..", "SummaryStatsCalculations"))
+from FST import classify_fst
+from resampling import empirical_pvalues
+
+# ------------------ CONFIGURATION ------------------
+def default_config():
+    """Returns the settings create_app starts from, the environment overrides the tunable ones."""
+    return {
+        'SECRET_KEY': os.environ.get("SECRET_KEY", "mysecretkey"),
+        # the SQLite database every route reads, SQLALCHEMY_DATABASE_URI is derived from it by create_app
+        'GENETICS_DB_PATH': os.environ.get("GENETICS_DB_PATH", os.path.join(os.path.abspath(os.path.dirname(__file__)), "instance", "genetics.db")),
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        # rendered summary figures kept in memory, FIGURE_CACHE_DIR adds an on-disk tier shared by worker processes
+        'FIGURE_CACHE_SIZE': int(os.environ.get("FIGURE_CACHE_SIZE", "32")),
+        'FIGURE_CACHE_DIR': os.environ.get("FIGURE_CACHE_DIR"),
+        # search result pages: default rows per page and the point where the result count stops counting
+        'SEARCH_PAGE_SIZE': int(os.environ.get("SEARCH_PAGE_SIZE", "50")),
+        'SEARCH_COUNT_LIMIT': int(os.environ.get("SEARCH_COUNT_LIMIT", "10000")),
+        # memory budget of the cached FST API responses, in bytes
+        'RESPONSE_CACHE_BYTES': int(os.environ.get("RESPONSE_CACHE_BYTES", str(32 * 1024 * 1024))),
+    }
 
 # ------------------ INITIALIZE EXTENSIONS ------------------
-db = SQLAlchemy(app)
-bcrypt = Bcrypt(app)
-login_manager = LoginManager(app)
+# bound to an application by create_app
+db = SQLAlchemy()
+bcrypt = Bcrypt()
+login_manager = LoginManager()
 login_manager.login_view = "login"
 
+# ------------------ Route registry ------------------
+# views are collected here and added to each application by create_app, keeping their endpoint names
+routes = []
+
+def route(rule, **options):
+    """Same arguments as app.route, records the view for create_app."""
+    def register(view):
+        routes.append((rule, options, view))
+        return view
+    return register
+
 # ------------------ Database model ------------------
 
 class User(UserMixin, db.Model):
@@ -109,8 +154,92 @@ def get_go_terms(snp_id):
     result = db.session.execute(stmt, {"snp_id": snp_id}).fetchall()
     return [row[0] for row in result]
 
-# ---------- Register the helper as a template global so it can be used in Jinja templates ---------------
-app.jinja_env.globals.update(get_go_terms=get_go_terms)
+# ------------------ Full-text search helpers ------------------
+def fts_match_expression(query, columns=None):
+    """
+    Turns free text into an FTS5 MATCH expression in which every word is a prefix term that must
+    match. columns restricts the match to those snp_fts columns. Returns None if there are no words.
+    """
+    terms = " ".join(f'"{word}"*' for word in re.findall(r"\w+", query))
+    if not terms:
+        return None
+    if columns:
+        return "{" + " ".join(columns) + "} : (" + terms + ")"
+    return terms
+
+_full_text_available = False
+
+def has_full_text_index():
+    """True once the snp_fts index from the schema migrations exists."""
+    global _full_text_available
+    if not _full_text_available:
+        found = db.session.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'snp_fts'")).first()
+        _full_text_available = found is not None
+    return _full_text_available
+
+def full_text_query(query, columns=None):
+    """
+    Returns (query, order) for the SNPs that match query in the snp_fts index, so the lookup does
+    not scan the snp table. The rows are (GeneticData, rank, rowid) and order is (rank, rowid):
+    most relevant (bm25) first, the rowid keeping equal ranks in a fixed order for the cursors.
+    """
+    expression = fts_match_expression(query, columns)
+    if expression is None:
+        return GeneticData.query.filter(false()), None
+    matches = text("SELECT rowid, rank FROM snp_fts WHERE snp_fts MATCH :expression") \
+        .bindparams(expression=expression) \
+        .columns(rowid=db.Integer, rank=db.Float) \
+        .subquery("fts")
+    matched = GeneticData.query.join(matches, literal_column("snp.rowid") == matches.c.rowid) \
+        .add_columns(matches.c.rank, matches.c.rowid)
+    return matched, (matches.c.rank, matches.c.rowid)
+
+# ------------------ Batched annotation loading ------------------
+# GO terms and pathways for a whole result set come from one IN query per relationship
+# (SQLAlchemy splits the IN list into chunks of 500), instead of one query per SNP
+ANNOTATIONS = (selectinload(GeneticData.go_terms), selectinload(GeneticData.pathways))
+
+# ------------------ Counts the SQL queries of each request for the debug log ------------------
+def count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g.query_count = g.get("query_count", 0) + 1
+
+def log_query_count(response):
+    current_app.logger.debug("%s %s ran %d SQL queries", request.method, request.full_path, g.get("query_count", 0))
+    return response
+
+# ------------------ Keyset pagination for the search routes ------------------
+# results are listed in genomic order unless a text search ranks them, the cursor holds the sort key of the row a page starts after
+SEARCH_ORDER = (GeneticData.chromosome, GeneticData.position, GeneticData.snp_id)
+
+def search_page(query, order=None):
+    """
+    Returns (results, pagination) for the page of a GeneticData query that the ?cursor= argument
+    points at, with ?page_size= rows. pagination holds the next/prev cursors and the result count.
+    With order (full_text_query) the rows are (GeneticData, *order values) and sorted on them,
+    otherwise they are GeneticData in SEARCH_ORDER.
+    """
+    size = page_size(request.args.get('page_size'), current_app.config['SEARCH_PAGE_SIZE'])
+    try:
+        if order is None:
+            results, next_cursor, prev_cursor = keyset_page(
+                query, SEARCH_ORDER, lambda snp: [snp.chromosome, snp.position, snp.snp_id],
+                request.args.get('cursor'), size
+            )
+        else:
+            rows, next_cursor, prev_cursor = keyset_page(
+                query, order, lambda row: list(row[1:]), request.args.get('cursor'), size
+            )
+            results = [row[0] for row in rows]
+    except ValueError:
+        abort(400)
+    pagination = {
+        "page_size": size,
+        "next": next_cursor,
+        "prev": prev_cursor,
+        "count": count_estimate(query, current_app.config['SEARCH_COUNT_LIMIT']),
+    }
+    return results, pagination
 
 # ------------------ Loads the user ------------------
 @login_manager.user_loader
@@ -118,16 +247,16 @@ def load_user(user_id):
     return User.query.get(int(user_id))
 
 # ------------------ app routes ------------------
-@app.route('/')
+@route('/')
 def home():
     return render_template('home.html')
 # ------------------ allows user to create a profile ------------------
-@app.route('/profile')
+@route('/profile')
 @login_required
 def profile():
     return render_template('profile.html')
 # ------------------ allows user to log out  ------------------
-@app.route('/login', methods=['GET', 'POST'])
+@route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         email = request.form['email']
@@ -140,7 +269,7 @@ def login():
         flash(' Invalid email or password.', 'danger')
     return render_template('login.html')
 # ------------------ allows user to register  ------------------
-@app.route('/register', methods=['GET', 'POST'])
+@route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
         username = request.form['username']
@@ -158,7 +287,7 @@ def register():
         return redirect(url_for('login'))
     return render_template('register.html')
 # ------------------ allows user to log out ------------------
-@app.route('/logout')
+@route('/logout')
 @login_required
 def logout():
     logout_user()
@@ -166,283 +295,553 @@ def logout():
     return redirect(url_for('home'))
 
 # ------------------ code for the search route ------------------
-@app.route('/search', methods=['GET'])
+@route('/search', methods=['GET'])
 def search():
     query = request.args.get('query', '').strip()
     results = []
+    pagination = None
     if query:
-        results = GeneticData.query.options(joinedload(GeneticData.go_terms)).filter(
-            GeneticData.snp_id.ilike(f"%{query}%")
-        ).all()
+        order = None
+        if has_full_text_index():
+            matches, order = full_text_query(query, ["snp_id"])
+        else:
+            matches = GeneticData.query.filter(GeneticData.snp_id.ilike(f"%{query}%"))
+        results, pagination = search_page(matches.options(*ANNOTATIONS), order)
         if results:
-            flash(f" Found {len(results)} result(s) for '{query}'.", "success")
+            flash(f" Found {pagination['count']} result(s) for '{query}'.", "success")
         else:
             flash(f" No results found for '{query}'.", "danger")
-    return render_template('search_results.html', results=results, query=query)
+    return render_template('search_results.html', results=results, query=query, pagination=pagination)
     
 # ------------------ contains app routes for connection of database ------------------
 
-@app.route('/genetic_data', methods=['GET'], endpoint='genetic_data_search')
+@route('/genetic_data', methods=['GET'], endpoint='genetic_data_search')
 def genetic_data_search():
     query = request.args.get('query', '').strip()
     results = []
+    pagination = None
     if query:
-        if query.isdigit():
-            results = GeneticData.query.options(joinedload(GeneticData.go_terms)).filter(
+        order = None
+        if is_region_query(query):
+            # chr:start-end or GENE+flank, the intervals come from the region index
+            matches = GeneticData.query.filter(region_filter(query))
+        elif query.isdigit():
+            matches = GeneticData.query.filter(
                 (GeneticData.chromosome == query) | (GeneticData.position == int(query))
-            ).all()
+            )
         elif len(query) == 1:
-            results = GeneticData.query.options(joinedload(GeneticData.go_terms)).filter(
+            matches = GeneticData.query.filter(
                 GeneticData.risk_allele.ilike(query)
-            ).all()
+            )
+        elif has_full_text_index():
+            # rsIDs, risk alleles, mapped genes, traits and phenotypes through the full-text index
+            matches, order = full_text_query(query)
         else:
-            results = GeneticData.query.options(joinedload(GeneticData.go_terms)).filter(
+            matches = GeneticData.query.filter(
                 (GeneticData.snp_id.ilike(f"%{query}%")) |
                 (GeneticData.risk_allele.ilike(f"%{query}%")) |
                 (GeneticData.mapped_gene.ilike(f"%{query}%"))
-            ).all()
+            )
+        results, pagination = search_page(matches, order)
         if results:
-            flash(f" Found {len(results)} result(s) for '{query}'.", "success")
+            flash(f" Found {pagination['count']} result(s) for '{query}'.", "success")
         else:
             flash(f" No results found for '{query}'.", "danger")
-    return render_template('genetic_data.html', results=results, query=query)
+    return render_template('genetic_data.html', results=results, query=query, pagination=pagination)
 # ------------------ connects about subpage ------------------
-@app.route('/about')
+@route('/about')
 def about():
     return render_template('about.html')
 # ------------------ connects populations subpage ------------------
-@app.route('/populations')
+@route('/populations')
 def populations():
     return render_template('populations.html')
 # ------------------ connects information on the bangladeshi population to the populations page ------------------
-@app.route('/populations/bangladesh')
+@route('/populations/bangladesh')
 def bangladesh():
     return render_template('bangladesh.html')
 # ------------------ connects information on the pakistani population to the populations page ------------------
-@app.route('/populations/pakistan')
+@route('/populations/pakistan')
 def pakistan():
     return render_template('pakistan.html')
 # ------------------ connects the data visuliation page ------------------
-@app.route('/data_options')
+@route('/data_options')
 def data_options():
     return render_template('data_options.html')
 
+# ------------------ Database of the application ------------------
+def database_path():
+    """Path of the genetics database of the current application (GENETICS_DB_PATH)."""
+    return current_app.config['GENETICS_DB_PATH']
+
+# ------------------ Memory-mapped column store ------------------
+def get_column_store():
+    """Returns (ColumnStore, data version it was opened for), reopened in the background when the database changes."""
+    import Flask_derive_delta as fdd
+    return fdd.cached_snapshot("column_store", open_column_store, database_path())
+
+def scatter_points(statistic):
+    """
+    Returns the points of a scatter plot of statistic along the genome: every SNP above the
+    ?threshold= plus the min/max of each screen-width bucket per chromosome (lod.py).
+    """
+    store, _ = get_column_store()
+    df = store.frame(["chromosome", "position", statistic])
+    df = downsample_scatter(df, "position", statistic,
+                            threshold=request.args.get('threshold', type=float),
+                            bins=screen_width(request.args.get('width')))
+    # the rsIDs are decoded only for the points that are drawn
+    return df.assign(chromosome=df["chromosome"].astype(str), snp_id=store.text("snp_id", df.index.to_numpy()))
+
 # ------------------ Delta allele frequency visualisation route ------------------
-@app.route('/delta_af')
+@route('/delta_af')
 def delta_af_view():
     try:
-        conn = sqlite3.connect(db_path)
-        query = "SELECT chromosome, delta_af, position, snp_id FROM snp"
-        df = pd.read_sql(query, conn)
-        conn.close()
+        # columns mapped from the column store, shared by every worker
+        scatter_df = scatter_points("delta_af")
     except Exception as e:
         return abort(500, description=f"Error fetching data: {e}")
     
-    if df.empty:
+    if scatter_df.empty:
         flash("No data available for Delta_AF plots.", "warning")
         return render_template("delta_af_viz.html", manhattan_html="<p>No data available.</p>", boxplot_html="<p>No data available.</p>")
     
-    df['chromosome'] = df['chromosome'].astype(str)
     manhattan_fig = px.scatter(
-        df, 
+        scatter_df, 
         x="position", 
         y="delta_af", 
         color="chromosome",
         hover_data=["snp_id"],
         title="Manhattan Plot of Delta_AF",
-        labels={"delta_af": "Delta_AF", "position": "Genomic Position"}
+        labels={"delta_af": "Delta_AF", "position": "Genomic Position"},
+        render_mode="webgl"
     )
-    boxplot_fig = px.box(
-        df, 
-        x="chromosome", 
-        y="delta_af", 
+    # windowed mean along each chromosome, ?window=100kb&window_step=50kb (default 1Mb windows, ?window=off hides it)
+    if request.args.get('window') != 'off':
+        try:
+            size, step = parse_window(request.args.get('window', '1Mb'), request.args.get('window_step'))
+            store, _ = get_column_store()
+            windows = scan_windows(store, ["delta_af"], size, step)
+        except ValueError as e:
+            return abort(400, description=str(e))
+        manhattan_fig.add_trace(window_track(windows, "delta_af_mean", f"Delta_AF mean ({request.args.get('window', '1Mb')} windows)"))
+    # box plot from the quartiles in chromosome_stats instead of shipping every SNP to plotly
+    boxplot_fig = plot_box(
+        get_chromosome_stats(["delta_af"], database_path()),
+        "delta_af",
         title="Delta_AF Distribution Across Chromosomes",
-        labels={"delta_af": "Delta_AF", "chromosome": "Chromosome"}
+        label="Delta_AF"
     )
-    manhattan_html = manhattan_fig.to_html(full_html=False)
-    boxplot_html = boxplot_fig.to_html(full_html=False)
+    # plotly.js is loaded once from the CDN instead of being inlined into every figure
+    manhattan_html = manhattan_fig.to_html(full_html=False, include_plotlyjs="cdn")
+    boxplot_html = boxplot_fig.to_html(full_html=False, include_plotlyjs=False)
     return render_template("delta_af_viz.html", manhattan_html=manhattan_html, boxplot_html=boxplot_html)
 
 # ------------------ BEB/PJL (DAF Comparison) visualisation route ------------------
-@app.route('/beb_pjl')
+@route('/beb_pjl')
 def beb_pjl_view():
     return render_template('beb_pjl_view.html')
 
 # ------------------ FST visualisation route ------------------
-@app.route('/fst_view')
+@route('/fst_view')
 def fst_view():
     try:
-        results = GeneticData.query.with_entities(
-            GeneticData.chromosome,
-            GeneticData.fst_beb,
-            GeneticData.fst_pjl,
-            GeneticData.snp_id,
-            GeneticData.position
-        ).all()
+        scatter_df = scatter_points("fst_beb")
     except Exception as e:
         return abort(500, description=f"Error fetching FST data: {e}")
     
-    df = pd.DataFrame(results, columns=["chromosome", "fst_beb", "fst_pjl", "snp_id", "position"])
-    if df.empty:
+    if scatter_df.empty:
         flash("No data available for FST plots.", "warning")
         return render_template("fst_view.html", fst_scatter_html="<p>No data available.</p>", fst_box_html="<p>No data available.</p>")
     
-    df['chromosome'] = df['chromosome'].astype(str)
     fst_scatter_fig = px.scatter(
-        df,
+        scatter_df,
         x="position",
         y="fst_beb",
         color="chromosome",
         hover_data=["snp_id"],
         title="FST (BEB) by Genomic Position",
-        labels={"fst_beb": "FST (BEB)", "position": "Genomic Position"}
+        labels={"fst_beb": "FST (BEB)", "position": "Genomic Position"},
+        render_mode="webgl"
     )
-    fst_box_fig = px.box(
-        df,
-        x="chromosome",
-        y="fst_pjl",
+    fst_box_fig = plot_box(
+        get_chromosome_stats(["fst_pjl"], database_path()),
+        "fst_pjl",
         title="FST (PJL) Distribution by Chromosome",
-        labels={"fst_pjl": "FST (PJL)", "chromosome": "Chromosome"}
+        label="FST (PJL)"
     )
-    fst_scatter_html = fst_scatter_fig.to_html(full_html=False)
-    fst_box_html = fst_box_fig.to_html(full_html=False)
+    fst_scatter_html = fst_scatter_fig.to_html(full_html=False, include_plotlyjs="cdn")
+    fst_box_html = fst_box_fig.to_html(full_html=False, include_plotlyjs=False)
     return render_template("fst_view.html", fst_scatter_html=fst_scatter_html, fst_box_html=fst_box_html)
 
 # ------------------ summary stats visualisation ------------------
-@app.route('/summary_stats')
-def summary_stats_view():
+def render_summary_figures():
+    """
+    Returns the five summary statistic figures as base64 PNGs. Each one comes from the figure
+    cache unless the data it was drawn from has changed.
+    """
     import Flask_derive_delta as fdd
-    data = fdd.get_processed_data()
-    histogram_plot = fdd.plot_daf_histogram(data)
-    line_chart_plot = fdd.plot_daf_line_chart(data)
-    delta_af_plot = fdd.plot_delta_af_bar_chart(data)
-    pvalue_plot = fdd.plot_pvalues_by_chromosome(data)
-    # Generate FST comparison plot using the hard-coded data from the separate module
-    fst_comparison_plot = plot_fst_comparison(get_fst_data())
-    return render_template('summary_stats_view.html',
-                           histogram_plot=histogram_plot,
-                           line_chart_plot=line_chart_plot,
-                           delta_af_plot=delta_af_plot,
-                           pvalue_plot=pvalue_plot,
-                           fst_comparison_plot=fst_comparison_plot)
+    figure_cache = current_app.extensions["figure_cache"]
+    path = database_path()
+    data, version = fdd.get_processed_snapshot(path)
+    # the per-chromosome means come from the chromosome_stats table kept by the loader
+    fingerprint = fdd.get_data_fingerprint(path)
+    stats = get_chromosome_stats(["daf_beb", "daf_pjl", "delta_af"], path)
+    return {
+        "histogram_plot": figure_cache.get_or_render(fdd.plot_daf_histogram, fingerprint, stats),
+        "line_chart_plot": figure_cache.get_or_render(fdd.plot_daf_line_chart, fingerprint, stats),
+        "delta_af_plot": figure_cache.get_or_render(fdd.plot_delta_af_bar_chart, fingerprint, stats),
+        "pvalue_plot": figure_cache.get_or_render(fdd.plot_pvalues_by_chromosome, version, data),
+        # FST comparison plot from the per-chromosome summary table in the database
+        "fst_comparison_plot": figure_cache.get_or_render(plot_fst_comparison, fingerprint, get_fst_data(path)),
+    }
+
+def warm_up_figures():
+    """Pre-renders the summary statistic figures at startup (inside an app context) so the first page load is a cache hit."""
+    try:
+        render_summary_figures()
+    except Exception as e:
+        print(f" Could not pre-render summary figures: {str(e)}")
+
+@route('/summary_stats')
+def summary_stats_view():
+    return render_template('summary_stats_view.html', **render_summary_figures())
 
 # ------------------ FST API endpoints ------------------
-@app.route('/api/populations')
+# the responses are cached per arguments and data version (ResponseCache), the page asks again on every dropdown change
+FST_COLUMNS = {"BEB": GeneticData.fst_beb, "PJL": GeneticData.fst_pjl}
+
+def cached_json(build, *key):
+    """Returns the JSON of build() from the response cache, rebuilt when the database has changed."""
+    import Flask_derive_delta as fdd
+    cache = current_app.extensions["response_cache"]
+    body = cache.get_or_build(fdd.get_data_version(database_path()), lambda: current_app.json.dumps(build()).encode(), *key)
+    return current_app.response_class(body, mimetype="application/json")
+
+def fst_records(rows):
+    """Turns (snp_id, fst, risk_allele) rows into the records of the FST APIs with Wright's category of each FST."""
+    categories = classify_fst([fst if fst is not None else float("nan") for _, fst, _ in rows])
+    return [
+        {"SNP ID": snp_id, "FST": fst if fst is not None else 0, "Category": category, "Allele": allele}
+        for (snp_id, fst, allele), category in zip(rows, categories)
+    ]
+
+@route('/api/populations')
 def api_populations():
     # FST visualisation for BEB and PJL
     return jsonify(["BEB", "PJL"])
 
-@app.route('/api/snps/<population>')
+@route('/api/snps/<population>')
 def api_snps(population):
     population = population.upper()
-    if population == "BEB":
-        snps = GeneticData.query.filter(GeneticData.fst_beb.isnot(None)).with_entities(GeneticData.snp_id).all()
-    elif population == "PJL":
-        snps = GeneticData.query.filter(GeneticData.fst_pjl.isnot(None)).with_entities(GeneticData.snp_id).all()
-    else:
+    if population not in FST_COLUMNS:
         return jsonify({"error": "Invalid population"}), 400
-    snp_list = [s[0] for s in snps]
-    return jsonify(snp_list)
 
-@app.route('/api/top_snps/<population>/<int:count>')
+    def build():
+        fst = FST_COLUMNS[population]
+        return [s[0] for s in GeneticData.query.filter(fst.isnot(None)).with_entities(GeneticData.snp_id).all()]
+    return cached_json(build, 'snps', population)
+
+def get_fst_background():
+    """Returns ({population: sorted FST values of every SNP}, data version), the null of the empirical p-values."""
+    import Flask_derive_delta as fdd
+
+    def build(db_path):
+        # the store of the current data, not a cached snapshot that may still be reopening
+        store = open_column_store(db_path)
+        background = {}
+        for population, fst in FST_COLUMNS.items():
+            values = store.columns[fst.key]
+            background[population] = np.sort(values[~np.isnan(values)])
+        return background
+    return fdd.cached_snapshot("fst_background", build, database_path())
+
+@route('/api/top_snps/<population>/<int:count>')
 def api_top_snps(population, count):
+    """
+    The count SNPs with the largest FST against population, each with Wright's category and its
+    empirical p-value: the share of all SNPs whose FST is at least as large (the database holds no
+    per-population allele counts to permute, see SummaryStatsCalculations/FST.py --permutations).
+    """
     population = population.upper()
-    if population == "BEB":
-        query_obj = GeneticData.query.filter(GeneticData.fst_beb.isnot(None)).order_by(GeneticData.fst_beb.desc()).limit(count)
-    elif population == "PJL":
-        query_obj = GeneticData.query.filter(GeneticData.fst_pjl.isnot(None)).order_by(GeneticData.fst_pjl.desc()).limit(count)
-    else:
+    if population not in FST_COLUMNS:
         return jsonify({"error": "Invalid population"}), 400
-    results = query_obj.all()
-    result_list = []
-    for r in results:
-        fst_val = r.fst_beb if population == "BEB" else r.fst_pjl
-        if fst_val is None:
-            category = "No data"
-        else:
-            if fst_val < 0.05:
-                category = "Little genetic diff."
-            elif fst_val < 0.15:
-                category = "Moderate genetic diff."
-            elif fst_val < 0.25:
-                category = "Great genetic diff."
-            else:
-                category = "Very great genetic diff."
-        result_list.append({
-            "SNP ID": r.snp_id,
-            "FST": fst_val if fst_val is not None else 0,
-            "Category": category,
-            "Allele": r.risk_allele
-        })
-    return jsonify(result_list)
-
-@app.route('/api/fst_data', methods=['POST'])
+    # the background may still be rebuilding after a change, its version keeps old p-values out of newer entries
+    background, background_version = get_fst_background()
+
+    def build():
+        fst = FST_COLUMNS[population]
+        rows = GeneticData.query.filter(fst.isnot(None)).order_by(fst.desc()).limit(count) \
+            .with_entities(GeneticData.snp_id, fst, GeneticData.risk_allele).all()
+        records = fst_records(rows)
+        values = [value if isinstance(value, (int, float)) else float("nan") for _, value, _ in rows]
+        for record, pvalue in zip(records, empirical_pvalues(values, background[population])):
+            record["Empirical P"] = None if np.isnan(pvalue) else float(pvalue)
+        return records
+    return cached_json(build, 'top_snps', background_version[1], population, count)
+
+@route('/api/fst_data', methods=['POST'])
 def api_fst_data():
     data = request.json
     population = data.get("population", "").upper()
     selected_snps = data.get("snps", [])
-    if population not in ["BEB", "PJL"]:
+    if population not in FST_COLUMNS:
         return jsonify({"error": "Invalid population"}), 400
-    results = GeneticData.query.filter(GeneticData.snp_id.in_(selected_snps)).all()
-    result_list = []
-    for r in results:
-        fst_val = r.fst_beb if population == "BEB" else r.fst_pjl
-        if fst_val is None:
-            category = "No data"
-        else:
-            if fst_val < 0.05:
-                category = "Little genetic diff."
-            elif fst_val < 0.15:
-                category = "Moderate genetic diff."
-            elif fst_val < 0.25:
-                category = "Great genetic diff."
-            else:
-                category = "Very great genetic diff."
-        result_list.append({
-            "SNP ID": r.snp_id,
-            "FST": fst_val if fst_val is not None else 0,
-            "Category": category,
-            "Allele": r.risk_allele
-        })
-    result_list = sorted(result_list, key=lambda x: x["FST"], reverse=True)
-    return jsonify(result_list)
+
+    def build():
+        fst = FST_COLUMNS[population]
+        rows = GeneticData.query.filter(GeneticData.snp_id.in_(selected_snps)) \
+            .with_entities(GeneticData.snp_id, fst, GeneticData.risk_allele).all()
+        return sorted(fst_records(rows), key=lambda x: x["FST"], reverse=True)
+    # the result does not depend on the order or repeats of the selected SNPs
+    return cached_json(build, 'fst_data', population, tuple(sorted(set(selected_snps))))
+
+@route('/api/cache_stats')
+def api_cache_stats():
+    """Hit/miss counters and sizes of the response cache and the summary figure cache of this process."""
+    figure_cache = current_app.extensions["figure_cache"]
+    return jsonify({
+        "responses": current_app.extensions["response_cache"].stats(),
+        "figures": {"hits": figure_cache.hits, "misses": figure_cache.misses, "entries": len(figure_cache._entries)},
+    })
 
 # ------------------ DAF API route ------------------
-@app.route('/api/daf-data/<chromosome>', methods=['GET'])
-def api_daf_data(chromosome):
-    results = GeneticData.query.filter_by(chromosome=chromosome).all()
-    if not results:
-        return jsonify({"data": [], "summary": {}, "top_differences": []})
-    data_list = []
-    for row in results:
-        daf_beb = row.daf_beb if row.daf_beb is not None else 0
-        daf_pjl = row.daf_pjl if row.daf_pjl is not None else 0
-        diff = abs(daf_beb - daf_pjl)
-        data_list.append({
-            "SNP_ID": row.snp_id,
-            "Position": row.position,
-            "Risk_Allele": row.risk_allele,
-            "DAF_BEB": daf_beb,
-            "DAF_PJL": daf_pjl,
-            "difference": diff,
-            "higher_in": "BEB" if daf_beb > daf_pjl else "PJL"
-        })
-    df_api = pd.DataFrame(data_list)
-    summary = {
-         "count": int(df_api.shape[0]),
-         "avg_daf_beb": float(df_api["DAF_BEB"].mean()),
-         "avg_daf_pjl": float(df_api["DAF_PJL"].mean()),
-         "mean_difference": float(df_api["difference"].mean()),
-         "higher_in_beb": int((df_api["DAF_BEB"] > df_api["DAF_PJL"]).sum()),
-         "higher_in_pjl": int((df_api["DAF_BEB"] <= df_api["DAF_PJL"]).sum())
+# ------------------ Conditional GET for the JSON APIs built from the database ------------------
+def data_validators(*key):
+    """
+    Returns (etag, last_modified) for a response computed from the database: the ETag hashes the
+    data fingerprint with key (the route and its arguments), Last-Modified is the database mtime.
+    """
+    import Flask_derive_delta as fdd
+    db_path = database_path()
+    etag = hashlib.sha1(repr((fdd.get_data_fingerprint(db_path), key)).encode()).hexdigest()[:20]
+    mtimes = [os.path.getmtime(path) for path in (db_path, db_path + "-wal") if os.path.exists(path)]
+    last_modified = datetime.fromtimestamp(max(mtimes, default=0), timezone.utc)
+    return etag, last_modified
+
+def conditional_json(build, *key):
+    """
+    Returns 304 Not Modified when the client already holds the current version of the response,
+    otherwise the JSON of build(). Clients are told to revalidate on every use.
+    """
+    etag, last_modified = data_validators(*key)
+    response = current_app.response_class(mimetype="application/json")
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    response.make_conditional(request)
+    if response.status_code == 304:
+        return response
+    response.set_data(current_app.json.dumps(build()))
+    return response
+
+# ------------------ DAF comparison of BEB and PJL for one chromosome ------------------
+def daf_data(store, chromosome, layout="rows"):
+    """Builds the /api/daf-data payload from the chromosome's slice of the column store."""
+    rows = store.chromosome_slice(chromosome)
+    if rows.stop == rows.start:
+        return {"data": [], "summary": {}, "top_differences": []}
+    # missing DAF values count as 0, as they always have on this page
+    daf_beb = np.nan_to_num(store.columns["daf_beb"][rows])
+    daf_pjl = np.nan_to_num(store.columns["daf_pjl"][rows])
+    difference = np.abs(daf_beb - daf_pjl)
+    columns = ["SNP_ID", "Position", "Risk_Allele", "DAF_BEB", "DAF_PJL"]
+    # the store keeps each chromosome in (position, snp_id) order
+    values = [store.text("snp_id", rows), store.columns["position"][rows].tolist(),
+              store.text("risk_allele", rows), daf_beb.tolist(), daf_pjl.tolist()]
+    # stable, so equal differences keep their genomic order
+    top = np.argsort(-difference, kind="stable")[:5]
+
+    def record(i):
+        item = {column: column_values[i] for column, column_values in zip(columns, values)}
+        item["difference"] = abs(item["DAF_BEB"] - item["DAF_PJL"])
+        item["higher_in"] = "BEB" if item["DAF_BEB"] > item["DAF_PJL"] else "PJL"
+        return item
+
+    if layout == "columnar":
+        # one array per field instead of repeating the keys on every row,
+        # difference and higher_in follow from DAF_BEB and DAF_PJL
+        data = dict(zip(columns, values))
+    else:
+        data = [record(i) for i in range(len(difference))]
+    return {
+        "layout": layout,
+        "data": data,
+        "summary": {
+            "count": len(difference),
+            "avg_daf_beb": float(daf_beb.mean()),
+            "avg_daf_pjl": float(daf_pjl.mean()),
+            "mean_difference": float(difference.mean()),
+            "higher_in_beb": int((daf_beb > daf_pjl).sum()),
+            "higher_in_pjl": int((daf_beb <= daf_pjl).sum()),
+        },
+        "top_differences": [record(i) for i in top],
     }
-    top_differences = df_api.sort_values(by='difference', ascending=False).head(5).to_dict(orient='records')
-    return jsonify({"data": data_list, "summary": summary, "top_differences": top_differences})
+
+@route('/api/daf-data/<chromosome>', methods=['GET'])
+def api_daf_data(chromosome):
+    layout = request.args.get('layout', 'rows')
+    if layout not in ('rows', 'columnar'):
+        abort(400)
+    # the key names the snapshot the body is built from, a store still being reopened is never cached under a newer ETag
+    store, version = get_column_store()
+    return conditional_json(lambda: daf_data(store, chromosome, layout), 'daf-data', version[1], chromosome, layout)
+
+# ------------------ Per-chromosome statistics ------------------
+@route('/api/chromosome_stats', methods=['GET'])
+def api_chromosome_stats():
+    """
+    Count, mean, standard deviation, min, quartiles and max per chromosome of daf_beb, daf_pjl,
+    delta_af, fst_beb and fst_pjl; ?statistic= (repeatable) limits the statistics returned.
+    """
+    statistics = request.args.getlist('statistic') or None
+
+    def build():
+        stats = get_chromosome_stats(statistics, database_path())
+        stats["chromosome"] = stats["chromosome"].astype(str)
+        stats = stats.astype(object).where(stats.notna(), None)
+        return {"stats": stats.to_dict(orient="records")}
+    return conditional_json(build, 'chromosome_stats', repr(statistics))
+
+# ------------------ Genomic region queries ------------------
+def get_region_index():
+    """Returns (RegionIndex, data version it was built from), rebuilt in the background when the database changes."""
+    import Flask_derive_delta as fdd
+    return fdd.cached_snapshot("region_index", load_region_index, database_path())
+
+def region_filter(query):
+    """Returns a filter for the SNPs in a search box region ('chr:start-end' or 'GENE+flank')."""
+    index, _ = get_region_index()
+    intervals = index.intervals(parse_region(query))
+    if not intervals:
+        return false()
+    return or_(*[
+        (GeneticData.chromosome == chromosome) & GeneticData.position.between(start, end)
+        for chromosome, start, end in intervals
+    ])
+
+@route('/api/region/<path:region>', methods=['GET'])
+def api_region(region):
+    """
+    SNPs in a locus: /api/region/10:112950000-113170000, or around a gene with
+    /api/region/TCF7L2?flank=50kb (also written /api/region/TCF7L2+50kb).
+    """
+    try:
+        parsed = parse_region(region, parse_size(request.args.get('flank', '0')))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    index, version = get_region_index()
+    intervals = index.intervals(parsed)
+    if not intervals:
+        return jsonify({"error": f"gene {parsed['gene']} has no mapped SNPs"}), 404
+
+    def build():
+        rows = index.rows(intervals)
+        rows = rows.astype(object).where(rows.notna(), None)
+        return {
+            "region": parsed,
+            "intervals": [{"chromosome": c, "start": start, "end": end} for c, start, end in intervals],
+            "count": len(rows),
+            "snps": rows.to_dict(orient="records"),
+        }
+    return conditional_json(build, 'region', version[1], repr(parsed))
+
+# ------------------ Selection scan over several statistics ------------------
+def get_selection_scan():
+    """Returns (SelectionScan, data version it was built from), rebuilt in the background when the database changes."""
+    import Flask_derive_delta as fdd
+    return fdd.cached_snapshot("selection_scan", load_selection_scan, database_path())
+
+@route('/api/selection_scan', methods=['GET'])
+def api_selection_scan():
+    """
+    Top SNPs on a composite of several statistics, e.g.
+    /api/selection_scan?statistic=fst_beb&statistic=delta_af&weight=2&weight=1&method=z&max_p_value=5e-8&k=50
+    statistic (repeatable, or comma separated): fst_beb, fst_pjl, delta_af, daf_beb, daf_pjl, p_value,
+    t2dkp_p_value, beta; p-values score as -log10(p) and beta as |beta|. weight: one per statistic (default 1).
+    method: rank (percentile ranks, the default) or z (z-scores). min_<statistic>/max_<statistic>: bounds
+    on the raw values. k: number of SNPs returned (default 100).
+    """
+    statistics = [name for value in request.args.getlist('statistic') for name in value.split(",") if name]
+    statistics = statistics or ["fst_beb", "fst_pjl", "delta_af"]
+    method = request.args.get('method', 'rank')
+    try:
+        weights = [float(w) for value in request.args.getlist('weight') for w in value.split(",") if w] or None
+        k = int(request.args.get('k', '100'))
+        bounds = {}
+        for name in SCAN_STATISTICS:
+            low, high = request.args.get(f'min_{name}', type=float), request.args.get(f'max_{name}', type=float)
+            if low is not None or high is not None:
+                bounds[name] = (low, high)
+        # arguments are checked before the conditional response, a bad request is never a 304
+        check_scan(statistics, weights, method, bounds)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    scan, version = get_selection_scan()
+
+    def build():
+        results, candidates = scan.scan(statistics, weights, method, bounds, k)
+        return {
+            "statistics": statistics,
+            "weights": weights or [1.0] * len(statistics),
+            "method": method,
+            "bounds": {name: {"min": low, "max": high} for name, (low, high) in bounds.items()},
+            "candidates": candidates,
+            "count": len(results),
+            "snps": results,
+        }
+    return conditional_json(build, 'selection_scan', version[1], statistics, weights, method, sorted(bounds.items()), k)
+
+# ------------------ Sliding-window scans ------------------
+def window_track(windows, column, name):
+    """Returns a line trace of a window column at the window midpoints, broken between chromosomes."""
+    chromosome = windows["chromosome"]
+    # a NaN point after the last window of each chromosome breaks the line
+    breaks = np.flatnonzero(chromosome[1:] != chromosome[:-1]) + 1
+    x = np.insert((windows["start"] + windows["end"]) / 2, breaks, np.nan)
+    y = np.insert(windows[column], breaks, np.nan)
+    text = np.insert(chromosome, breaks, "")
+    return go.Scattergl(x=x, y=y, text=text, mode="lines", name=name, connectgaps=False,
+                        hovertemplate="chr%{text}: %{y:.4f}<extra>" + name + "</extra>",
+                        line={"color": "black", "width": 1.5})
+
+@route('/api/windows', methods=['GET'])
+def api_windows():
+    """
+    Mean and max of FST, delta_af and DAF in sliding windows along each chromosome, e.g.
+    /api/windows?statistic=fst_beb&statistic=delta_af&size=100kb&step=50kb or ?mode=snps&size=50&step=10
+    statistic (repeatable, or comma separated): fst_beb, fst_pjl, delta_af, daf_beb, daf_pjl (default all).
+    mode: bp (the default) or snps. size: window size (default 1Mb or 100 SNPs). step: default half the size.
+    chromosome (repeatable): limit the scan to these chromosomes.
+    Returns one array per column: chromosome, start, end, n_snps, <statistic>_mean and <statistic>_max.
+    """
+    statistics = [name for value in request.args.getlist('statistic') for name in value.split(",") if name]
+    statistics = statistics or ["fst_beb", "fst_pjl", "delta_af", "daf_beb", "daf_pjl"]
+    mode = request.args.get('mode', 'bp')
+    chromosomes = request.args.getlist('chromosome') or None
+    store, version = get_column_store()
+    try:
+        size, step = parse_window(request.args.get('size', '1Mb' if mode == 'bp' else '100'), request.args.get('step'), mode)
+        # checked before the conditional response, the scan itself only runs in build()
+        check_window_scan(store, statistics, size, step, mode, chromosomes)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def build():
+        windows = scan_windows(store, statistics, size, step, mode, chromosomes)
+        columns = {}
+        for column, values in windows.items():
+            if values.dtype.kind == "f":
+                values = np.where(np.isnan(values), None, values)
+            columns[column] = values.tolist()
+        return {"statistics": statistics, "mode": mode, "size": size, "step": step,
+                "count": len(windows["n_snps"]), "windows": columns}
+    return conditional_json(build, 'windows', version[1], statistics, mode, size, step, chromosomes)
 
 # ------------------ allows user to download snps ------------------
-@app.route('/download/<snp_id>')
+@route('/download/<snp_id>')
 def download_snp(snp_id):
-    snp = GeneticData.query.get(snp_id)
+    snp = GeneticData.query.options(*ANNOTATIONS).filter_by(snp_id=snp_id).first()
     if not snp:
         flash("SNP not found.", "danger")
         return redirect(url_for('search'))
@@ -472,9 +871,8 @@ def download_snp(snp_id):
         content += "Pathways: -\n"
     
     # Include GO Term information
-    go_terms = get_go_terms(snp.snp_id)
-    if go_terms:
-        content += "GO Terms:\n" + "\n".join([f" - {term}" for term in go_terms]) + "\n"
+    if snp.go_terms:
+        content += "GO Terms:\n" + "\n".join([f" - {term.go_term}" for term in snp.go_terms]) + "\n"
     else:
         content += "GO Terms: -\n"
     
@@ -514,75 +912,58 @@ def download_snp(snp_id):
     response.headers['Content-Disposition'] = f'attachment; filename={filename}'
     return response
 
-@app.route('/download_selected', methods=['POST'])
+@route('/download_selected', methods=['POST'])
 def download_selected():
-    selected_ids = request.form.getlist('selected_snps')
+    selected_ids = sorted(set(request.form.getlist('selected_snps')))
     country = request.form.get('country', '').strip().lower()
+    export_format = request.form.get('format', 'txt').strip().lower()
+    compress = request.form.get('gzip') in ('1', 'on', 'true')
     if not selected_ids:
         flash("No SNPs selected for download.", "warning")
         return redirect(url_for('genetic_data_search'))
-    
-    snps = GeneticData.query.filter(GeneticData.snp_id.in_(selected_ids)).all()
-    content = ""
-    for snp in snps:
-        content += f"rsID: {snp.snp_id}\n"
-        content += f"Risk Allele: {snp.risk_allele}\n"
-        content += f"Gene: {snp.mapped_gene if snp.mapped_gene else '-'}\n"
-        content += f"Trait: {snp.trait}\n"
-        content += f"Phenotype: {snp.phenotype if snp.phenotype else '-'}\n"
-        content += f"T2DKP P-value: {snp.t2dkp_p_value if snp.t2dkp_p_value is not None else '-'}\n"
-        content += f"Beta: {snp.beta if snp.beta is not None else '-'}\n"
-        content += f"P-Value: {snp.p_value}\n"
-        content += f"Odds Ratio: {snp.odds_ratio}\n"
-        content += f"delta_af: {snp.delta_af if snp.delta_af is not None else '-'}\n"
-        content += f"daf_beb: {snp.daf_beb if snp.daf_beb is not None else '-'}\n"
-        content += f"daf_pjl: {snp.daf_pjl if snp.daf_pjl is not None else '-'}\n"
-        content += f"fst_beb: {snp.fst_beb if snp.fst_beb is not None else '-'}\n"
-        content += f"fst_pjl: {snp.fst_pjl if snp.fst_pjl is not None else '-'}\n"
-        content += f"Study Accession: {snp.study_accession}\n"
-        content += f"PubMed ID: {snp.pubmed_id}\n"
-        # Existing pathway information
-        if snp.pathways:
-            content += "Pathways:\n" + "\n".join([f" - {p.pathway_id}: {p.pathway_name}" for p in snp.pathways]) + "\n"
-        else:
-            content += "Pathways: -\n"
-        # Add GO term information
-        go_terms = get_go_terms(snp.snp_id)
-        if go_terms:
-            content += "GO Terms:\n" + "\n".join([f" - {term}" for term in go_terms]) + "\n"
-        else:
-            content += "GO Terms: -\n"
-        content += "\n--------------------------------\n\n"
+    if export_format not in EXPORT_FORMATS:
+        abort(400)
     
     if country == "pakistan":
-        filename = "pakistan.txt"
+        metrics = (
+            "\nMetric\tΔAF\tDAF\tREFERENCE\tANCESTRAL\n"
+            "Average\t0.5605\t0.5031\t0.5134\t0.5011\n"
+            "St Dev\t0.1165\t0.3086\t0.2936\t0.2852\n"
+        )
     elif country == "bangladesh":
-        filename = "bangladesh.txt"
+        metrics = (
+            "\nMetric\tΔAF\tDAF\tREFERENCE\tANCESTRAL\n"
+            "Average\t0.5605\t0.5017\t0.5159\t0.5013\n"
+            "St Dev\t0.1165\t0.3115\t0.2963\t0.2864\n"
+        )
     else:
-        filename = "selected_snps.txt"
-    
-    if country:
-        if country == "pakistan":
-            metrics = (
-                "\nMetric\tΔAF\tDAF\tREFERENCE\tANCESTRAL\n"
-                "Average\t0.5605\t0.5031\t0.5134\t0.5011\n"
-                "St Dev\t0.1165\t0.3086\t0.2936\t0.2852\n"
-            )
-        elif country == "bangladesh":
-            metrics = (
-                "\nMetric\tΔAF\tDAF\tREFERENCE\tANCESTRAL\n"
-                "Average\t0.5605\t0.5017\t0.5159\t0.5013\n"
-                "St Dev\t0.1165\t0.3115\t0.2963\t0.2864\n"
-            )
-        else:
-            metrics = ""
-        content += metrics
+        metrics = ""
 
-    response = Response(content, mimetype='text/plain')
+    # SNPs and their annotations are fetched EXPORT_BATCH_SIZE at a time while the response is sent
+    def batches():
+        for start in range(0, len(selected_ids), EXPORT_BATCH_SIZE):
+            chunk = selected_ids[start:start + EXPORT_BATCH_SIZE]
+            yield GeneticData.query.options(*ANNOTATIONS).filter(
+                GeneticData.snp_id.in_(chunk)
+            ).order_by(GeneticData.snp_id).all()
+
+    columns = [column.name for column in GeneticData.__table__.columns]
+    body = export_chunks(batches(), export_format, columns, metrics)
+    mimetype, extension = EXPORT_FORMATS[export_format]
+    if country in ("pakistan", "bangladesh"):
+        filename = f"{country}.{extension}"
+    else:
+        filename = f"selected_snps.{extension}"
+    if compress:
+        body = gzip_chunks(body)
+        mimetype = "application/gzip"
+        filename += ".gz"
+
+    response = Response(stream_with_context(body), mimetype=mimetype)
     response.headers['Content-Disposition'] = f'attachment; filename={filename}'
     return response
 
-@app.route("/test_db")
+@route("/test_db")
 def test_db():
     results = GeneticData.query.limit(5).all()
     if not results:
@@ -593,20 +974,20 @@ def test_db():
     output += "</ul>"
     return output
 
-@app.route("/init_db")
+@route("/init_db")
 def init_db():
-    with app.app_context():
-        db.create_all()
+    db.create_all()
+    migrate(database_path())
     return " Database initialized successfully!"
 
 # ---------- new route for FST visualisation ----------
-@app.route('/fst_tool')
+@route('/fst_tool')
 def fst_tool():
     # Ensure that your fst.html is in the templates/ folder.
     return render_template('fst.html')
 
 # ---------- new route for SNP_GO column information ----------
-@app.route('/snp_go_columns')
+@route('/snp_go_columns')
 def snp_go_columns():
     """
     Returns the column information for the snp_go table as JSON.
@@ -617,16 +998,96 @@ def snp_go_columns():
     return jsonify(columns)
 
 # ---------- default route----------
-@app.route('/default')
+@route('/default')
 def default_callable():
     query_list = ["fst_plot"]
     return "Please type the query you want after / . Thank you." + str(query_list)
 
-if __name__ == "__main__":
+# ------------------ APPLICATION FACTORY ------------------
+def create_app(config=None):
+    """
+    Builds the Flask application: default_config() updated with config (a dict), the extensions
+    and every registered route, then creates the tables and migrates the database (init_database).
+    Used by wsgi.py for the production server, by flask --app app run and by __main__ below.
+    """
+    app = Flask(__name__)
+    app.config.update(default_config())
+    if config:
+        app.config.update(config)
+    app.config.setdefault('SQLALCHEMY_DATABASE_URI', f"sqlite:///{app.config['GENETICS_DB_PATH']}")
+    os.makedirs(os.path.dirname(os.path.abspath(app.config['GENETICS_DB_PATH'])), exist_ok=True)
+
+    db.init_app(app)
+    bcrypt.init_app(app)
+    login_manager.init_app(app)
+    app.extensions["figure_cache"] = FigureCache(app.config['FIGURE_CACHE_SIZE'], app.config['FIGURE_CACHE_DIR'])
+    app.extensions["response_cache"] = ResponseCache(app.config['RESPONSE_CACHE_BYTES'])
+    # Register the helper as a template global so it can be used in Jinja templates
+    app.jinja_env.globals.update(get_go_terms=get_go_terms)
+
+    for rule, options, view in routes:
+        app.add_url_rule(rule, view_func=view, **options)
+    app.after_request(log_query_count)
+
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", count_query)
+        # WAL journal and the write tuning on every SQLAlchemy connection (db_access.WRITE_PRAGMAS)
+        event.listen(db.engine, "connect", set_write_pragmas)
+    init_database(app)
+    return app
+
+def init_database(app):
+    """Creates the tables and applies the schema migrations."""
     try:
         with app.app_context():
             db.create_all()
             print(" Database tables created successfully.")
+        migrate(app.config['GENETICS_DB_PATH'])
     except Exception as e:
         print(f" Error during database initialization: {str(e)}")
-    app.run(debug=True)
+
+# ------------------ Shared state for pre-forking servers ------------------
+def preload_shared_state(app):
+    """
+    Builds the expensive read-only state once: the processed SNP data, the column store, the
+    region index, the selection scan columns, the FST background of the empirical p-values and the
+    summary figures. Called in the master of a pre-forking server
+    (wsgi.py) so the forked workers share it copy-on-write instead of each rebuilding it on its
+    first request.
+    """
+    import Flask_derive_delta as fdd
+    with app.app_context():
+        try:
+            fdd.get_processed_data(database_path())
+            get_column_store()
+            get_region_index()
+            get_selection_scan()
+            get_fst_background()
+        except Exception as e:
+            print(f" Could not preload the SNP data: {str(e)}")
+        warm_up_figures()
+
+def release_connections(app):
+    """Closes every database connection of this process, so none is inherited by a forked worker."""
+    import Flask_derive_delta as fdd
+    with app.app_context():
+        db.engine.dispose()
+    close_connections()
+    fdd.close_version_connection()
+
+def after_fork(app):
+    """
+    Runs in each forked worker: starts a new SQLAlchemy pool and resets the cached data to this
+    process (its locks, rebuild state and data version connection) while keeping the snapshots.
+    """
+    import Flask_derive_delta as fdd
+    with app.app_context():
+        db.engine.dispose(close=False)
+    fdd.after_fork()
+
+if __name__ == "__main__":
+    # development server, FLASK_DEBUG=1 turns on the debugger and the reloader
+    app = create_app()
+    with app.app_context():
+        warm_up_figures()
+    app.run()
@@ -0,0 +1,63 @@
+# chromosome_stats.py
+#reads the per-chromosome statistics kept by the loader (chromosome_stats table), shared by the summary plots, the views and the APIs
+#import os and sys to reach the loader and SummaryStatsCalculations modules, pandas for handling data, plotly for the precomputed box plots and db_access for the reads
+import os
+import sys
+import pandas as pd
+import plotly.graph_objects as go
+from db_access import get_read_connection
+
+# the statistics are computed by the same code the loader uses
+sys.path.append(os.path.join(os.path.abspath(os.path.dirname(__file__)), "..", "instance"))
+from summaries import STATS_TABLE_COLUMNS, compute_chromosome_stats
+
+# chromosomes are drawn in the genomic order shared with the SummaryStatsCalculations scripts
+sys.path.append(os.path.join(os.path.abspath(os.path.dirname(__file__)), "..", "SummaryStatsCalculations"))
+from parallel import sort_chromosomes
+
+
+#function to read the per-chromosome statistics
+def get_chromosome_stats(statistics, db_path):
+    """
+    Returns the chromosome_stats rows (chromosome, statistic, n, mean, std, min, q1, median, q3,
+    max) of the database at db_path for the given statistics (all when None), with chromosome as
+    an ordered categorical in genomic order. A database without the table is summarised from the
+    snp table instead.
+    """
+    conn = get_read_connection(db_path)
+    try:
+        stats = pd.read_sql_query(f"SELECT {', '.join(STATS_TABLE_COLUMNS)} FROM chromosome_stats", conn)
+    except pd.errors.DatabaseError:
+        stats = compute_chromosome_stats(pd.read_sql_query("SELECT * FROM snp WHERE chromosome IS NOT NULL", conn))
+    if statistics is not None:
+        stats = stats[stats["statistic"].isin(statistics)]
+    chromosomes = stats["chromosome"].astype(str).str.strip()
+    order = sort_chromosomes(set(chromosomes))
+    stats = stats.assign(chromosome=pd.Categorical(chromosomes, categories=order, ordered=True))
+    return stats.sort_values(["chromosome", "statistic"]).reset_index(drop=True)
+
+
+#function to pick one value per chromosome and statistic
+def chromosome_table(stats, value="mean"):
+    """Returns a DataFrame with a chromosome column and one column per statistic holding value (e.g. mean)."""
+    table = stats.pivot(index="chromosome", columns="statistic", values=value)
+    table.columns.name = None
+    return table.reset_index()
+
+
+#function to draw box plots from the precomputed quartiles
+def plot_box(stats, statistic, title, label):
+    """
+    Returns a plotly box plot of statistic per chromosome built from the stored quartiles, so the
+    page carries 7 numbers per chromosome instead of every SNP. Whiskers span the min and max.
+    """
+    rows = stats[(stats["statistic"] == statistic) & (stats["n"] > 0)]
+    fig = go.Figure(go.Box(
+        x=rows["chromosome"].astype(str),
+        q1=rows["q1"], median=rows["median"], q3=rows["q3"],
+        lowerfence=rows["min"], upperfence=rows["max"],
+        mean=rows["mean"], sd=rows["std"].fillna(0),
+        name=label,
+    ))
+    fig.update_layout(title=title, xaxis_title="Chromosome", yaxis_title=label)
+    return fig
@@ -0,0 +1,110 @@
+# db_access.py
+#one place to open SQLite connections: pooled read-only connections for the analytic routes and the pragmas every connection uses
+#import os and threading for the per-thread pool, pathname2url to build the read-only URI, sqlite3 and pandas for the queries
+import os
+import threading
+import sqlite3
+from urllib.request import pathname2url
+import pandas as pd
+
+# tuning for the read-only connections of the analytic routes
+READ_PRAGMAS = {
+    "mmap_size": 268435456,  # 256 MB of the file read through the page cache of the OS
+    "cache_size": -65536,  # 64 MB page cache per connection
+    "temp_store": "MEMORY",
+}
+# tuning for the connections that write (SQLAlchemy), WAL lets readers run while they commit
+WRITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "cache_size": -16384,
+}
+# compiled statements kept per connection, so repeated queries skip the SQL parser
+CACHED_STATEMENTS = 256
+
+
+#function to apply pragmas to a connection
+def apply_pragmas(conn, pragmas):
+    cursor = conn.cursor()
+    for name, value in pragmas.items():
+        cursor.execute(f"PRAGMA {name} = {value}")
+    cursor.close()
+
+
+#function to open a read-only connection
+def connect_read_only(path, **kwargs):
+    """Opens path through a mode=ro URI (it cannot write, even by mistake) with READ_PRAGMAS applied."""
+    uri = f"file:{pathname2url(os.path.abspath(path))}?mode=ro"
+    conn = sqlite3.connect(uri, uri=True, cached_statements=CACHED_STATEMENTS, **kwargs)
+    apply_pragmas(conn, READ_PRAGMAS)
+    return conn
+
+
+class ConnectionPool:
+    """
+    Keeps one read-only connection per thread and database path, so a request reuses its thread's
+    connection (and its statement cache) instead of opening a new one, and threads never share one.
+    The pool starts over in a forked child, connections must not cross a fork.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+        self._pid = os.getpid()
+
+    def connection(self, path):
+        if os.getpid() != self._pid:
+            self._after_fork()
+        connections = getattr(self._local, "connections", None)
+        if connections is None:
+            connections = self._local.connections = {}
+        conn = connections.get(path)
+        if conn is None:
+            conn = connections[path] = connect_read_only(path)
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def _after_fork(self):
+        # the inherited connections belong to the parent, drop them without closing
+        self._local = threading.local()
+        with self._lock:
+            self._connections = []
+        self._pid = os.getpid()
+
+    def close_all(self):
+        """Closes every pooled connection, e.g. before forking worker processes."""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                pass  # owned by another thread, it goes away with it
+        self._local = threading.local()
+
+
+_pool = ConnectionPool()
+
+
+#function to return the pooled read-only connection of the current thread
+def get_read_connection(path):
+    return _pool.connection(path)
+
+
+#function to run a read query on the database at path into a DataFrame over the pooled connection
+def read_sql(sql, path, params=None):
+    return pd.read_sql_query(sql, get_read_connection(path), params=params)
+
+
+#function to close the pooled connections
+def close_connections():
+    _pool.close_all()
+
+
+#function to set the pragmas of a connection opened by SQLAlchemy
+def set_write_pragmas(dbapi_connection, connection_record=None):
+    """SQLAlchemy "connect" listener: WAL journal, NORMAL sync and a busy timeout on every pooled connection."""
+    apply_pragmas(dbapi_connection, WRITE_PRAGMAS)
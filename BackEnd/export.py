@@ -0,0 +1,105 @@
+# export.py
+#formats SNPs for the bulk download as text, TSV or JSON Lines, one chunk at a time so the response can stream
+#import json for the JSON Lines rows and zlib for the gzip output
+import json
+import zlib
+
+# export formats offered by /download_selected with their mimetype and file extension
+EXPORT_FORMATS = {
+    "txt": ("text/plain", "txt"),
+    "tsv": ("text/tab-separated-values", "tsv"),
+    "jsonl": ("application/x-ndjson", "jsonl"),
+}
+# SNPs fetched (with their annotations) per query while streaming
+EXPORT_BATCH_SIZE = 500
+
+
+#function to write one SNP in the plain text layout of the original download
+def snp_text(snp):
+    content = (
+        f"rsID: {snp.snp_id}\n"
+        f"Risk Allele: {snp.risk_allele}\n"
+        f"Gene: {snp.mapped_gene if snp.mapped_gene else '-'}\n"
+        f"Trait: {snp.trait}\n"
+        f"Phenotype: {snp.phenotype if snp.phenotype else '-'}\n"
+        f"T2DKP P-value: {snp.t2dkp_p_value if snp.t2dkp_p_value is not None else '-'}\n"
+        f"Beta: {snp.beta if snp.beta is not None else '-'}\n"
+        f"P-Value: {snp.p_value}\n"
+        f"Odds Ratio: {snp.odds_ratio}\n"
+        f"delta_af: {snp.delta_af if snp.delta_af is not None else '-'}\n"
+        f"daf_beb: {snp.daf_beb if snp.daf_beb is not None else '-'}\n"
+        f"daf_pjl: {snp.daf_pjl if snp.daf_pjl is not None else '-'}\n"
+        f"fst_beb: {snp.fst_beb if snp.fst_beb is not None else '-'}\n"
+        f"fst_pjl: {snp.fst_pjl if snp.fst_pjl is not None else '-'}\n"
+        f"Study Accession: {snp.study_accession}\n"
+        f"PubMed ID: {snp.pubmed_id}\n"
+    )
+    # Existing pathway information
+    if snp.pathways:
+        content += "Pathways:\n" + "\n".join([f" - {p.pathway_id}: {p.pathway_name}" for p in snp.pathways]) + "\n"
+    else:
+        content += "Pathways: -\n"
+    # Add GO term information
+    if snp.go_terms:
+        content += "GO Terms:\n" + "\n".join([f" - {term.go_term}" for term in snp.go_terms]) + "\n"
+    else:
+        content += "GO Terms: -\n"
+    return content + "\n--------------------------------\n\n"
+
+
+#function to make a value safe for a TSV cell
+def tsv_value(value):
+    if value is None:
+        return ""
+    return str(value).replace("\t", " ").replace("\r", " ").replace("\n", " ")
+
+
+#function to write the TSV header line
+def tsv_header(columns):
+    return "\t".join(list(columns) + ["pathways", "go_terms"]) + "\n"
+
+
+#function to write one SNP as a TSV line, annotations joined with ';'
+def snp_tsv(snp, columns):
+    values = [tsv_value(getattr(snp, column)) for column in columns]
+    values.append(tsv_value(";".join(f"{p.pathway_id}: {p.pathway_name}" for p in snp.pathways)))
+    values.append(tsv_value(";".join(term.go_term for term in snp.go_terms)))
+    return "\t".join(values) + "\n"
+
+
+#function to write one SNP as a JSON Lines record
+def snp_jsonl(snp, columns):
+    record = {column: getattr(snp, column) for column in columns}
+    record["pathways"] = [{"pathway_id": p.pathway_id, "pathway_name": p.pathway_name} for p in snp.pathways]
+    record["go_terms"] = [term.go_term for term in snp.go_terms]
+    return json.dumps(record) + "\n"
+
+
+#generator for the body of an export
+def export_chunks(batches, export_format, columns, footer=""):
+    """
+    Yields the export as one string per batch of SNPs. batches is an iterable of lists of SNPs with
+    their pathways and GO terms loaded; footer is appended to the text format only.
+    """
+    if export_format == "tsv":
+        yield tsv_header(columns)
+    for snps in batches:
+        if export_format == "tsv":
+            yield "".join(snp_tsv(snp, columns) for snp in snps)
+        elif export_format == "jsonl":
+            yield "".join(snp_jsonl(snp, columns) for snp in snps)
+        else:
+            yield "".join(snp_text(snp) for snp in snps)
+    if footer and export_format == "txt":
+        yield footer
+
+
+#generator that gzip-compresses a stream of strings
+def gzip_chunks(chunks):
+    """Yields a gzip file for the utf-8 encoded chunks, flushing after each so bytes go out as they are made."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 writes the gzip header and trailer
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8")) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
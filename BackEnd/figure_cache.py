@@ -0,0 +1,93 @@
+# figure_cache.py
+#cache of rendered base64 PNG figures so repeat page loads do not re-render matplotlib/seaborn plots
+#import os and hashlib for the on-disk tier, threading for the locks and OrderedDict for the LRU order
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+# pyplot keeps global state, so renders are serialised across threads
+_render_lock = threading.Lock()
+
+
+class FigureCache:
+    """
+    Size-bounded LRU cache of rendered figures keyed on (plot function, data version, parameters).
+    With disk_dir set, figures are also written there so they survive restarts and are shared
+    between worker processes; the disk tier keeps at most max_disk_entries files.
+    """
+
+    def __init__(self, max_entries=32, disk_dir=None, max_disk_entries=256):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.max_disk_entries = max_disk_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    #function to build the cache key
+    @staticmethod
+    def key(plot_function, version, params):
+        name = f"{plot_function.__module__}.{plot_function.__qualname__}"
+        return hashlib.sha1(repr((name, version, sorted(params.items()))).encode()).hexdigest()
+
+    def _remember(self, key, figure):
+        with self._lock:
+            self._entries[key] = figure
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(os.path.join(self.disk_dir, key + ".b64")) as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _write_disk(self, key, figure):
+        if not self.disk_dir:
+            return
+        path = os.path.join(self.disk_dir, key + ".b64")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(figure)
+        os.replace(tmp_path, path)  # atomic, so other workers never read half a file
+        files = sorted((entry for entry in os.scandir(self.disk_dir) if entry.name.endswith(".b64")),
+                       key=lambda entry: entry.stat().st_mtime)
+        for entry in files[:max(0, len(files) - self.max_disk_entries)]:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+    #function to return a cached figure or render it
+    def get_or_render(self, plot_function, version, *data, **params):
+        """
+        Returns plot_function(*data, **params), rendering it only when no figure is cached for
+        (plot_function, version, params). data must be what version identifies, it is not part of the key.
+        """
+        key = self.key(plot_function, version, params)
+        with self._lock:
+            figure = self._entries.get(key)
+            if figure is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return figure
+            self.misses += 1
+        figure = self._read_disk(key)
+        if figure is None:
+            with _render_lock:
+                figure = plot_function(*data, **params)
+            self._write_disk(key, figure)
+        self._remember(key, figure)
+        return figure
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,40 @@
+# gunicorn.conf.py
+#settings of the production server, run from BackEnd with: gunicorn --config gunicorn.conf.py wsgi:app
+#
+#the master imports wsgi.py (preload_app) and builds the processed SNP data, the region index and the
+#summary figures once; the workers are forked from it and share that memory copy-on-write.
+#
+#benchmarking the worker/thread layout, every setting comes from the environment:
+#   WEB_CONCURRENCY=4 GUNICORN_THREADS=1 gunicorn --config gunicorn.conf.py wsgi:app
+#   WEB_CONCURRENCY=2 GUNICORN_THREADS=4 gunicorn --config gunicorn.conf.py wsgi:app
+#   WEB_CONCURRENCY=1 GUNICORN_THREADS=8 gunicorn --config gunicorn.conf.py wsgi:app
+#then load a CPU-bound and an I/O-bound route, e.g.
+#   ab -n 2000 -c 32 http://127.0.0.1:8000/api/daf-data/1
+#   ab -n 200 -c 8 "http://127.0.0.1:8000/delta_af"
+#and compare requests/s, latency percentiles and the memory of the workers (ps -o rss,pss or smem).
+#plots and pandas hold the GIL, so CPU-bound pages scale with workers; threads help the SQLite reads
+#and streaming downloads, which wait on I/O. FIGURE_CACHE_DIR lets the workers share rendered figures.
+import os
+import multiprocessing
+
+# address to listen on
+bind = os.environ.get("GUNICORN_BIND", "127.0.0.1:8000")
+# worker processes, one per core by default
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+# threads per worker (the gthread worker), each with its own pooled read-only connection
+threads = int(os.environ.get("GUNICORN_THREADS", "4"))
+worker_class = "gthread"
+# build the shared state in the master before forking
+preload_app = True
+# the first render of a large page and big exports can be slow
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "120"))
+# recycle a worker after this many requests (0 never does), a new worker is forked from the preloaded master
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG", "-")
+
+
+#hook run in each worker right after it is forked
+def post_fork(server, worker):
+    import wsgi
+    wsgi.after_fork()
@@ -0,0 +1,68 @@
+# lod.py
+#level-of-detail downsampling for the Plotly scatter plots, so the page size follows the screen and not the SNP count
+#import numpy for the binning and pandas for handling data
+import numpy as np
+import pandas as pd
+
+# default horizontal resolution in pixels and the limits accepted from the request
+DEFAULT_WIDTH = 1200
+MIN_WIDTH = 100
+MAX_WIDTH = 4000
+# number of top points kept in full when no threshold is given
+DEFAULT_MAX_OUTLIERS = 1000
+
+
+#function to read the screen width from the request arguments
+def screen_width(value):
+    """Parses a ?width= argument, clamped to a sensible range."""
+    try:
+        width = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_WIDTH
+    return min(max(width, MIN_WIDTH), MAX_WIDTH)
+
+
+#function to pick the default outlier threshold
+def default_threshold(values, max_outliers=DEFAULT_MAX_OUTLIERS):
+    """Returns the value of the max_outliers-th largest point, so the outliers kept stay bounded."""
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    if len(values) <= max_outliers:
+        return -np.inf
+    return np.partition(values, len(values) - max_outliers)[len(values) - max_outliers]
+
+
+#function to downsample a scatter plot
+def downsample_scatter(df, x, y, group="chromosome", threshold=None, bins=DEFAULT_WIDTH):
+    """
+    Returns the rows of df worth drawing: every point with y >= threshold is kept, and the dense
+    background of each group is cut into `bins` equal-width buckets along x of which only the
+    lowest and highest point are kept. The result has at most 2 * bins rows per group plus the
+    outliers, whatever the size of df. Rows without a numeric x or y (e.g. '-') are dropped.
+    """
+    df = df.assign(**{x: pd.to_numeric(df[x], errors="coerce"), y: pd.to_numeric(df[y], errors="coerce")})
+    df = df.dropna(subset=[x, y])
+    if threshold is None:
+        threshold = default_threshold(df[y])
+    y_values = df[y].to_numpy(dtype=float)
+    outlier = y_values >= threshold
+
+    background = np.flatnonzero(~outlier)
+    if len(background) == 0:
+        return df
+    group_codes = pd.factorize(df[group].to_numpy()[background])[0]
+    x_values = df[x].to_numpy(dtype=float)[background]
+    # equal-width buckets between the smallest and largest x of each group
+    lowest = pd.Series(x_values).groupby(group_codes).transform("min").to_numpy()
+    highest = pd.Series(x_values).groupby(group_codes).transform("max").to_numpy()
+    span = np.where(highest > lowest, highest - lowest, 1.0)
+    bucket = np.minimum(((x_values - lowest) / span * bins).astype(np.int64), bins - 1)
+    keys = group_codes.astype(np.int64) * bins + bucket
+
+    # sort by bucket then y, the first and last row of each bucket are its min and max
+    order = np.lexsort((y_values[background], keys))
+    sorted_keys = keys[order]
+    starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    ends = np.r_[starts[1:], len(order)] - 1
+    kept = np.union1d(background[order[starts]], background[order[ends]])
+    return df.iloc[np.union1d(kept, np.flatnonzero(outlier))]
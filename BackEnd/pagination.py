@@ -0,0 +1,94 @@
+# pagination.py
+#keyset (cursor) pagination for the search routes, so each page costs the same however many rows match
+#import base64 and json for the cursors and the sqlalchemy expressions for the keyset filter
+import base64
+import json
+from sqlalchemy import and_, or_, tuple_, false
+
+# rows per page when the request does not ask for a size, and the largest size accepted
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+#function to read the page size from the request arguments
+def page_size(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Parses a ?page_size= argument, clamped to 1..maximum."""
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return min(max(size, 1), maximum)
+
+
+#functions to turn a sort key into an opaque url-safe cursor and back
+def encode_cursor(key, direction):
+    payload = json.dumps({"d": direction, "k": list(key)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Returns (direction, key) for a cursor made by encode_cursor, raises ValueError if it is not one."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        direction, key = payload["d"], payload["k"]
+    except (ValueError, TypeError, KeyError) as e:
+        raise ValueError(f"invalid cursor: {cursor!r}") from e
+    if direction not in ("after", "before") or not isinstance(key, list):
+        raise ValueError(f"invalid cursor: {cursor!r}")
+    return direction, key
+
+
+#function to build the filter for the rows after (or before) a key
+def keyset_condition(columns, key, after=True):
+    """
+    Returns the condition for rows that sort after key (or before it) in ascending order of
+    columns, where NULL sorts first as in SQLite. Going forward from a key without NULLs this is
+    a single row-value comparison, which SQLite answers with a seek on a matching index.
+    """
+    if after and None not in key:
+        return tuple_(*columns) > tuple_(*key)
+    terms = []
+    prefix = []
+    for column, value in zip(columns, key):
+        if after:
+            beyond = column.is_not(None) if value is None else column > value
+        else:
+            beyond = false() if value is None else or_(column.is_(None), column < value)
+        terms.append(and_(*prefix, beyond))
+        prefix.append(column.is_(None) if value is None else column == value)
+    return or_(*terms)
+
+
+#function to fetch one page of a query
+def keyset_page(query, columns, key_of, cursor=None, size=DEFAULT_PAGE_SIZE):
+    """
+    Returns (rows, next_cursor, prev_cursor) for the page of query that the cursor points at,
+    ordered by columns. key_of(row) gives the values of columns for a row; the cursors are None
+    on the first and last page, and a cursor that is not one of this order raises ValueError.
+    Only size + 1 rows are ever read.
+    """
+    direction, key = decode_cursor(cursor) if cursor else ("after", None)
+    if key is not None and len(key) != len(columns):
+        raise ValueError(f"invalid cursor: {cursor!r}")
+    after = direction == "after"
+    if key is not None:
+        query = query.filter(keyset_condition(columns, key, after))
+    order = columns if after else [column.desc() for column in columns]
+    rows = query.order_by(None).order_by(*order).limit(size + 1).all()
+    more = len(rows) > size
+    rows = rows[:size]
+    if not after:
+        rows.reverse()
+    # going forward there is a previous page once we left the start, going back there is always a next one
+    has_next = more if after else key is not None
+    has_prev = key is not None if after else more
+    next_cursor = encode_cursor(key_of(rows[-1]), "after") if rows and has_next else None
+    prev_cursor = encode_cursor(key_of(rows[0]), "before") if rows and has_prev else None
+    return rows, next_cursor, prev_cursor
+
+
+#function to count the matches of a query up to a limit
+def count_estimate(query, limit):
+    """Returns the number of rows of query as a string, or "<limit>+" once it has more than limit."""
+    count = query.order_by(None).limit(limit + 1).count()
+    return f"{limit}+" if count > limit else str(count)
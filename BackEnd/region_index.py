@@ -0,0 +1,131 @@
+# region_index.py
+#in-memory interval index over SNP positions, answering locus (chromosome:start-end) and gene window queries
+#import re to parse the region syntax, numpy for the sorted arrays and db_access to read the snp table
+import re
+import numpy as np
+from db_access import read_sql
+
+# columns returned for the SNPs in a region
+REGION_COLUMNS = ["snp_id", "chromosome", "position", "risk_allele", "mapped_gene", "p_value",
+                  "delta_af", "daf_beb", "daf_pjl", "fst_beb", "fst_pjl"]
+
+# sizes such as 1500, 1,500, 50kb or 1.5Mb
+SIZE = r"\d[\d,]*(?:\.\d+)?\s*(?:[kKmM][bB]?|[bB][pP])?"
+# chr10:112,950,000-113,170,000 (the chr prefix is optional)
+INTERVAL_PATTERN = re.compile(rf"^(?:chr)?(\w+)\s*:\s*({SIZE})\s*-\s*({SIZE})$", re.IGNORECASE)
+# TCF7L2 or TCF7L2+50kb, a gene with an optional flank on both sides
+GENE_PATTERN = re.compile(rf"^([A-Za-z][\w.\-]*?)(?:\s*(?:\+|±|\+/-)\s*({SIZE}))?$")
+# mapped_gene holds lists like "CDKAL1, SOX4" and intergenic pairs like "LINC01 - TCF7L2"
+GENE_SEPARATOR = re.compile(r"\s*[,;]\s*|\s+-\s+")
+
+
+#function to parse a size in base pairs
+def parse_size(value):
+    """Turns '1,500', '50kb' or '1.5Mb' into a number of base pairs."""
+    match = re.fullmatch(r"([\d,]+(?:\.\d+)?)\s*([kKmM]?)[bB]?[pP]?", value.strip())
+    if not match:
+        raise ValueError(f"invalid size: {value!r}")
+    scale = {"": 1, "k": 1_000, "m": 1_000_000}[match.group(2).lower()]
+    return int(float(match.group(1).replace(",", "")) * scale)
+
+
+#function to write chromosome names the way the snp table does
+def normalize_chromosome(chromosome):
+    chromosome = str(chromosome).strip()
+    if chromosome.lower().startswith("chr"):
+        chromosome = chromosome[3:]
+    return chromosome.upper()
+
+
+#function to parse a region string
+def parse_region(region, flank=0):
+    """
+    Parses 'chr:start-end' into {"chromosome", "start", "end"} and 'GENE' or 'GENE+flank' into
+    {"gene", "flank"}, where flank (in bp) defaults to the flank argument. Raises ValueError otherwise.
+    """
+    region = region.strip()
+    match = INTERVAL_PATTERN.match(region)
+    if match:
+        start, end = parse_size(match.group(2)), parse_size(match.group(3))
+        if start > end:
+            raise ValueError(f"region start is after its end: {region!r}")
+        return {"chromosome": normalize_chromosome(match.group(1)), "start": start, "end": end}
+    match = GENE_PATTERN.match(region)
+    if match:
+        return {"gene": match.group(1).upper(), "flank": parse_size(match.group(2)) if match.group(2) else flank}
+    raise ValueError(f"invalid region: {region!r}")
+
+
+#function to tell whether a search box query is written in the region syntax
+def is_region_query(query):
+    """True for 'chr:start-end' and 'GENE+flank'; a bare gene name stays a text search."""
+    query = query.strip()
+    if INTERVAL_PATTERN.match(query):
+        return True
+    match = GENE_PATTERN.match(query)
+    return bool(match and match.group(2))
+
+
+class RegionIndex:
+    """
+    SNPs sorted by (chromosome, position) with the offsets of each chromosome, so the SNPs in an
+    interval are found with two binary searches (O(log n)) and returned as one slice. Gene windows
+    span the positions of the SNPs mapped to the gene.
+    """
+
+    def __init__(self, df):
+        df = df.dropna(subset=["chromosome", "position"]).copy()
+        df["chromosome"] = df["chromosome"].map(normalize_chromosome)
+        df["position"] = df["position"].astype(np.int64)
+        self.df = df.sort_values(["chromosome", "position", "snp_id"], kind="mergesort").reset_index(drop=True)
+        self.positions = self.df["position"].to_numpy()
+        chromosomes = self.df["chromosome"].to_numpy()
+        starts = np.flatnonzero(np.r_[True, chromosomes[1:] != chromosomes[:-1]]) if len(chromosomes) else []
+        ends = np.r_[starts[1:], len(chromosomes)] if len(chromosomes) else []
+        self.offsets = {chromosomes[start]: (int(start), int(end)) for start, end in zip(starts, ends)}
+        self.genes = self._gene_spans()
+
+    def _gene_spans(self):
+        genes = self.df[["mapped_gene", "chromosome", "position"]].dropna(subset=["mapped_gene"])
+        genes = genes.assign(gene=genes["mapped_gene"].astype(str).str.strip().str.split(GENE_SEPARATOR)).explode("gene")
+        genes["gene"] = genes["gene"].str.strip().str.upper()
+        genes = genes[genes["gene"].ne("") & genes["gene"].ne("-")]
+        spans = genes.groupby(["gene", "chromosome"])["position"].agg(["min", "max"]).reset_index()
+        result = {}
+        for gene, chromosome, start, end in spans.itertuples(index=False, name=None):
+            result.setdefault(gene, []).append((chromosome, int(start), int(end)))
+        return result
+
+    #function to find the rows of an interval
+    def interval(self, chromosome, start, end):
+        """Returns the slice of self.df holding the SNPs with start <= position <= end."""
+        bounds = self.offsets.get(normalize_chromosome(chromosome))
+        if bounds is None:
+            return slice(0, 0)
+        low, high = bounds
+        positions = self.positions[low:high]
+        return slice(low + int(np.searchsorted(positions, start, "left")),
+                     low + int(np.searchsorted(positions, end, "right")))
+
+    #function to resolve a parsed region into intervals
+    def intervals(self, region):
+        """Returns [(chromosome, start, end)] for a parse_region result, empty for an unknown gene."""
+        if "gene" not in region:
+            return [(region["chromosome"], region["start"], region["end"])]
+        flank = region["flank"]
+        return [(chromosome, max(start - flank, 0), end + flank)
+                for chromosome, start, end in self.genes.get(region["gene"], [])]
+
+    #function to return the SNPs of a list of intervals
+    def rows(self, intervals, columns=REGION_COLUMNS):
+        slices = [self.interval(*interval) for interval in intervals]
+        if len(slices) == 1:
+            return self.df.iloc[slices[0]][columns]
+        # gene windows on the same chromosome may overlap, keep each SNP once in index order
+        rows = np.unique(np.concatenate([np.arange(s.start, s.stop) for s in slices] or [[]]).astype(np.int64))
+        return self.df.iloc[rows][columns]
+
+
+#function to build the index from the database
+def load_region_index(db_path):
+    return RegionIndex(read_sql(f"SELECT {', '.join(REGION_COLUMNS)} FROM snp", path=db_path))
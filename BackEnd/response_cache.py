@@ -0,0 +1,87 @@
+# response_cache.py
+#in-process cache of serialized API responses, so repeated calls with the same arguments skip the queries
+#import hashlib for the keys, threading for the lock and OrderedDict for the LRU order
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """
+    LRU cache of response bodies (bytes) bounded by their total size, max_bytes. Entries belong to
+    the data version they were built from: the first lookup with another version empties the cache,
+    so nothing computed from older data is ever returned. A body larger than max_entry_bytes
+    (a quarter of the budget by default) is returned without being cached.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, max_entry_bytes=None):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes if max_entry_bytes is not None else max_bytes // 4
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    #function to build the cache key
+    @staticmethod
+    def key(parts):
+        return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+    def _check_version(self, version):
+        # called with the lock held
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self.size = 0
+            self._version = version
+
+    def _remember(self, key, body):
+        self._entries[key] = body
+        self.size += len(body)
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+            self.evictions += 1
+
+    #function to return a cached body or build it
+    def get_or_build(self, version, build, *key):
+        """Returns the body cached for key at version, otherwise build() (bytes), cached if it fits."""
+        key = self.key(key)
+        with self._lock:
+            self._check_version(version)
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return body
+            self.misses += 1
+        body = build()
+        if len(body) <= self.max_entry_bytes:
+            with self._lock:
+                # the data may have changed while building, never cache under a newer version
+                if version == self._version and key not in self._entries:
+                    self._remember(key, body)
+        return body
+
+    def stats(self):
+        """Returns the counters, the number of entries and the bytes they take."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
@@ -0,0 +1,156 @@
+# selection_scan.py
+#ranks SNPs on a weighted combination of FST, delta_af, DAF and GWAS statistics held as NumPy columns in memory
+#import numpy for the columns and the top-k selection, pandas to read them and the column store shared by the loader
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+# the memory-mapped column store is written by the loader modules
+sys.path.append(os.path.join(os.path.abspath(os.path.dirname(__file__)), "..", "instance"))
+from column_store import open_column_store
+
+# statistics offered by the scan: the snp column and how it is turned into a score where larger means stronger evidence
+SCAN_STATISTICS = {
+    "fst_beb": ("fst_beb", "value"),
+    "fst_pjl": ("fst_pjl", "value"),
+    "delta_af": ("delta_af", "value"),
+    "daf_beb": ("daf_beb", "value"),
+    "daf_pjl": ("daf_pjl", "value"),
+    "p_value": ("p_value", "neglog10"),
+    "t2dkp_p_value": ("t2dkp_p_value", "neglog10"),
+    "beta": ("beta", "abs"),
+}
+# ways of putting the statistics on one scale before they are combined
+SCAN_METHODS = ("rank", "z")
+# largest number of SNPs a scan returns
+MAX_TOP_K = 10000
+
+
+#function to turn p-values into -log10(p), values outside (0, 1] become missing
+def neg_log10(p):
+    p = np.where((p > 0) & (p <= 1), p, np.nan)
+    return -np.log10(np.maximum(p, np.finfo(float).tiny))
+
+
+#function to rank values, ties get their average rank
+def percentile_ranks(values):
+    """Returns the rank of each value divided by the number of values present, in (0, 1]; NaN stays NaN."""
+    ranks = np.full(len(values), np.nan)
+    present = ~np.isnan(values)
+    if present.any():
+        _, inverse, counts = np.unique(values[present], return_inverse=True, return_counts=True)
+        average = np.cumsum(counts) - (counts - 1) / 2
+        ranks[present] = average[inverse] / present.sum()
+    return ranks
+
+
+#function to standardise values
+def z_scores(values):
+    present = values[~np.isnan(values)]
+    if len(present) < 2 or present.std() == 0:
+        return np.where(np.isnan(values), np.nan, 0.0)
+    return (values - present.mean()) / present.std()
+
+
+#function to check the arguments of a scan
+def check_scan(statistics, weights=None, method="rank", bounds=None):
+    """Returns the weights as an array (1 per statistic by default), raises ValueError for invalid arguments."""
+    unknown = [name for name in list(statistics) + list(bounds or {}) if name not in SCAN_STATISTICS]
+    if unknown or not statistics:
+        raise ValueError(f"unknown statistics: {', '.join(unknown)}" if unknown else "no statistics given")
+    if method not in SCAN_METHODS:
+        raise ValueError(f"unknown method: {method!r}")
+    weights = np.asarray(weights if weights is not None else [1.0] * len(statistics), dtype=float)
+    if len(weights) != len(statistics) or (weights < 0).any() or weights.sum() <= 0:
+        raise ValueError("weights must be one non-negative number per statistic")
+    return weights
+
+
+class SelectionScan:
+    """
+    The scan statistics of every SNP as NumPy columns, with their ranks and z-scores computed once,
+    so a scan is a weighted sum of a few columns and a partial selection of the top k (O(n), no sort
+    of all SNPs). Missing and non-numeric values (e.g. '-') are NaN.
+    """
+
+    def __init__(self, df):
+        self.snp_id = df["snp_id"].to_numpy(dtype=object)
+        self.chromosome = df["chromosome"].astype(str).str.strip().to_numpy(dtype=object)
+        self.position = pd.to_numeric(df["position"], errors="coerce").to_numpy(dtype=float)
+        self.values, self.ranks, self.z = {}, {}, {}
+        for name, (column, transform) in SCAN_STATISTICS.items():
+            values = pd.to_numeric(df[column], errors="coerce").to_numpy(dtype=float)
+            if transform == "neglog10":
+                score = neg_log10(values)
+            elif transform == "abs":
+                score = np.abs(values)
+            else:
+                score = values
+            self.values[name] = values
+            self.ranks[name] = percentile_ranks(score)
+            self.z[name] = z_scores(score)
+
+    def __len__(self):
+        return len(self.snp_id)
+
+    #function to apply the thresholds
+    def within_bounds(self, bounds):
+        """Returns a boolean mask of the SNPs whose raw values lie within bounds, {statistic: (minimum or None, maximum or None)}."""
+        mask = np.ones(len(self), dtype=bool)
+        for name, (low, high) in bounds.items():
+            values = self.values[name]
+            with np.errstate(invalid="ignore"):
+                if low is not None:
+                    mask &= values >= low
+                if high is not None:
+                    mask &= values <= high
+        return mask
+
+    #function to run a scan
+    def scan(self, statistics, weights=None, method="rank", bounds=None, k=100):
+        """
+        Scores each SNP that has every statistic and lies within bounds with the weighted mean of
+        the percentile ranks (method="rank") or z-scores (method="z") of statistics, and returns
+        (rows of the k best, number of SNPs scored), best first. Raises ValueError for invalid
+        arguments (check_scan).
+        """
+        weights = check_scan(statistics, weights, method, bounds)
+        normalised = self.ranks if method == "rank" else self.z
+
+        # a missing statistic makes the score NaN, which leaves the SNP out
+        score = normalised[statistics[0]] * (weights[0] / weights.sum())
+        for name, weight in zip(statistics[1:], weights[1:]):
+            score += normalised[name] * (weight / weights.sum())
+        if bounds:
+            score[~self.within_bounds(bounds)] = np.nan
+        score = np.negative(score, out=score)  # ascending order puts the best first and NaN last
+        scored = len(score) - int(np.isnan(score).sum())
+
+        k = min(max(int(k), 0), MAX_TOP_K, scored)
+        if k == 0:
+            return [], scored
+        top = np.argpartition(score, k - 1)[:k] if k < len(score) else np.arange(len(score))
+        top = top[np.argsort(score[top], kind="stable")][:k]  # only the k selected are sorted
+        return [self.row(i, -score[i], statistics, normalised) for i in top], scored
+
+    #function to describe one SNP of a scan result
+    def row(self, i, score, statistics, normalised):
+        row = {
+            "snp_id": self.snp_id[i],
+            "chromosome": self.chromosome[i],
+            "position": None if np.isnan(self.position[i]) else int(self.position[i]),
+            "score": float(score),
+        }
+        for name in statistics:
+            row[name] = float(self.values[name][i])
+            row[f"{name}_normalised"] = float(normalised[name][i])
+        return row
+
+
+#function to build the scan columns from the column store of the database
+def load_selection_scan(db_path):
+    """The raw values stay mapped from the store; SNPs without a chromosome or position are not in it."""
+    columns = sorted({column for column, _ in SCAN_STATISTICS.values()})
+    store = open_column_store(db_path)
+    return SelectionScan(store.frame(["snp_id", "chromosome", "position"] + columns))
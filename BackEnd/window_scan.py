@@ -0,0 +1,220 @@
+# window_scan.py
+#sliding-window means and maxima of FST, delta_af and DAF along each chromosome, in windows of fixed bp or fixed SNP count
+#run: python window_scan.py --db instance/genetics.db --size 1Mb --permutations 1000 (adds the significance of the delta_af window means)
+#import numpy for the prefix sums and the window bounds, deque for the sliding maxima, pandas to write the windows, argparse for the command line
+import argparse
+import os
+import sys
+from collections import deque
+import numpy as np
+import pandas as pd
+from region_index import parse_size
+
+# the column store is written by the loader modules, the resampling and the sample sizes live with the summary statistic scripts
+sys.path.append(os.path.join(os.path.abspath(os.path.dirname(__file__)), "..", "instance"))
+from column_store import open_column_store
+sys.path.append(os.path.join(os.path.abspath(os.path.dirname(__file__)), "..", "SummaryStatsCalculations"))
+from FST import SAMPLE_SIZES
+from resampling import delta_af, window_permutation_pvalues, window_bootstrap_intervals, add_resampling_arguments
+
+# statistics that can be scanned, columns of the column store
+WINDOW_STATISTICS = ["fst_beb", "fst_pjl", "delta_af", "daf_beb", "daf_pjl"]
+# window modes: size and step in base pairs, or in SNPs
+WINDOW_MODES = ("bp", "snps")
+# largest number of windows one scan may produce before empty bp windows are dropped
+MAX_WINDOWS = 2_000_000
+
+
+#function to compute the maximum of each window of a chromosome
+def sliding_max(values, lo, hi):
+    """
+    Returns the maximum of values[lo:hi] per window, for windows whose lo and hi never decrease.
+    The window bounds cut the values into segments whose maxima come from one reduceat pass; a
+    monotonic deque then slides over the segments, so the cost is linear in the SNPs and the
+    windows. Missing values (NaN) are ignored; a window of only NaN gives NaN.
+    """
+    result = np.full(len(lo), np.nan)
+    if len(lo) == 0:
+        return result
+    bounds = np.unique(np.r_[lo, hi])
+    segments = np.fmax.reduceat(values[:bounds[-1]], bounds[:-1])
+    segments = np.where(np.isnan(segments), -np.inf, segments).tolist()
+    first, last = np.searchsorted(bounds, lo).tolist(), np.searchsorted(bounds, hi).tolist()
+    queue = deque()  # segment indices whose maxima decrease from front to back
+    added = 0
+    for window, (a, b) in enumerate(zip(first, last)):
+        while added < b:
+            while queue and segments[queue[-1]] <= segments[added]:
+                queue.pop()
+            queue.append(added)
+            added += 1
+        while queue[0] < a:
+            queue.popleft()
+        result[window] = segments[queue[0]]
+    result[np.isneginf(result)] = np.nan
+    return result
+
+
+#function to compute the row ranges of the windows of one chromosome
+def window_ranges(positions, size, step, mode="bp"):
+    """
+    Returns (lo, hi, start, end) arrays for the windows over position-sorted positions: rows
+    lo:hi fall in the window, which spans start..end in base pairs. bp windows start at multiples
+    of step, from the first one that reaches the first SNP, and windows without SNPs are dropped;
+    SNP windows hold size SNPs, the last one ends at the last SNP.
+    """
+    n = len(positions)
+    if n == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty, empty
+    if mode == "snps":
+        size = min(size, n)
+        lo = np.arange(0, n - size + 1, step, dtype=np.int64)
+        if lo[-1] + size < n:
+            lo = np.r_[lo, n - size]
+        hi = lo + size
+        return lo, hi, positions[lo], positions[hi - 1]
+    # the first window start that is a multiple of step and still ends at or after the first SNP
+    first = max(0, (int(positions[0]) - size) // step * step + step)
+    start = np.arange(first, positions[-1] + 1, step, dtype=np.int64)
+    lo = np.searchsorted(positions, start, "left")
+    hi = np.searchsorted(positions, start + size, "left")
+    kept = hi > lo
+    return lo[kept], hi[kept], start[kept], start[kept] + size - 1
+
+
+#function to read window sizes
+def parse_window(size, step=None, mode="bp"):
+    """Returns (size, step) as numbers of bp ('50kb', '1Mb') or of SNPs; step defaults to half the size."""
+    size = parse_size(size) if mode == "bp" else int(size)
+    step = (parse_size(step) if mode == "bp" else int(step)) if step else max(size // 2, 1)
+    return size, step
+
+
+#function to count the windows a scan would produce
+def count_windows(store, size, step, mode="bp", chromosomes=None):
+    """Upper bound on the number of windows (before empty bp windows are dropped), to refuse oversized scans."""
+    total = 0
+    for chromosome in store.chromosomes if chromosomes is None else chromosomes:
+        rows = store.chromosome_slice(chromosome)
+        if rows.stop == rows.start:
+            continue
+        if mode == "snps":
+            total += (rows.stop - rows.start) // step + 2
+        else:
+            positions = store.columns["position"]
+            total += (int(positions[rows.stop - 1]) - int(positions[rows.start]) + size) // step + 2
+    return total
+
+
+#function to check the arguments of a scan without running it
+def check_window_scan(store, statistics, size, step, mode="bp", chromosomes=None):
+    """Raises ValueError for unknown statistics or mode, a size or step below 1, or too many windows."""
+    unknown = [name for name in statistics if name not in WINDOW_STATISTICS]
+    if unknown or not statistics:
+        raise ValueError(f"unknown statistics: {', '.join(unknown)}" if unknown else "no statistics given")
+    if mode not in WINDOW_MODES:
+        raise ValueError(f"unknown window mode: {mode!r}")
+    if size < 1 or step < 1:
+        raise ValueError("window size and step must be at least 1")
+    if count_windows(store, size, step, mode, chromosomes) > MAX_WINDOWS:
+        raise ValueError(f"more than {MAX_WINDOWS} windows, use a larger step")
+
+
+#function to scan the genome in sliding windows
+def scan_windows(store, statistics, size, step, mode="bp", chromosomes=None):
+    """
+    Returns the windows as columns: chromosome, start, end, n_snps and, per statistic,
+    <statistic>_mean and <statistic>_max over the SNPs with a value. store is the column store
+    (rows sorted by chromosome and position); chromosomes limits the scan (all when None). Means
+    come from prefix sums of the values and of their counts, so the cost is linear in the SNP
+    count whatever the window size; maxima come from sliding_max, linear as well. Raises
+    ValueError for invalid arguments (check_window_scan).
+    """
+    check_window_scan(store, statistics, size, step, mode, chromosomes)
+    result = {"chromosome": [], "start": [], "end": [], "n_snps": []}
+    for name in statistics:
+        result[f"{name}_mean"], result[f"{name}_max"] = [], []
+    for chromosome in store.chromosomes if chromosomes is None else chromosomes:
+        rows = store.chromosome_slice(chromosome)
+        positions = store.columns["position"][rows]
+        lo, hi, start, end = window_ranges(positions, size, step, mode)
+        if len(lo) == 0:
+            continue
+        result["chromosome"].append(np.full(len(lo), str(chromosome), dtype=object))
+        result["start"].append(start)
+        result["end"].append(end)
+        result["n_snps"].append(hi - lo)
+        for name in statistics:
+            values = store.columns[name][rows]
+            present = ~np.isnan(values)
+            sums = np.r_[0.0, np.cumsum(np.where(present, values, 0.0))]
+            counts = np.r_[0, np.cumsum(present)]
+            n = counts[hi] - counts[lo]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                result[f"{name}_mean"].append(np.where(n > 0, (sums[hi] - sums[lo]) / n, np.nan))
+            result[f"{name}_max"].append(sliding_max(values, lo, hi))
+    return {column: np.concatenate(parts) if parts else np.zeros(0) for column, parts in result.items()}
+
+
+#function to test the delta_af window means of a scan against resampled allele counts
+def window_significance(store, size, step, mode="bp", chromosomes=None, permutations=0, bootstrap=0,
+                        confidence=0.95, workers=None, seed=None):
+    """
+    Returns columns in the window order of scan_windows: delta_af_empirical_p from permutations of
+    the BEB and PJL labels of the sampled alleles (resampling.window_permutation_pvalues) and
+    delta_af_ci_low/delta_af_ci_high from bootstrap rounds (window_bootstrap_intervals). The allele
+    counts come from daf_beb and daf_pjl with the sample sizes of FST.SAMPLE_SIZES.
+    """
+    check_window_scan(store, ["delta_af"], size, step, mode, chromosomes)
+    daf_beb, daf_pjl, lo, hi = [], [], [], []
+    offset = 0
+    for chromosome in store.chromosomes if chromosomes is None else chromosomes:
+        rows = store.chromosome_slice(chromosome)
+        window_lo, window_hi, _, _ = window_ranges(store.columns["position"][rows], size, step, mode)
+        if len(window_lo) == 0:
+            continue
+        daf_beb.append(store.columns["daf_beb"][rows])
+        daf_pjl.append(store.columns["daf_pjl"][rows])
+        lo.append(window_lo + offset)
+        hi.append(window_hi + offset)
+        offset += rows.stop - rows.start
+    if not lo:
+        daf_beb = daf_pjl = lo = hi = [np.zeros(0, dtype=np.int64)]
+    p1, p2 = np.concatenate(daf_beb).astype(float), np.concatenate(daf_pjl).astype(float)
+    lo, hi = np.concatenate(lo), np.concatenate(hi)
+    n1, n2 = SAMPLE_SIZES["BEB"], SAMPLE_SIZES["PJL"]
+    columns = {}
+    if permutations:
+        columns["delta_af_empirical_p"] = window_permutation_pvalues(p1, p2, n1, n2, lo, hi, delta_af,
+                                                                     permutations, workers, seed)
+    if bootstrap:
+        columns["delta_af_ci_low"], columns["delta_af_ci_high"] = window_bootstrap_intervals(
+            p1, p2, n1, n2, lo, hi, delta_af, bootstrap, confidence, workers, seed)
+    return columns
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scan a genetics database in sliding windows and write the windows to CSV.")
+    parser.add_argument("--db", default=os.path.join(os.path.abspath(os.path.dirname(__file__)), "instance", "genetics.db"))
+    parser.add_argument("--output", default="windows.csv")
+    parser.add_argument("--statistic", action="append", choices=WINDOW_STATISTICS,
+                        help="statistic to scan, repeatable (default all)")
+    parser.add_argument("--mode", default="bp", choices=WINDOW_MODES)
+    parser.add_argument("--size", default=None, help="window size, e.g. 100kb (default 1Mb or 100 SNPs)")
+    parser.add_argument("--step", default=None, help="window step (default half the size)")
+    parser.add_argument("--chromosome", action="append", help="limit the scan to this chromosome, repeatable")
+    parser.add_argument("--workers", type=int, default=None, help="processes the resampling rounds are spread over")
+    add_resampling_arguments(parser)
+    args = parser.parse_args()
+
+    store = open_column_store(args.db)
+    try:
+        size, step = parse_window(args.size or ("1Mb" if args.mode == "bp" else "100"), args.step, args.mode)
+        windows = scan_windows(store, args.statistic or WINDOW_STATISTICS, size, step, args.mode, args.chromosome)
+        windows.update(window_significance(store, size, step, args.mode, args.chromosome, args.permutations,
+                                           args.bootstrap, args.confidence, args.workers, args.seed))
+    except ValueError as e:
+        parser.error(str(e))
+    pd.DataFrame(windows).to_csv(args.output, index=False)
+    print(f"{len(windows['n_snps'])} windows written to {args.output}")
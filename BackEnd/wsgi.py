@@ -0,0 +1,19 @@
+# wsgi.py
+#entry point of the production server: gunicorn --config gunicorn.conf.py wsgi:app (run from BackEnd)
+#with preload_app this module runs once in the master, so the data below is built before the workers are forked
+#import gc to keep the preloaded objects out of the garbage collector and app for the factory
+import gc
+import app as web
+
+app = web.create_app()
+web.preload_shared_state(app)
+# connections must not cross the fork, every worker opens its own
+web.release_connections(app)
+# the collector would write to every preloaded object it visits (and copy its memory page into the worker),
+# frozen objects are left alone
+gc.freeze()
+
+
+#function called by the post_fork hook of gunicorn.conf.py in each worker
+def after_fork():
+    web.after_fork(app)
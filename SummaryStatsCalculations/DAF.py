@@ -1,44 +1,39 @@
-#import pandas for handling data and re module for pattern matching
+#import argparse for the command line options, pandas for handling data, the shared allele frequency parser
+#and the chunked and per-chromosome parallel runners
+import argparse
 import pandas as pd
-import re
+from allele_freq import calculate_daf, as_optional
+from chunked import process_csv, add_chunksize_argument
+from parallel import process_csv_parallel, add_workers_arguments, check_workers_arguments
 
-# Load the dataset from final csv
-file_path = r"final.csv"  
-df = pd.read_csv(file_path)
-
-# clean the column names by removing white spaces
-df.columns = [col.strip().replace(" ", "_") for col in df.columns]
-
-# extract the allele frequency from the table format
-def extract_frequency(allele_freq_str, allele):
-    """Extracts the frequency of a given allele from a formatted string like 'A: 0.802, G: 0.198'."""
-    try:
-        match = re.findall(rf"{allele}:\s*([\d\.]+)", str(allele_freq_str))
-        return float(match[0]) if match else None
-    except:
-        return None
 
 # function to calculate derived allele frequency for BEB and PJL populations
-def calculate_daf(row):
-    try:
-        derived_allele = row["Risk_Allele"]  # Risk allele is considered derived
-
-        # Extract derived allele frequency for each population
-        BEB_daf = extract_frequency(row["BEB"], derived_allele)
-        PJL_daf = extract_frequency(row["PJL"], derived_allele)
-
-        return BEB_daf, PJL_daf  # Return DAF values separately
-    except Exception as e:
-        print(f"Error processing SNP {row['SNP_ID']}: {e}")
-        return None, None
-
-# apply calculation for each row
-df["DAF_BEB"], df["DAF_PJL"] = zip(*df.apply(calculate_daf, axis=1))
-
-# save the calculations to csv file format
-output_path = r"FINAL_with_DAF_BEB_PJL.csv"
-df.to_csv(output_path, index=False)
-
-# print the first few rows of results to check calculation has worked
-print(df[["SNP_ID", "Risk_Allele", "DAF_BEB", "DAF_PJL"]].head())
-
+def add_daf_columns(df):
+    """Adds DAF_BEB and DAF_PJL to a table of SNPs, treating the risk allele as the derived allele."""
+    # clean the column names by removing white spaces
+    df.columns = [col.strip().replace(" ", "_") for col in df.columns]
+
+    # whole columns are parsed at once by the shared parser instead of a regex per row
+    daf = calculate_daf(df, "Risk_Allele", ["BEB", "PJL"])
+    df["DAF_BEB"] = as_optional(daf["BEB"])
+    df["DAF_PJL"] = as_optional(daf["PJL"])
+    return df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calculate the derived allele frequency for BEB and PJL populations.")
+    parser.add_argument("--input", default=r"final.csv")
+    parser.add_argument("--output", default=r"FINAL_with_DAF_BEB_PJL.csv")
+    add_chunksize_argument(parser)
+    add_workers_arguments(parser)
+    args = parser.parse_args()
+    check_workers_arguments(parser, args)
+
+    # calculate the DAF and save the calculations to csv file format
+    if args.workers:
+        process_csv_parallel(args.input, args.output, add_daf_columns, args.workers, args.chromosome_column)
+    else:
+        process_csv(args.input, args.output, add_daf_columns, chunksize=args.chunksize)
+
+    # print the first few rows of results to check calculation has worked
+    print(pd.read_csv(args.output, nrows=5)[["SNP_ID", "Risk_Allele", "DAF_BEB", "DAF_PJL"]])
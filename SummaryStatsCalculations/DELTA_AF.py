@@ -1,18 +1,52 @@
 #calculate the delta allele frequency for BEB and PJL populations 
-# import pandas library needed to handle the format of the csv data in python
+# import argparse for the command line options, pandas to handle the format of the csv data in python
+# and the chunked and per-chromosome parallel runners
+import argparse
 import pandas as pd
+from chunked import READ_OPTIONS, process_csv, add_chunksize_argument
+from parallel import process_csv_parallel, add_workers_arguments, check_workers_arguments
+from resampling import delta_af, add_significance_columns, add_resampling_arguments, check_resampling_arguments
+from FST import SAMPLE_SIZES
 
-# Load the dataset from a csv file containing derived allele frequency for BEB and PJL populations
-df = pd.read_csv('deltaaf.csv', sep=',')
 
-#remove any extra spaces to prevent errors 
-df.columns = df.columns.str.strip()
+# Calculate the delta allele frequencies between BEB and PJL populations
+def delta_af_table(df, permutations=0, bootstrap=0, confidence=0.95, workers=None, seed=None):
+    """
+    Returns SNP_ID, BEB, PJL and Delta_AF for a table of derived allele frequencies. permutations adds
+    the empirical p-value of each Delta_AF and bootstrap its confidence interval, see resampling.py.
+    """
+    #remove any extra spaces to prevent errors 
+    df.columns = df.columns.str.strip()
+    # every column is read as text, so NA and empty cells become missing values here; float64 always,
+    # a chunk of whole numbers would otherwise be written as 0 where the whole file gives 0.0
+    df['BEB'] = pd.to_numeric(df['BEB'], errors='coerce').astype('float64')
+    df['PJL'] = pd.to_numeric(df['PJL'], errors='coerce').astype('float64')
+    df['Delta_AF'] = abs(df['BEB'] - df['PJL'])
+    table = df[['SNP_ID', 'BEB', 'PJL', 'Delta_AF']].copy()
+    return add_significance_columns(table, df['BEB'].to_numpy(dtype=float), df['PJL'].to_numpy(dtype=float),
+                                    SAMPLE_SIZES["BEB"], SAMPLE_SIZES["PJL"], delta_af,
+                                    permutations, bootstrap, confidence, workers, seed)
 
-# print the column names to confirm they have been loaded
-print("Columns in the DataFrame:", df.columns)
 
-# Calculate the delta allele frequencies between BEB and PJL populations
-df['Delta_AF'] = abs(df['BEB'] - df['PJL'])
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calculate the delta allele frequency between BEB and PJL populations.")
+    parser.add_argument("--input", default='deltaaf.csv')
+    parser.add_argument("--output", default="Delta_AF_results.csv")
+    add_chunksize_argument(parser)
+    add_workers_arguments(parser)
+    add_resampling_arguments(parser)
+    args = parser.parse_args()
+    check_resampling_arguments(parser, args)
+    check_workers_arguments(parser, args)
 
-# Save the delta allele frequency values to Delta_AF_results.csv
-df[['SNP_ID', 'BEB', 'PJL', 'Delta_AF']].to_csv("Delta_AF_results.csv", index=False)
+    # Load the derived allele frequencies for BEB and PJL and save the delta allele frequency values
+    if args.permutations or args.bootstrap:
+        table = delta_af_table(pd.read_csv(args.input, **dict(READ_OPTIONS, sep=',')), args.permutations,
+                               args.bootstrap, args.confidence, args.workers, args.seed)
+        table.to_csv(args.output, index=False)
+        rows = len(table)
+    elif args.workers:
+        rows = process_csv_parallel(args.input, args.output, delta_af_table, args.workers, args.chromosome_column, sep=',')
+    else:
+        rows = process_csv(args.input, args.output, delta_af_table, chunksize=args.chunksize, sep=',')
+    print(f"Delta_AF calculated for {rows} SNPs")
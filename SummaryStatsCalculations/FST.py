@@ -1,66 +1,141 @@
+import argparse
+from functools import partial
+import numpy as np
 import pandas as pd
+from allele_freq import expand_frequencies, parse_frequency_matrix, lookup_frequencies
+from chunked import READ_OPTIONS, process_csv, add_chunksize_argument
+from parallel import process_csv_parallel, add_workers_arguments, check_workers_arguments
+from resampling import add_significance_columns, add_resampling_arguments, check_resampling_arguments
 
-# This loads the CSV file which contains the required population genetic data which includes the SNP ID and two populations and their allele frequency
-data = pd.read_csv('DATA.csv')
-
-# Function to parse allele frequencies from a string representation as well as returning a dictionary connecting the alleles to their frequencies
-def parse_frequencies(freq_str):
-    if pd.isna(freq_str) or not isinstance(freq_str, str):
-        return {}
-    try:
-        return {allele_freq.split(':')[0].strip(): float(allele_freq.split(':')[1].strip()) 
-                for allele_freq in freq_str.split(',')}
-    except Exception as e:
-        print(f"Error parsing frequencies: {freq_str} - {e}")
-        return {}
-
-#This function calculates the FST between the two populations using the formula FST = (HT - HS)/HT
-def calculate_fst(p1, p2):
-    p_bar = (p1 + p2) / 2  #This takes the average allele frequency 
+# Sample sizes (individuals) of the 1000 Genomes populations, used by the Hudson and Weir-Cockerham estimators
+SAMPLE_SIZES = {"EUR": 503, "PJL": 96, "BEB": 86}
+
+# Wright's interpretation guidelines for FST, the lower edge of each category after the first
+WRIGHT_BINS = [0.05, 0.15, 0.25]
+WRIGHT_CATEGORIES = ["Little genetic diff.", "Moderate genetic diff.", "Great genetic diff.", "Very great genetic diff."]
+
+
+#This divides two arrays and returns 0 wherever the denominator is 0, paticularly when the allele is fixed
+def _safe_ratio(numerator, denominator):
+    numerator = np.asarray(numerator, dtype=float)
+    denominator = np.asarray(denominator, dtype=float)
+    return np.divide(numerator, denominator, out=np.zeros(np.broadcast(numerator, denominator).shape), where=denominator != 0)
+
+
+#This calculates Nei's FST for arrays of allele frequencies using the formula FST = (HT - HS)/HT
+def fst_nei(p1, p2, n1=None, n2=None):
+    """Nei's FST, the estimator the original per-row script used. Sample sizes are ignored."""
+    p1 = np.asarray(p1, dtype=float)
+    p2 = np.asarray(p2, dtype=float)
+    p_bar = (p1 + p2) / 2  #This takes the average allele frequency
     h_s = (p1 * (1 - p1) + p2 * (1 - p2)) / 2  #This takes the average heterozygosity within the popualation
-    h_t = p_bar * (1 - p_bar) #This provides the total heterozygosity
-
-    if h_t == 0:  #This avoids division by zero, paticularly when the allele is fixed
-        return 0
-    fst = (h_t - h_s) / h_t
-    return fst
-
-#This list stores FST results
-fst_values = []
-
-#This iterates through each shared SNP in the data set and calculates the FST by employing the calculate_fst function 
-for _, row in data.iterrows():
-    try:
-        #This parses the allele frequencies of the populations which were Europe and Punjabi Lahore however for PJL was switched out for Bengali population for their calculation
-        eur_freqs = parse_frequencies(row['EUR'])
-        pjl_freqs = parse_frequencies(row['PJL'])
-#This uses the calculate_fst function for each shared allele, however it is only calculates the FST if the allele is present in both populations
-        for allele in eur_freqs:
-            if allele in pjl_freqs:  # Only calculate FST if the allele is present in both populations
-                fst = calculate_fst(eur_freqs[allele], pjl_freqs[allele])
-                
-                # This categorises the genetic differentiation based on FST thresholds as described by Wrights interpretation guidlines 
-                if fst < 0.05:
-                    category = "Little genetic diff."
-                elif 0.05 <= fst < 0.15:
-                    category = "Moderate genetic diff."
-                elif 0.15 <= fst < 0.25:
-                    category = "Great genetic diff."
-                else:
-                    category = "Very great genetic diff."
-                
-                # This stores the results
-                fst_values.append({
-                    'SNP ID': row['SNP ID'],
-                    'Allele': allele,
-                    'FST': round(fst, 5),  
-                    'Category': category
-                })
-    except Exception as e:
-        print(f"Error processing SNP {row.get('SNP ID', 'Unknown')}: {e}")
-
-# This converts results to a dataFrame
-fst_df = pd.DataFrame(fst_values)
-
-# This saves the results to CSV
-fst_df.to_csv('Output.csv', index=False)
+    h_t = p_bar * (1 - p_bar)  #This provides the total heterozygosity
+    return _safe_ratio(h_t - h_s, h_t)
+
+
+#This calculates Hudson's FST (Bhatia et al. 2013), with the sample size correction when sizes are given
+def fst_hudson(p1, p2, n1=None, n2=None):
+    """Hudson's FST. n1 and n2 are the numbers of sampled individuals in each population."""
+    p1 = np.asarray(p1, dtype=float)
+    p2 = np.asarray(p2, dtype=float)
+    numerator = (p1 - p2) ** 2
+    if n1 is not None and n2 is not None:
+        numerator = numerator - p1 * (1 - p1) / (2 * n1 - 1) - p2 * (1 - p2) / (2 * n2 - 1)
+    denominator = p1 * (1 - p2) + p2 * (1 - p1)
+    return _safe_ratio(numerator, denominator)
+
+
+#This calculates the Weir-Cockerham (1984) theta for two populations, heterozygosity is taken from Hardy-Weinberg
+def fst_weir_cockerham(p1, p2, n1=None, n2=None):
+    """Weir and Cockerham's theta. n1 and n2 are the numbers of sampled individuals and are required."""
+    if n1 is None or n2 is None:
+        raise ValueError("The Weir-Cockerham estimator needs the sample sizes n1 and n2.")
+    p1 = np.asarray(p1, dtype=float)
+    p2 = np.asarray(p2, dtype=float)
+    n_total = n1 + n2
+    n_bar = n_total / 2
+    n_c = n_total - (n1 ** 2 + n2 ** 2) / n_total
+    p_bar = (n1 * p1 + n2 * p2) / n_total
+    s2 = (n1 * (p1 - p_bar) ** 2 + n2 * (p2 - p_bar) ** 2) / n_bar
+    h_bar = (n1 * 2 * p1 * (1 - p1) + n2 * 2 * p2 * (1 - p2)) / n_total
+    variance = p_bar * (1 - p_bar)
+    a = n_bar / n_c * (s2 - (variance - s2 / 2 - h_bar / 4) / (n_bar - 1))
+    b = n_bar / (n_bar - 1) * (variance - s2 / 2 - (2 * n_bar - 1) / (4 * n_bar) * h_bar)
+    c = h_bar / 2
+    return _safe_ratio(a, a + b + c)
+
+
+ESTIMATORS = {"nei": fst_nei, "hudson": fst_hudson, "wc": fst_weir_cockerham}
+
+
+#This calculates FST for every SNP at once with the selected estimator
+def calculate_fst(p1, p2, estimator="nei", n1=None, n2=None):
+    """
+    Computes FST between two populations for whole arrays of allele frequencies.
+    estimator is one of 'nei' (the original formula), 'hudson' or 'wc' (Weir-Cockerham).
+    """
+    if estimator not in ESTIMATORS:
+        raise ValueError(f"Unknown FST estimator '{estimator}', expected one of {sorted(ESTIMATORS)}.")
+    return ESTIMATORS[estimator](p1, p2, n1, n2)
+
+
+# This categorises the genetic differentiation based on FST thresholds as described by Wrights interpretation guidlines
+def classify_fst(fst):
+    """Returns an array of Wright's categories for an array of FST values, 'No data' where FST is missing."""
+    fst = np.asarray(fst, dtype=float)
+    categories = np.array(WRIGHT_CATEGORIES + ["No data"], dtype=object)
+    bins = np.searchsorted(WRIGHT_BINS, fst, side="right")
+    bins[np.isnan(fst)] = len(WRIGHT_CATEGORIES)
+    return categories[bins]
+
+
+#This calculates the FST of every allele that is present in both populations
+def fst_table(data, pop1="EUR", pop2="PJL", estimator="nei", permutations=0, bootstrap=0, confidence=0.95, workers=None, seed=None):
+    """
+    Computes the per-allele FST table (SNP ID, Allele, FST, Category) for two population columns
+    of formatted frequency strings. Alleles are listed in the order they appear for pop1 and only
+    alleles present in both populations are kept. permutations adds the empirical p-value of each
+    FST ('Empirical P') and bootstrap its confidence interval ('CI Low', 'CI High'), see resampling.py.
+    """
+    # a repeated allele keeps its last frequency, as the dictionary based parser did
+    rows, alleles, p1 = expand_frequencies(data[pop1], keep="last")
+    pop2_alleles, pop2_matrix = parse_frequency_matrix(data[pop2], keep="last")
+    p2 = lookup_frequencies(pop2_alleles, pop2_matrix, alleles, rows=rows)
+    shared = ~np.isnan(p1) & ~np.isnan(p2)
+    n1, n2 = SAMPLE_SIZES.get(pop1), SAMPLE_SIZES.get(pop2)
+    fst = calculate_fst(p1[shared], p2[shared], estimator, n1, n2)
+    table = pd.DataFrame({
+        'SNP ID': data['SNP ID'].to_numpy()[rows[shared]],
+        'Allele': alleles[shared],
+        'FST': np.round(fst, 5),
+        'Category': classify_fst(fst),
+    })
+    return add_significance_columns(table, p1[shared], p2[shared], n1, n2, ESTIMATORS[estimator],
+                                    permutations, bootstrap, confidence, workers, seed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calculate FST between two populations for every shared SNP allele.")
+    parser.add_argument("--input", default="DATA.csv")
+    parser.add_argument("--output", default="Output.csv")
+    parser.add_argument("--pop1", default="EUR")
+    parser.add_argument("--pop2", default="PJL")
+    parser.add_argument("--estimator", default="nei", choices=sorted(ESTIMATORS))
+    add_chunksize_argument(parser)
+    add_workers_arguments(parser)
+    add_resampling_arguments(parser)
+    args = parser.parse_args()
+    check_resampling_arguments(parser, args)
+    check_workers_arguments(parser, args)
+
+    # This loads the CSV file which contains the SNP ID and the allele frequencies of the two populations,
+    # calculates the FST table and saves the results to CSV
+    transform = partial(fst_table, pop1=args.pop1, pop2=args.pop2, estimator=args.estimator)
+    if args.permutations or args.bootstrap:
+        table = fst_table(pd.read_csv(args.input, **READ_OPTIONS), args.pop1, args.pop2, args.estimator,
+                          args.permutations, args.bootstrap, args.confidence, args.workers, args.seed)
+        table.to_csv(args.output, index=False)
+    elif args.workers:
+        process_csv_parallel(args.input, args.output, transform, args.workers, args.chromosome_column)
+    else:
+        process_csv(args.input, args.output, transform, chunksize=args.chunksize)
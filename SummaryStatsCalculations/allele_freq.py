@@ -0,0 +1,169 @@
+#shared allele frequency parser used by DAF.py, DELTA_AF.py, FST.py and the web backend
+#import numpy for the frequency matrix, pandas to factorize whole columns and re for the token pattern
+import re
+import numpy as np
+import pandas as pd
+
+# one "allele: frequency" token, e.g. "A: 0.802" in "A: 0.802, G: 0.198"
+TOKEN_PATTERN = re.compile(r"([^\s,:]+):\s*([\d\.]+)")
+
+
+# split a whole column of frequency strings into (row, allele, frequency) tokens
+def tokenize_frequencies(freq_strings):
+    """
+    Tokenizes a column of strings like 'A: 0.802, G: 0.198'.
+    Every distinct string is parsed only once, because genome-scale columns repeat the same
+    rounded frequencies many times. Returns (codes, unique_rows, alleles, freqs, n_unique) where
+    codes maps each input row to a distinct string (-1 for missing) and the token arrays are in
+    the order the alleles appear inside each distinct string.
+    """
+    codes, uniques = pd.factorize(pd.Series(freq_strings, dtype=object), use_na_sentinel=True)
+    unique_rows = []
+    allele_tokens = []
+    freq_tokens = []
+    for i, value in enumerate(uniques):
+        for allele, freq in TOKEN_PATTERN.findall(str(value)):
+            unique_rows.append(i)
+            allele_tokens.append(allele)
+            freq_tokens.append(freq)
+    # malformed numbers such as "0.1.2" become NaN, like the old float() failure returned None
+    freqs = pd.to_numeric(pd.Series(freq_tokens, dtype=object), errors="coerce").to_numpy(dtype=float)
+    return codes, np.asarray(unique_rows, dtype=np.intp), np.asarray(allele_tokens, dtype=object), freqs, len(uniques)
+
+
+# locate the first occurrence and the kept occurrence of every repeated key
+def _first_and_kept(keys, keep):
+    """Returns (unique_keys, first_index, kept_index) where keep is 'first' or 'last'."""
+    if keep not in ("first", "last"):
+        raise ValueError(f"keep must be 'first' or 'last', not '{keep}'.")
+    unique_keys, first = np.unique(keys, return_index=True)
+    if keep == "first":
+        return unique_keys, first, first
+    _, last_reversed = np.unique(keys[::-1], return_index=True)
+    return unique_keys, first, len(keys) - 1 - last_reversed
+
+
+# turn a whole column of frequency strings into an allele x frequency matrix
+def parse_frequency_matrix(freq_strings, keep="first"):
+    """
+    Parses a column of formatted allele frequency strings in one pass.
+    Returns (alleles, matrix) where matrix[i, j] is the frequency of alleles[j] in row i,
+    or NaN when that allele is not listed. If an allele is listed twice, keep picks the
+    'first' or the 'last' value.
+    """
+    codes, unique_rows, allele_tokens, freqs, n_unique = tokenize_frequencies(freq_strings)
+    allele_codes, alleles = pd.factorize(pd.Series(allele_tokens, dtype=object))
+    # the extra last row stays NaN and is picked up by the -1 code of missing strings
+    unique_matrix = np.full((n_unique + 1, len(alleles)), np.nan)
+    _, position, value = _first_and_kept(unique_rows * len(alleles) + allele_codes, keep)
+    unique_matrix[unique_rows[position], allele_codes[position]] = freqs[value]
+    return list(alleles), unique_matrix[codes]
+
+
+# expand the tokens of every row in the order they are listed
+def expand_frequencies(freq_strings, keep="first"):
+    """
+    Returns (rows, alleles, freqs) with one entry per listed allele of every input row, in the
+    order the alleles appear in each string. A repeated allele keeps its first position and
+    the 'first' or 'last' value according to keep.
+    """
+    codes, unique_rows, allele_tokens, freqs, n_unique = tokenize_frequencies(freq_strings)
+    starts = np.searchsorted(unique_rows, np.arange(n_unique + 1))
+    lengths = np.diff(starts)
+    present = np.flatnonzero(codes >= 0)
+    counts = lengths[codes[present]]
+    rows = np.repeat(present, counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    tokens = np.repeat(starts[codes[present]], counts) + offsets
+    alleles = allele_tokens[tokens]
+    allele_codes = pd.factorize(pd.Series(alleles, dtype=object))[0]
+    _, position, value = _first_and_kept(rows * len(alleles) + allele_codes, keep)
+    order = np.argsort(position, kind="stable")
+    return rows[position[order]], alleles[position[order]], freqs[tokens[value[order]]]
+
+
+# look up the frequency of one allele per row
+def lookup_frequencies(alleles, matrix, query_alleles, rows=None):
+    """
+    Picks matrix[rows[i], alleles.index(query_alleles[i])] for every query (rows defaults to
+    0..n-1), NaN where the allele is absent.
+    """
+    columns = pd.Index(alleles, dtype=object).get_indexer(pd.Series(query_alleles, dtype=object).astype(object))
+    rows = np.arange(len(columns)) if rows is None else np.asarray(rows)
+    values = np.full(len(columns), np.nan)
+    found = columns >= 0
+    values[found] = matrix[rows[found], columns[found]]
+    return values
+
+
+# vectorized replacement for calling extract_frequency row by row
+def extract_frequencies(freq_strings, query_alleles):
+    """
+    Extracts the frequency of the given allele from every formatted string in a column.
+    Like the old per-row regex, the first listed allele ending in the query allele wins, so 'C'
+    still matches 'CTAGC: 1.000'. Each distinct (string, allele) pair is resolved only once.
+    The query allele is compared literally, as the old pattern would with re.escape(allele): an
+    allele holding regex metacharacters ('.', '*', '+', ...) was read as a pattern by the old
+    code, matching other alleles or raising (None), and here only matches itself.
+    Returns a float array with NaN where the allele (or the string) is missing.
+    """
+    codes, unique_rows, allele_tokens, freqs, n_unique = tokenize_frequencies(freq_strings)
+    query_codes, query_uniques = pd.factorize(pd.Series(query_alleles, dtype=object), use_na_sentinel=True)
+    pair_codes, pairs = pd.factorize((codes + 1) * (len(query_uniques) + 1) + (query_codes + 1))
+    starts = np.searchsorted(unique_rows, np.arange(n_unique + 1))
+    pair_values = np.full(len(pairs), np.nan)
+    for i, pair in enumerate(pairs):
+        string_code, query_code = divmod(int(pair), len(query_uniques) + 1)
+        if string_code == 0 or query_code == 0:
+            continue
+        query = str(query_uniques[query_code - 1])
+        for t in range(starts[string_code - 1], starts[string_code]):
+            if allele_tokens[t].endswith(query):
+                pair_values[i] = freqs[t]
+                break
+    return pair_values[pair_codes]
+
+
+# convert NaN to None for callers that expect the old per-row results
+def as_optional(values):
+    """Returns an object array of floats with None in place of NaN."""
+    values = np.asarray(values, dtype=float)
+    result = values.astype(object)
+    result[np.isnan(values)] = None
+    return result
+
+
+# scalar helper kept for single lookups
+def extract_frequency(allele_freq_str, allele):
+    """
+    Extracts the frequency of a given allele from a formatted string like 'A: 0.802, G: 0.198'.
+    Returns None if not found.
+    """
+    value = extract_frequencies([allele_freq_str], [allele])[0]
+    return None if np.isnan(value) else float(value)
+
+
+# derived allele frequency for several population columns at once
+def calculate_daf(df, allele_column, population_columns):
+    """
+    Computes the Derived Allele Frequency for every row, treating allele_column as the derived allele.
+    Returns a dict mapping each population column to a float array (NaN where missing).
+    """
+    return {
+        population: extract_frequencies(df[population], df[allele_column])
+        for population in population_columns
+    }
+
+
+# DAF of two populations plus their absolute difference, as used by the web backend
+def derive_daf_delta(df, allele_column="risk_allele", population_columns=("beb", "pjl")):
+    """
+    Adds daf_<population> for both population columns and delta_af = |daf_1 - daf_2|,
+    which is NaN when either DAF is missing. Returns the DataFrame.
+    """
+    daf = calculate_daf(df, allele_column, population_columns)
+    for population in population_columns:
+        df[f"daf_{population}"] = daf[population]
+    first, second = population_columns
+    df["delta_af"] = np.abs(daf[first] - daf[second])
+    return df
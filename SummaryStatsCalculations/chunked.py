@@ -0,0 +1,43 @@
+#shared reader/writer that lets DAF.py, DELTA_AF.py and FST.py run on inputs larger than memory
+import pandas as pd
+
+# every column is read as text so a chunk and the whole file always infer the same types,
+# which keeps the streamed output identical to the in-memory output
+READ_OPTIONS = {"dtype": str, "keep_default_na": False}
+
+
+# read the input, apply the statistic and write the output, whole or one chunk at a time
+def process_csv(input_path, output_path, transform, chunksize=None, **read_kwargs):
+    """
+    Applies transform (DataFrame -> DataFrame) to the input CSV and writes the result to output_path.
+    With chunksize=None the whole file is processed in memory. Otherwise at most chunksize rows
+    are held at a time and each result is appended to the output as soon as it is computed,
+    so peak memory does not grow with the input. transform must work row by row, and give its
+    numeric columns a fixed dtype (e.g. float64, not what pd.to_numeric infers from the chunk),
+    for the two modes to give the same file. Returns the number of rows written.
+    """
+    options = dict(READ_OPTIONS, **read_kwargs)
+    if chunksize is None:
+        result = transform(pd.read_csv(input_path, **options))
+        result.to_csv(output_path, index=False)
+        return len(result)
+
+    rows_written = 0
+    header = True
+    with open(output_path, "w", newline="") as output:
+        for chunk in pd.read_csv(input_path, chunksize=chunksize, **options):
+            result = transform(chunk)
+            result.to_csv(output, index=False, header=header)
+            rows_written += len(result)
+            header = False
+        # an input with only a header still gets the header of the result
+        if header:
+            transform(pd.read_csv(input_path, nrows=0, **options)).to_csv(output, index=False)
+    return rows_written
+
+
+# command line option shared by the scripts
+def add_chunksize_argument(parser):
+    """Adds the --chunksize option to an argparse parser."""
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help="stream the input in chunks of this many rows instead of loading it whole")
@@ -0,0 +1,89 @@
+#run a summary statistic on every chromosome in its own process and merge the results in chromosome order
+import time
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from chunked import READ_OPTIONS
+
+# Define the correct order for chromosomes, shared with the web backend
+CHROMOSOME_ORDER = [str(i) for i in range(1, 23)] + ["X", "Y"]
+
+
+# order chromosome names as 1-22, X, Y followed by anything unexpected
+def sort_chromosomes(chromosomes):
+    """Returns the chromosome names in canonical order, unknown names sorted at the end."""
+    known = [c for c in CHROMOSOME_ORDER if c in chromosomes]
+    unknown = sorted(c for c in chromosomes if c not in CHROMOSOME_ORDER)
+    return known + unknown
+
+
+# run the statistic on one chromosome and time it
+def _run_partition(func, chromosome, partition):
+    start = time.perf_counter()
+    result = func(partition)
+    return chromosome, result, len(partition), time.perf_counter() - start
+
+
+# split the SNPs by chromosome and farm the partitions out to a process pool
+def run_by_chromosome(df, func, workers=None, chromosome_column="chromosome"):
+    """
+    Applies func (DataFrame -> DataFrame) to the SNPs of every chromosome in a ProcessPoolExecutor
+    with the given number of workers (None lets the executor pick, 1 runs in this process).
+    func must be picklable, i.e. a module level function or a functools.partial of one.
+    Returns (result, timings) where result is the concatenated output in 1-22, X, Y order and
+    timings has one row per partition with its chromosome, rows and seconds.
+    """
+    keys = df[chromosome_column].astype(str).str.strip()
+    partitions = {chromosome: part for chromosome, part in df.groupby(keys, sort=False)}
+    order = sort_chromosomes(partitions)
+
+    if workers == 1:
+        outputs = [_run_partition(func, chromosome, partitions[chromosome]) for chromosome in order]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_run_partition, func, chromosome, partitions[chromosome]) for chromosome in order]
+            outputs = [future.result() for future in futures]
+
+    timings = pd.DataFrame(
+        [(chromosome, rows, seconds) for chromosome, _, rows, seconds in outputs],
+        columns=["chromosome", "rows", "seconds"],
+    )
+    results = [result for _, result, _, _ in outputs]
+    merged = pd.concat(results, ignore_index=True) if results else func(df.iloc[:0])
+    return merged, timings
+
+
+# print the per partition timings so skew between chromosomes is visible
+def report_timings(timings):
+    """Prints the partition timings and the ratio of the slowest partition to the mean."""
+    print(timings.to_string(index=False))
+    if not timings.empty and timings["seconds"].mean() > 0:
+        print(f"slowest/mean partition time: {timings['seconds'].max() / timings['seconds'].mean():.2f}")
+
+
+# read a whole CSV, compute the statistic per chromosome in parallel and write the merged result
+def process_csv_parallel(input_path, output_path, transform, workers=None, chromosome_column="chromosome", **read_kwargs):
+    """Parallel counterpart of chunked.process_csv. Returns the number of rows written."""
+    df = pd.read_csv(input_path, **dict(READ_OPTIONS, **read_kwargs))
+    result, timings = run_by_chromosome(df, transform, workers, chromosome_column)
+    result.to_csv(output_path, index=False)
+    report_timings(timings)
+    return len(result)
+
+
+# command line options shared by the scripts
+def add_workers_arguments(parser):
+    """Adds the --workers and --chromosome-column options to an argparse parser."""
+    parser.add_argument("--workers", type=int, default=None,
+                        help="compute each chromosome in a pool of this many processes")
+    parser.add_argument("--chromosome-column", default="chromosome",
+                        help="input column used to partition SNPs by chromosome")
+
+
+# reject the options that cannot be used together with the per-chromosome pool
+def check_workers_arguments(parser, args):
+    """
+    Stops with a usage error when --workers is combined with --chunksize: each chromosome is
+    computed from the whole input read at once, so the chunk size would be ignored.
+    """
+    if getattr(args, "chunksize", None) and getattr(args, "workers", None):
+        parser.error("--chunksize cannot be combined with --workers")
@@ -0,0 +1,256 @@
+#permutation and bootstrap significance for two-population statistics (FST, delta AF), per SNP and per window
+#import numpy for the vectorised resampling rounds and the process pool to spread the rounds over cores
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+# rounds given to one task, fixed so the random streams (and the results) do not depend on the number of workers
+ROUNDS_PER_TASK = 250
+# distinct count pairs given to one bootstrap task, which holds rounds x pairs statistics in memory
+PAIRS_PER_TASK = 1000
+# random draws made at once inside a task, bounds the memory of a batch of rounds
+BATCH_DRAWS = 4_000_000
+
+
+#This is the absolute difference in allele frequency, the delta AF of DELTA_AF.py
+def delta_af(p1, p2, n1=None, n2=None):
+    return np.abs(np.asarray(p1, dtype=float) - np.asarray(p2, dtype=float))
+
+
+#This turns allele frequencies into allele counts out of 2n sampled chromosomes
+def allele_counts(p, n):
+    """Returns the nearest whole allele counts of frequencies p in 2n chromosomes, -1 where p is missing."""
+    p = np.asarray(p, dtype=float)
+    counts = np.rint(np.clip(np.nan_to_num(p, nan=0.0), 0, 1) * 2 * n).astype(np.int64)
+    counts[np.isnan(p)] = -1
+    return counts
+
+
+#This collapses the SNPs to their distinct count pairs, which are resampled once however many SNPs share them
+def distinct_pairs(c1, c2, n2):
+    """Returns (pairs1, pairs2, inverse) with c1 == pairs1[inverse] and c2 == pairs2[inverse]."""
+    codes, inverse = np.unique(c1 * (2 * n2 + 1) + c2, return_inverse=True)
+    return codes // (2 * n2 + 1), codes % (2 * n2 + 1), inverse.reshape(-1)
+
+
+#This spreads the tasks over a process pool, each with its own random stream
+def run_tasks(func, tasks, workers=None, seed=None):
+    """
+    Calls func(*task, seed) for every task in a ProcessPoolExecutor with the given number of workers
+    (1 runs in this process) and returns the results in task order. The seeds are spawned from
+    np.random.SeedSequence(seed), one per task, so a seed gives the same results on any number of workers.
+    func must be picklable, i.e. a module level function.
+    """
+    seeds = np.random.SeedSequence(seed).spawn(len(tasks))
+    if workers == 1 or len(tasks) <= 1:
+        return [func(*task, task_seed) for task, task_seed in zip(tasks, seeds)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(func, *task, task_seed) for task, task_seed in zip(tasks, seeds)]
+        return [future.result() for future in futures]
+
+
+#This splits a number of rounds into task sized chunks
+def round_chunks(rounds):
+    return [min(ROUNDS_PER_TASK, rounds - start) for start in range(0, rounds, ROUNDS_PER_TASK)]
+
+
+#This is the mean of a per-SNP statistic over windows of rows lo:hi, ignoring missing values
+def window_means(values, lo, hi):
+    """values may be one array or a (rounds, SNPs) array, the windows are taken along the last axis."""
+    present = ~np.isnan(values)
+    sums = np.cumsum(np.where(present, values, 0.0), axis=-1)
+    counts = np.cumsum(present, axis=-1)
+    pad = [(0, 0)] * (values.ndim - 1) + [(1, 0)]
+    sums, counts = np.pad(sums, pad), np.pad(counts, pad)
+    n = counts[..., hi] - counts[..., lo]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(n > 0, (sums[..., hi] - sums[..., lo]) / n, np.nan)
+
+
+#This draws permuted allele counts: the pooled alleles of a SNP are dealt out again to the two populations
+def permuted_counts(rng, c1, c2, n1, n2, rounds):
+    pooled = c1 + c2
+    d1 = rng.hypergeometric(pooled, 2 * (n1 + n2) - pooled, 2 * n1, size=(rounds, len(pooled)))
+    return d1, pooled - d1
+
+
+#This draws bootstrap allele counts: each population is sampled again from its own frequencies
+def bootstrap_counts(rng, c1, c2, n1, n2, rounds):
+    d1 = rng.binomial(2 * n1, c1 / (2 * n1), size=(rounds, len(c1)))
+    d2 = rng.binomial(2 * n2, c2 / (2 * n2), size=(rounds, len(c2)))
+    return d1, d2
+
+
+#This runs rounds of a resampling and yields the statistic of each batch of rounds, (rounds, SNPs) at a time
+def resampled_statistics(draw, statistic, c1, c2, n1, n2, rounds, seed):
+    rng = np.random.default_rng(seed)
+    batch = max(1, BATCH_DRAWS // max(len(c1), 1))
+    for start in range(0, rounds, batch):
+        d1, d2 = draw(rng, c1, c2, n1, n2, min(batch, rounds - start))
+        yield statistic(d1 / (2 * n1), d2 / (2 * n2), n1, n2)
+
+
+class _MaskedStatistic:
+    """A statistic that is NaN for the missing SNPs, picklable so it can be sent to the workers."""
+
+    def __init__(self, statistic, missing):
+        self.statistic = statistic
+        self.missing = missing
+
+    def __call__(self, p1, p2, n1, n2):
+        values = np.asarray(self.statistic(p1, p2, n1, n2), dtype=float)
+        values[..., self.missing] = np.nan
+        return values
+
+
+# count the permuted statistics at least as large as the observed ones, one task
+def _count_exceedances(statistic, c1, c2, n1, n2, observed, rounds, lo, hi, seed):
+    exceed = np.zeros(len(observed) if lo is None else len(lo), dtype=np.int64)
+    target = observed if lo is None else window_means(observed, lo, hi)
+    # a relative tolerance so a permutation that reproduces the observed counts always counts
+    tolerance = 1e-9 * np.maximum(np.abs(target), 1)
+    for null in resampled_statistics(permuted_counts, statistic, c1, c2, n1, n2, rounds, seed):
+        if lo is not None:
+            null = window_means(null, lo, hi)
+        exceed += (null >= target - tolerance).sum(axis=0)
+    return exceed
+
+
+# resample the statistic of a block of count pairs and keep all rounds, one task
+def _bootstrap_block(statistic, c1, c2, n1, n2, rounds, lo, hi, seed):
+    values = np.concatenate(list(resampled_statistics(bootstrap_counts, statistic, c1, c2, n1, n2, rounds, seed)))
+    return values if lo is None else window_means(values, lo, hi)
+
+
+#This checks the arguments shared by the resampling functions and computes the allele counts
+def _counts(p1, p2, n1, n2, rounds):
+    if not n1 or not n2:
+        raise ValueError("Resampling needs the sample sizes n1 and n2 of both populations.")
+    if rounds < 1:
+        raise ValueError("The number of resampling rounds must be at least 1.")
+    c1, c2 = allele_counts(p1, n1), allele_counts(p2, n2)
+    return c1, c2, (c1 < 0) | (c2 < 0)
+
+
+#This computes per-SNP empirical p-values by permuting the population labels of the sampled alleles
+def permutation_pvalues(p1, p2, n1, n2, statistic=delta_af, permutations=1000, workers=None, seed=None):
+    """
+    Returns the empirical p-value of statistic(p1, p2, n1, n2) for every SNP: the share of
+    permutations, counting the observed one, whose statistic is at least as large. The 2*n1 + 2*n2
+    alleles of a SNP are pooled and dealt out again (a hypergeometric draw); SNPs with the same pair
+    of allele counts share their draws. Each round is one vectorised draw over the distinct pairs and
+    the rounds are split over a pool of workers. Missing frequencies give NaN.
+    """
+    c1, c2, missing = _counts(p1, p2, n1, n2, permutations)
+    pairs1, pairs2, inverse = distinct_pairs(np.where(missing, 0, c1), np.where(missing, 0, c2), n2)
+    observed = statistic(pairs1 / (2 * n1), pairs2 / (2 * n2), n1, n2)
+    tasks = [(statistic, pairs1, pairs2, n1, n2, observed, rounds, None, None) for rounds in round_chunks(permutations)]
+    exceed = sum(run_tasks(_count_exceedances, tasks, workers, seed))
+    pvalues = ((1 + exceed) / (1 + permutations))[inverse]
+    pvalues[missing] = np.nan
+    return pvalues
+
+
+#This computes per-SNP percentile bootstrap confidence intervals
+def bootstrap_intervals(p1, p2, n1, n2, statistic=delta_af, rounds=1000, confidence=0.95, workers=None, seed=None):
+    """
+    Returns (low, high), the percentile bootstrap interval of statistic(p1, p2, n1, n2) for every SNP.
+    Each population's allele count is drawn again from a binomial of its own frequency; SNPs with the
+    same pair of allele counts share their draws, and blocks of distinct pairs are split over the workers.
+    Missing frequencies give NaN.
+    """
+    c1, c2, missing = _counts(p1, p2, n1, n2, rounds)
+    pairs1, pairs2, inverse = distinct_pairs(np.where(missing, 0, c1), np.where(missing, 0, c2), n2)
+    tasks = [(statistic, pairs1[start:start + PAIRS_PER_TASK], pairs2[start:start + PAIRS_PER_TASK], n1, n2, rounds, None, None)
+             for start in range(0, len(pairs1), PAIRS_PER_TASK)]
+    alpha = (1 - confidence) / 2
+    bounds = [np.quantile(values, [alpha, 1 - alpha], axis=0) for values in run_tasks(_bootstrap_block, tasks, workers, seed)]
+    low, high = (np.concatenate(part)[inverse] for part in zip(*bounds)) if bounds else (np.zeros(len(c1)), np.zeros(len(c1)))
+    low[missing], high[missing] = np.nan, np.nan
+    return low, high
+
+
+#This computes empirical p-values of the window means of a statistic
+def window_permutation_pvalues(p1, p2, n1, n2, lo, hi, statistic=delta_af, permutations=1000, workers=None, seed=None):
+    """
+    Returns the empirical p-value of the mean statistic over the rows lo:hi of every window (the row
+    ranges of window_scan.window_ranges over position-sorted SNPs). Every SNP gets its own permuted
+    counts in each round, so the window means of a round come from one prefix sum over all SNPs.
+    SNPs with missing frequencies are left out of the means.
+    """
+    c1, c2, missing = _counts(p1, p2, n1, n2, permutations)
+    observed = np.where(missing, np.nan, statistic(np.maximum(c1, 0) / (2 * n1), np.maximum(c2, 0) / (2 * n2), n1, n2))
+    c1, c2 = np.where(missing, 0, c1), np.where(missing, 0, c2)
+    # missing SNPs stay missing in the permuted rounds too
+    masked = _MaskedStatistic(statistic, missing)
+    lo, hi = np.asarray(lo, dtype=np.int64), np.asarray(hi, dtype=np.int64)
+    tasks = [(masked, c1, c2, n1, n2, observed, rounds, lo, hi) for rounds in round_chunks(permutations)]
+    exceed = sum(run_tasks(_count_exceedances, tasks, workers, seed))
+    pvalues = (1 + exceed) / (1 + permutations)
+    pvalues[np.isnan(window_means(observed, lo, hi))] = np.nan
+    return pvalues
+
+
+#This computes percentile bootstrap confidence intervals of the window means of a statistic
+def window_bootstrap_intervals(p1, p2, n1, n2, lo, hi, statistic=delta_af, rounds=1000, confidence=0.95, workers=None, seed=None):
+    """Returns (low, high) for the mean statistic over the rows lo:hi of every window, see window_permutation_pvalues."""
+    c1, c2, missing = _counts(p1, p2, n1, n2, rounds)
+    c1, c2 = np.where(missing, 0, c1), np.where(missing, 0, c2)
+    masked = _MaskedStatistic(statistic, missing)
+    lo, hi = np.asarray(lo, dtype=np.int64), np.asarray(hi, dtype=np.int64)
+    tasks = [(masked, c1, c2, n1, n2, chunk, lo, hi) for chunk in round_chunks(rounds)]
+    values = np.concatenate(run_tasks(_bootstrap_block, tasks, workers, seed))
+    alpha = (1 - confidence) / 2
+    with np.errstate(invalid="ignore"):
+        low, high = np.nanquantile(values, [alpha, 1 - alpha], axis=0) if len(lo) else (np.zeros(0), np.zeros(0))
+    return low, high
+
+
+#This is the genome-wide empirical p-value of each value, the outlier test of a scan without frequencies to resample
+def empirical_pvalues(values, background):
+    """
+    Returns the share of the background values (sorted ascending, without NaN) that are at least as
+    large as each value, counting the value itself as one of them. NaN gives NaN.
+    """
+    values = np.asarray(values, dtype=float)
+    at_least = len(background) - np.searchsorted(background, values, side="left")
+    pvalues = (at_least + 1) / (len(background) + 1)
+    pvalues[np.isnan(values)] = np.nan
+    return pvalues
+
+
+#This adds the resampling columns to a table of per-SNP frequencies
+def add_significance_columns(table, p1, p2, n1, n2, statistic, permutations=0, bootstrap=0, confidence=0.95, workers=None, seed=None):
+    """Adds 'Empirical P' (permutations) and 'CI Low'/'CI High' (bootstrap) to table, prints how long each took."""
+    if permutations:
+        start = time.perf_counter()
+        table['Empirical P'] = permutation_pvalues(p1, p2, n1, n2, statistic, permutations, workers, seed)
+        print(f"{permutations} permutations of {len(table)} SNPs in {time.perf_counter() - start:.1f}s")
+    if bootstrap:
+        start = time.perf_counter()
+        low, high = bootstrap_intervals(p1, p2, n1, n2, statistic, bootstrap, confidence, workers, seed)
+        table['CI Low'], table['CI High'] = np.round(low, 5), np.round(high, 5)
+        print(f"{bootstrap} bootstrap rounds of {len(table)} SNPs in {time.perf_counter() - start:.1f}s")
+    return table
+
+
+# command line options shared by the scripts
+def add_resampling_arguments(parser):
+    """Adds the --permutations, --bootstrap, --confidence and --seed options to an argparse parser."""
+    parser.add_argument("--permutations", type=int, default=0,
+                        help="add an empirical p-value from this many permutations of the population labels")
+    parser.add_argument("--bootstrap", type=int, default=0,
+                        help="add a percentile bootstrap confidence interval from this many rounds")
+    parser.add_argument("--confidence", type=float, default=0.95, help="coverage of the bootstrap interval")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the resampling, for reproducible results")
+
+
+#This rejects the options that cannot be used together with the resampling
+def check_resampling_arguments(parser, args):
+    """
+    Stops with a usage error when --permutations or --bootstrap is combined with --chunksize:
+    the resampling runs on the whole table at once (spreading its rounds over the --workers
+    processes), so the input is never streamed in chunks.
+    """
+    if getattr(args, "chunksize", None) and (args.permutations or args.bootstrap):
+        parser.error("--chunksize cannot be combined with --permutations or --bootstrap")
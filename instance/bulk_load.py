@@ -0,0 +1,261 @@
+#bulk loader for the genetics database, a faster alternative to the row by row inserts in sql_code_for_db.py
+#run: python bulk_load.py --db genetics.db --excel data_sql_fst.xlsx [--upsert] [--batch-size 50000]
+#  or: python bulk_load.py --db genetics.db --columnar export (Parquet/Feather files written by columnar_io.py)
+
+import argparse
+import sqlite3
+import time
+from itertools import islice
+import pandas as pd
+from migrations import migrate
+from summaries import refresh_chromosome_stats
+from column_store import build_column_store
+
+# same tables as sql_code_for_db.py, created only when they do not exist yet
+SCHEMA = """CREATE TABLE IF NOT EXISTS snp (
+    snp_id VARCHAR(20) PRIMARY KEY,
+    risk_allele CHAR(50),
+    chromosome VARCHAR(5),
+    position INTEGER,
+    p_value REAL,
+    odds_ratio REAL,
+    ci VARCHAR(20),
+    trait VARCHAR(100),
+    mapped_gene VARCHAR(50),
+    study_accession VARCHAR(50),
+    pubmed_id VARCHAR(20),
+    beb VARCHAR(100),
+    pjl VARCHAR(100),
+    reference CHAR(1),
+    ancestral CHAR(1),
+    delta_af REAL,
+    daf_beb REAL,
+    daf_pjl REAL,
+    phenotype VARCHAR(50),
+    t2dkp_p_value REAL,
+    beta REAL,
+    fst_beb REAL,
+    fst_pjl REAL
+);
+CREATE TABLE IF NOT EXISTS candidate_gene (
+    gene_name VARCHAR(50) PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS pathway (
+    pathway_id VARCHAR(50) PRIMARY KEY,
+    pathway_name VARCHAR(100)
+);
+CREATE TABLE IF NOT EXISTS snp_pathway (
+    snp_id VARCHAR(20),
+    pathway_id VARCHAR(50),
+    PRIMARY KEY (snp_id, pathway_id),
+    FOREIGN KEY (snp_id) REFERENCES snp(snp_id),
+    FOREIGN KEY (pathway_id) REFERENCES pathway(pathway_id)
+);
+CREATE TABLE IF NOT EXISTS go_term (
+    go_id VARCHAR(50) PRIMARY KEY,
+    go_term VARCHAR(100)
+);
+CREATE TABLE IF NOT EXISTS snp_go (
+    snp_id VARCHAR(20),
+    go_id VARCHAR(50),
+    PRIMARY KEY (snp_id, go_id),
+    FOREIGN KEY (snp_id) REFERENCES snp(snp_id),
+    FOREIGN KEY (go_id) REFERENCES go_term(go_id)
+);
+"""
+
+# tables in load order (parents before the link tables) with their primary key columns
+TABLES = {
+    "snp": ["snp_id"],
+    "candidate_gene": ["gene_name"],
+    "pathway": ["pathway_id"],
+    "go_term": ["go_id"],
+    "snp_pathway": ["snp_id", "pathway_id"],
+    "snp_go": ["snp_id", "go_id"],
+}
+
+# settings that trade durability for speed while the loader is the only writer
+LOAD_PRAGMAS = {
+    "journal_mode": "MEMORY",
+    "synchronous": "OFF",
+    "cache_size": "-262144",  # 256 MB
+    "temp_store": "MEMORY",
+    "foreign_keys": "OFF",
+}
+
+
+# build the insert statement for a table
+def insert_sql(table, columns, upsert=False):
+    """
+    Returns the INSERT statement for the given columns. snp rows are plain inserts (a duplicate
+    is an error, as in sql_code_for_db.py) and the other tables ignore duplicates. With upsert
+    every table updates the non key columns of rows that already exist.
+    """
+    placeholders = ", ".join("?" for _ in columns)
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+    if not upsert:
+        return sql if table == "snp" else sql.replace("INSERT INTO", "INSERT OR IGNORE INTO", 1)
+    keys = TABLES[table]
+    updates = [f"{column} = excluded.{column}" for column in columns if column not in keys]
+    if updates:
+        return f"{sql} ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {', '.join(updates)}"
+    return f"{sql} ON CONFLICT ({', '.join(keys)}) DO NOTHING"
+
+
+# yield the rows of a DataFrame as tuples of plain python values, missing values as NULL
+def iter_rows(df):
+    values = df.astype(object).where(df.notna(), None)
+    return values.itertuples(index=False, name=None)
+
+
+# insert one table with executemany in batches
+def load_table(cursor, table, df, batch_size=50000, upsert=False):
+    """Inserts every row of df into table and returns (rows, seconds)."""
+    columns = [column for column in df.columns if not str(column).startswith("Unnamed")]
+    df = df[columns]
+    sql = insert_sql(table, columns, upsert)
+    rows = iter_rows(df)
+    start = time.perf_counter()
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        cursor.executemany(sql, batch)
+    return len(df), time.perf_counter() - start
+
+
+# drop the secondary indexes and triggers of the loaded tables and return their definitions
+def drop_indexes(cursor, tables):
+    """
+    Drops user created indexes and triggers (the full-text sync triggers) on the given tables
+    so they can be rebuilt once after the load.
+    """
+    placeholders = ", ".join("?" for _ in tables)
+    objects = cursor.execute(
+        f"SELECT type, name, sql FROM sqlite_master WHERE type IN ('index', 'trigger') AND sql IS NOT NULL "
+        f"AND tbl_name IN ({placeholders})",
+        list(tables),
+    ).fetchall()
+    for kind, name, _ in objects:
+        cursor.execute(f"DROP {kind.upper()} {name}")
+    return [sql for _, _, sql in objects]
+
+
+# rebuild the full-text index from the snp table after a load with its triggers dropped
+def rebuild_full_text(cursor):
+    if cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'snp_fts'").fetchone():
+        cursor.execute("INSERT INTO snp_fts (snp_fts) VALUES ('rebuild')")
+
+
+# remember which SNPs a load touches, to refresh only their chromosomes in chromosome_stats
+def track_loaded_snps(cursor, df):
+    cursor.execute("CREATE TEMP TABLE IF NOT EXISTS loaded_snp (snp_id TEXT PRIMARY KEY)")
+    cursor.execute("DELETE FROM loaded_snp")
+    cursor.executemany("INSERT OR IGNORE INTO loaded_snp VALUES (?)",
+                       ((str(snp_id),) for snp_id in df["snp_id"].dropna()))
+
+
+# chromosomes currently stored for the tracked SNPs
+def loaded_chromosomes(cursor):
+    return {row[0] for row in cursor.execute(
+        "SELECT DISTINCT chromosome FROM snp WHERE snp_id IN (SELECT snp_id FROM loaded_snp) AND chromosome IS NOT NULL"
+    )}
+
+
+# load every sheet that matches a table, inside one transaction
+def bulk_load(db_path, sheets, batch_size=50000, upsert=False):
+    """
+    Loads {table name: DataFrame} into the database at db_path. All inserts run in one explicit
+    transaction with loader PRAGMAs set, pending migrations are applied, secondary indexes are
+    rebuilt after the data is in and rows/sec is printed per table. The chromosome_stats rows are
+    refreshed for the chromosomes of the loaded SNPs (before and after an upsert) and the column
+    store (column_store.py) is rewritten for the new data.
+    Returns {table: rows}.
+    """
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    cursor = conn.cursor()
+    cursor.executescript(SCHEMA)
+    # bring the schema (indexes included) up to date first, the indexes are then rebuilt after the load
+    migrate(db_path)
+    pragmas = dict(LOAD_PRAGMAS)
+    if cursor.execute("PRAGMA journal_mode").fetchone()[0] == "wal":
+        # the web app keeps the database in WAL mode so its readers are not blocked by the load
+        del pragmas["journal_mode"]
+    previous = {name: cursor.execute(f"PRAGMA {name}").fetchone()[0] for name in pragmas}
+    for name, value in pragmas.items():
+        cursor.execute(f"PRAGMA {name} = {value}")
+
+    loaded = {}
+    tables = [table for table in TABLES if table in sheets]
+    try:
+        cursor.execute("BEGIN")
+        index_sql = drop_indexes(cursor, tables)
+        touched = set()
+        if "snp" in tables:
+            track_loaded_snps(cursor, sheets["snp"])
+            # an upsert may move a SNP to another chromosome, which then needs refreshing too
+            touched |= loaded_chromosomes(cursor)
+        for table in tables:
+            rows, seconds = load_table(cursor, table, sheets[table], batch_size, upsert)
+            loaded[table] = rows
+            print(f"{table}: {rows} rows in {seconds:.2f}s ({rows / max(seconds, 1e-9):,.0f} rows/sec)")
+        start = time.perf_counter()
+        for sql in index_sql:
+            cursor.execute(sql)
+        if "snp" in tables:
+            rebuild_full_text(cursor)
+            touched |= loaded_chromosomes(cursor)
+            refresh_chromosome_stats(cursor, touched)
+            # the generation triggers were dropped with the other triggers, the load counts as one change
+            cursor.execute("UPDATE snp_generation SET generation = generation + 1")
+        cursor.execute("COMMIT")
+        print(f"rebuilt {len(index_sql)} indexes and triggers in {time.perf_counter() - start:.2f}s")
+        if touched:
+            print(f"refreshed the statistics of {len(touched)} chromosomes")
+    except Exception:
+        cursor.execute("ROLLBACK")
+        raise
+    else:
+        # refresh the planner statistics for the new data
+        cursor.execute("ANALYZE")
+    finally:
+        for name, value in previous.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        conn.close()
+    if "snp" in loaded:
+        start = time.perf_counter()
+        build_column_store(db_path)
+        print(f"wrote the column store in {time.perf_counter() - start:.2f}s")
+    return loaded
+
+
+# read the sheets of the excel workbook used by sql_code_for_db.py
+def read_excel_sheets(file_path):
+    """Returns {sheet name: DataFrame} for the workbook, keeping only the columns of each table."""
+    sheets = pd.read_excel(file_path, sheet_name=None)
+    # the pathway sheet also carries an snp_id column that belongs in snp_pathway
+    if "pathway" in sheets:
+        sheets["pathway"] = sheets["pathway"][["pathway_id", "pathway_name"]]
+    return sheets
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk load the genetics database from the Excel workbook.")
+    parser.add_argument("--db", default="genetics.db")
+    parser.add_argument("--excel", default="data_sql_fst.xlsx")
+    parser.add_argument("--columnar", help="directory of Parquet/Feather tables to load instead of the workbook")
+    parser.add_argument("--batch-size", type=int, default=50000)
+    parser.add_argument("--upsert", action="store_true", help="update existing rows instead of needing a fresh database")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.columnar:
+        # imported here so the Excel path does not need pyarrow
+        from columnar_io import read_columnar_tables
+        sheets = read_columnar_tables(args.columnar)
+    else:
+        sheets = read_excel_sheets(args.excel)
+    loaded = bulk_load(args.db, sheets, args.batch_size, args.upsert)
+    seconds = time.perf_counter() - start
+    total = sum(loaded.values())
+    print(f"Data inserted successfully! {total} rows in {seconds:.2f}s ({total / max(seconds, 1e-9):,.0f} rows/sec)")
@@ -0,0 +1,205 @@
+#memory-mapped columnar copy of the numeric snp columns, shared through the page cache by every process that reads it
+#run: python column_store.py --db genetics.db (bulk_load.py and the web app also build it when it is missing or stale)
+#layout: <db dir>/columns/<key>/ holds one .npy file per column and index.json with the per-chromosome offsets,
+#rows are sorted by (chromosome, position, snp_id) so the rows of a chromosome are one contiguous slice
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import sys
+from urllib.request import pathname2url
+import numpy as np
+import pandas as pd
+
+# chromosomes in genomic order are shared with the SummaryStatsCalculations scripts, the others follow alphabetically
+sys.path.append(os.path.join(os.path.abspath(os.path.dirname(__file__)), "..", "SummaryStatsCalculations"))
+from parallel import CHROMOSOME_ORDER
+
+# numeric snp columns, missing and non-numeric values (e.g. '-') are stored as NaN
+FLOAT_COLUMNS = ["p_value", "t2dkp_p_value", "beta", "daf_beb", "daf_pjl", "delta_af", "fst_beb", "fst_pjl"]
+# text columns stored as fixed-width utf-8 bytes, an empty value reads back as None
+TEXT_COLUMNS = ["snp_id", "risk_allele"]
+
+
+# directory holding the stores of a database
+def store_root(db_path):
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), "columns")
+
+
+# read the key identifying the current snp data
+def store_key(conn):
+    """
+    Returns '<token>-<generation>' from the snp_generation table of the migrations, which the
+    triggers on snp bump on every change, so a store is current exactly when its key matches.
+    A database migration 6 has not reached yet is keyed on its snp row count and largest rowid
+    plus the modification time and size of its files, which changes with any write.
+    """
+    try:
+        token, generation = conn.execute("SELECT token, generation FROM snp_generation").fetchone()
+        return f"{token}-{generation}"
+    except sqlite3.OperationalError:
+        pass
+    count, last = conn.execute("SELECT count(*), max(rowid) FROM snp").fetchone()
+    path = conn.execute("PRAGMA database_list").fetchone()[2]
+    stats = [f"{count}:{last}"]
+    for name in (path, path + "-wal"):
+        try:
+            stat = os.stat(name)
+            stats.append(f"{stat.st_mtime_ns}:{stat.st_size}")
+        except FileNotFoundError:
+            stats.append("-")
+    return "unversioned-" + hashlib.sha1("|".join(stats).encode()).hexdigest()[:16]
+
+
+# sort key putting chromosomes in genomic order
+def chromosome_sort_key(name):
+    name = str(name).strip()
+    if name in CHROMOSOME_ORDER:
+        return (0, CHROMOSOME_ORDER.index(name), name)
+    return (1, 0, name)
+
+
+# encode a text column as fixed-width bytes, as wide as its longest value
+def encode_text(values):
+    values = values.astype(object).where(values.notna(), "").astype(str)
+    return np.array(values.str.encode("utf-8").tolist(), dtype=bytes)
+
+
+# write the store of the current snp data
+def build_column_store(db_path):
+    """
+    Writes the store for the current key of db_path and returns its directory. The files are written
+    to a temporary directory that is renamed into place, so readers never see a half-written store,
+    and older stores are removed (processes still mapping them keep their pages until they let go).
+    """
+    root = store_root(db_path)
+    conn = sqlite3.connect(f"file:{pathname2url(os.path.abspath(db_path))}?mode=ro", uri=True)
+    try:
+        conn.execute("BEGIN")  # one snapshot for the key and the rows
+        key = store_key(conn)
+        df = pd.read_sql_query(
+            f"SELECT chromosome, position, {', '.join(TEXT_COLUMNS + FLOAT_COLUMNS)} FROM snp "
+            "WHERE chromosome IS NOT NULL AND position IS NOT NULL", conn)
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+    directory = os.path.join(root, key)
+    if os.path.isdir(directory):
+        return directory
+
+    df["position"] = pd.to_numeric(df["position"], errors="coerce")
+    df = df.dropna(subset=["position"])
+    df["chromosome"] = df["chromosome"].astype(str)
+    chromosomes = sorted(df["chromosome"].unique(), key=chromosome_sort_key)
+    df["code"] = pd.Categorical(df["chromosome"], categories=chromosomes).codes.astype(np.int16)
+    df["snp_id"] = df["snp_id"].astype(str)
+    df = df.sort_values(["code", "position", "snp_id"], kind="mergesort")
+
+    columns = {"chromosome": df["code"].to_numpy(), "position": df["position"].to_numpy(dtype=np.int64)}
+    for column in TEXT_COLUMNS:
+        columns[column] = encode_text(df[column])
+    for column in FLOAT_COLUMNS:
+        columns[column] = pd.to_numeric(df[column], errors="coerce").to_numpy(dtype=np.float64)
+    starts = np.searchsorted(columns["chromosome"], np.arange(len(chromosomes)), "left")
+    ends = np.searchsorted(columns["chromosome"], np.arange(len(chromosomes)), "right")
+
+    os.makedirs(root, exist_ok=True)
+    temporary = os.path.join(root, f".build-{os.getpid()}-{key}")
+    shutil.rmtree(temporary, ignore_errors=True)
+    os.makedirs(temporary)
+    for name, values in columns.items():
+        np.save(os.path.join(temporary, f"{name}.npy"), values)
+    with open(os.path.join(temporary, "index.json"), "w") as f:
+        json.dump({
+            "key": key,
+            "rows": len(df),
+            "columns": {name: values.dtype.str for name, values in columns.items()},
+            "chromosomes": [{"name": name, "start": int(start), "end": int(end)}
+                            for name, start, end in zip(chromosomes, starts, ends)],
+        }, f)
+    try:
+        os.rename(temporary, directory)
+    except OSError:
+        # another process finished the same store first
+        shutil.rmtree(temporary, ignore_errors=True)
+    for entry in os.scandir(root):
+        if entry.is_dir() and entry.name != key and not entry.name.startswith(".build-"):
+            shutil.rmtree(entry.path, ignore_errors=True)
+    return directory
+
+
+class ColumnStore:
+    """
+    Read-only view of a store: every column is a NumPy array mapped from its file (np.load with
+    mmap_mode='r'), so opening it reads no data and all processes share the page-cache copy. The
+    rows of a chromosome are the slice chromosome_slice() returns, found in O(1).
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, "index.json")) as f:
+            self.index = json.load(f)
+        self.key = self.index["key"]
+        # an empty file cannot be mapped
+        mmap_mode = "r" if self.index["rows"] else None
+        self.columns = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode)
+                        for name in self.index["columns"]}
+        self.chromosomes = [chromosome["name"] for chromosome in self.index["chromosomes"]]
+        self.offsets = {chromosome["name"]: (chromosome["start"], chromosome["end"])
+                        for chromosome in self.index["chromosomes"]}
+
+    def __len__(self):
+        return self.index["rows"]
+
+    # rows of one chromosome
+    def chromosome_slice(self, chromosome):
+        start, end = self.offsets.get(str(chromosome), (0, 0))
+        return slice(start, end)
+
+    # decode a text column for some rows
+    def text(self, name, rows=slice(None)):
+        """Returns the values of a text column at rows (a slice or an array of row numbers) as a list of str."""
+        return [value.decode("utf-8") or None for value in self.columns[name][rows].tolist()]
+
+    # build a DataFrame of some columns
+    def frame(self, columns, rows=slice(None)):
+        """
+        Returns a DataFrame of columns at rows, indexed by row number in the store. chromosome is an
+        ordered categorical of the chromosome names; numeric columns are not decoded, only sliced.
+        """
+        index = np.arange(len(self))[rows]
+        data = {}
+        for name in columns:
+            values = self.columns[name][rows]
+            if name == "chromosome":
+                data[name] = pd.Categorical.from_codes(values, categories=self.chromosomes, ordered=True)
+            elif name in TEXT_COLUMNS:
+                data[name] = self.text(name, rows)
+            else:
+                data[name] = values
+        return pd.DataFrame(data, index=index, copy=False)
+
+
+# open the store of the current snp data, building it when needed
+def open_column_store(db_path):
+    """Returns the ColumnStore for the current data of db_path, built first if it does not exist yet."""
+    conn = sqlite3.connect(f"file:{pathname2url(os.path.abspath(db_path))}?mode=ro", uri=True)
+    try:
+        key = store_key(conn)
+    finally:
+        conn.close()
+    try:
+        return ColumnStore(os.path.join(store_root(db_path), key))
+    except FileNotFoundError:
+        # not built yet, or removed by a process that built a newer one
+        return ColumnStore(build_column_store(db_path))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the memory-mapped column store of a genetics database.")
+    parser.add_argument("--db", default="genetics.db")
+    args = parser.parse_args()
+    store = ColumnStore(build_column_store(args.db))
+    print(f"column store {store.directory}: {len(store)} SNPs on {len(store.chromosomes)} chromosomes")
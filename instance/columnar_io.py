@@ -0,0 +1,226 @@
+#columnar export of the genetics database to Parquet or Arrow Feather files, and the reader bulk_load.py ingests them with
+#run: python columnar_io.py --db genetics.db --out export [--format parquet|feather] [--columns snp_id,chromosome,...] [--chromosome 1 ...]
+#load back: python bulk_load.py --db genetics.db --columnar export
+#needs pyarrow (pip install pyarrow), which the rest of the loader does not
+
+import argparse
+import os
+import sqlite3
+import time
+from urllib.request import pathname2url
+import pandas as pd
+from column_store import chromosome_sort_key
+
+# tables written by an export, in the load order of bulk_load.py
+EXPORT_TABLES = ["snp", "candidate_gene", "pathway", "go_term", "snp_pathway", "snp_go"]
+# file extension of each format
+FORMATS = {"parquet": ".parquet", "feather": ".feather"}
+# rows fetched from SQLite per batch for the tables that are not split by chromosome
+BATCH_ROWS = 500000
+
+
+# import pyarrow, which only the columnar formats need
+def import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Parquet and Feather files need pyarrow, install it with: pip install pyarrow") from None
+    return pyarrow
+
+
+# arrow type of a column from its declared SQLite type (the SQLite affinity rules)
+def arrow_type(pa, declared):
+    declared = (declared or "").upper()
+    if "INT" in declared:
+        return pa.int64()
+    if any(name in declared for name in ("REAL", "FLOA", "DOUB")):
+        return pa.float64()
+    return pa.string()
+
+
+# schema of a table, optionally projected on some columns
+def table_schema(pa, conn, table, columns=None):
+    declared = {row[1]: row[2] for row in conn.execute(f"PRAGMA table_info({table})")}
+    if columns:
+        unknown = [column for column in columns if column not in declared]
+        if unknown:
+            raise ValueError(f"{table} has no column {', '.join(unknown)}")
+        declared = {column: declared[column] for column in columns}
+    return pa.schema([(column, arrow_type(pa, kind)) for column, kind in declared.items()])
+
+
+# turn fetched rows into an arrow table of the schema
+def rows_to_table(pa, rows, schema):
+    """
+    Builds a table from SQLite rows. Numeric columns keep numbers only: text in them (the '-'
+    placeholders of missing values) becomes null. Text columns hold every other value as text,
+    as a TEXT column in SQLite would.
+    """
+    values = list(zip(*rows)) if rows else [()] * len(schema)
+    arrays = []
+    for field, column in zip(schema, values):
+        if pa.types.is_string(field.type):
+            arrays.append(pa.array([None if v is None else str(v) for v in column], type=field.type))
+        else:
+            numbers = pd.to_numeric(pd.Series(column, dtype=object), errors="coerce")
+            if pa.types.is_integer(field.type):
+                numbers = numbers.astype("Int64")
+            arrays.append(pa.array(numbers, type=field.type, from_pandas=True))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+# yield the snp rows one chromosome at a time, in genomic order
+def snp_batches(conn, columns, chromosomes=None):
+    found = [row[0] for row in conn.execute("SELECT DISTINCT chromosome FROM snp")]
+    if chromosomes is not None:
+        found = [chromosome for chromosome in found if chromosome is not None and str(chromosome) in chromosomes]
+    found.sort(key=lambda chromosome: (chromosome is None, chromosome_sort_key(chromosome)))
+    select = f"SELECT {', '.join(columns)} FROM snp"
+    for chromosome in found:
+        if chromosome is None:
+            yield conn.execute(f"{select} WHERE chromosome IS NULL ORDER BY position, snp_id").fetchall()
+        else:
+            yield conn.execute(f"{select} WHERE chromosome = ? ORDER BY position, snp_id", (chromosome,)).fetchall()
+
+
+# yield the rows of another table in batches
+def table_batches(conn, table, columns, chromosomes=None):
+    sql = f"SELECT {', '.join(columns)} FROM {table}"
+    params = []
+    if chromosomes is not None and "snp_id" in columns:
+        # link tables follow the SNPs that were exported
+        placeholders = ", ".join("?" for _ in chromosomes)
+        sql += f" WHERE snp_id IN (SELECT snp_id FROM snp WHERE chromosome IN ({placeholders}))"
+        params = list(chromosomes)
+    cursor = conn.execute(sql, params)
+    while True:
+        rows = cursor.fetchmany(BATCH_ROWS)
+        if not rows:
+            break
+        yield rows
+
+
+# write batches of rows to one file
+def write_table(pa, path, schema, batches, file_format):
+    """Writes each batch as its own Parquet row group or Feather record batch, returns the row count."""
+    rows = 0
+    if file_format == "parquet":
+        writer = pa.parquet.ParquetWriter(path, schema, compression="zstd")
+    else:
+        writer = pa.ipc.new_file(path, schema, options=pa.ipc.IpcWriteOptions(compression="zstd"))
+    try:
+        for batch in batches:
+            if not batch:
+                continue
+            table = rows_to_table(pa, batch, schema)
+            if file_format == "parquet":
+                writer.write_table(table, row_group_size=len(table))
+            else:
+                for record_batch in table.to_batches(max_chunksize=len(table)):
+                    writer.write_batch(record_batch)
+            rows += len(table)
+    finally:
+        writer.close()
+    return rows
+
+
+# export the database
+def export_columnar(db_path, directory, file_format="parquet", columns=None, chromosomes=None):
+    """
+    Writes every EXPORT_TABLES table of db_path to <directory>/<table>.parquet (or .feather) from
+    one consistent snapshot. snp gets one row group (record batch) per chromosome in genomic order,
+    so readers can skip chromosomes; columns projects snp (snp_id is always kept) and chromosomes
+    limits snp and its link tables to those chromosomes. Returns {table: rows}.
+    """
+    pa = import_pyarrow()
+    if file_format not in FORMATS:
+        raise ValueError(f"unknown format {file_format!r}, use one of {', '.join(FORMATS)}")
+    if columns and "snp_id" not in columns:
+        columns = ["snp_id"] + list(columns)
+    chromosomes = None if chromosomes is None else [str(chromosome) for chromosome in chromosomes]
+    os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(f"file:{pathname2url(os.path.abspath(db_path))}?mode=ro", uri=True)
+    written = {}
+    try:
+        conn.execute("BEGIN")  # one snapshot for every table
+        existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        for table in EXPORT_TABLES:
+            if table not in existing:
+                continue
+            schema = table_schema(pa, conn, table, columns if table == "snp" else None)
+            if table == "snp":
+                batches = snp_batches(conn, schema.names, chromosomes)
+            else:
+                batches = table_batches(conn, table, schema.names, chromosomes)
+            path = os.path.join(directory, table + FORMATS[file_format])
+            start = time.perf_counter()
+            written[table] = write_table(pa, path, schema, batches, file_format)
+            seconds = time.perf_counter() - start
+            print(f"{table}: {written[table]} rows in {seconds:.2f}s ({written[table] / max(seconds, 1e-9):,.0f} rows/sec)")
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+    return written
+
+
+# read one exported file
+def read_columnar(path, columns=None, chromosomes=None):
+    """
+    Returns the rows of an exported .parquet or .feather file as a DataFrame with nullable integer
+    columns, reading only columns (all when None) and, for snp, only the given chromosomes.
+    """
+    pa = import_pyarrow()
+    if chromosomes is not None:
+        chromosomes = [str(chromosome) for chromosome in chromosomes]
+    read_columns = None if columns is None else list(dict.fromkeys(list(columns) + (["chromosome"] if chromosomes else [])))
+    if path.endswith(FORMATS["parquet"]):
+        filters = [("chromosome", "in", chromosomes)] if chromosomes is not None else None
+        table = pa.parquet.read_table(path, columns=read_columns, filters=filters)
+    else:
+        with pa.memory_map(path) as source:
+            reader = pa.ipc.open_file(source)
+            batches = [reader.get_batch(i) for i in range(reader.num_record_batches)]
+            if chromosomes is not None:
+                # one chromosome per record batch, the others are never decoded
+                batches = [batch for batch in batches if batch.num_rows
+                           and batch.column("chromosome")[0].as_py() in chromosomes]
+            table = pa.Table.from_batches(batches, schema=reader.schema)
+            if read_columns is not None:
+                table = table.select(read_columns)
+    df = table.to_pandas(types_mapper={pa.int64(): pd.Int64Dtype()}.get)
+    return df if columns is None else df[list(columns)]
+
+
+# read an export back as the sheets bulk_load.py loads
+def read_columnar_tables(directory):
+    """Returns {table: DataFrame} for the exported files found in directory, like bulk_load.read_excel_sheets."""
+    import_pyarrow()
+    sheets = {}
+    for table in EXPORT_TABLES:
+        for extension in FORMATS.values():
+            path = os.path.join(directory, table + extension)
+            if os.path.exists(path):
+                sheets[table] = read_columnar(path)
+                break
+    if not sheets:
+        raise FileNotFoundError(f"no Parquet or Feather tables found in {directory}")
+    return sheets
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the genetics database to Parquet or Arrow Feather files.")
+    parser.add_argument("--db", default="genetics.db")
+    parser.add_argument("--out", default="export", help="directory for the <table>.parquet / .feather files")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="parquet")
+    parser.add_argument("--columns", help="comma separated snp columns to export (snp_id is always included)")
+    parser.add_argument("--chromosome", action="append", help="export only this chromosome (repeatable)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    columns = [column.strip() for column in args.columns.split(",")] if args.columns else None
+    written = export_columnar(args.db, args.out, args.format, columns, args.chromosome)
+    seconds = time.perf_counter() - start
+    total = sum(written.values())
+    print(f"Exported {total} rows to {args.out} in {seconds:.2f}s ({total / max(seconds, 1e-9):,.0f} rows/sec)")
@@ -0,0 +1,167 @@
+#versioned schema migrations for the genetics database, applied in place to existing genetics.db files
+#run: python migrations.py --db genetics.db
+#the applied version is kept in PRAGMA user_version, so running it again only applies newer migrations
+
+import argparse
+import sqlite3
+from summaries import refresh_chromosome_stats
+
+# (version, description, statements) in the order they are applied,
+# a statement is SQL or a function called with the connection for steps SQL cannot express
+MIGRATIONS = [
+    (1, "secondary indexes for the snp query paths", [
+        # genetic_data_search and /api/daf-data filter on chromosome, position and mapped_gene
+        "CREATE INDEX IF NOT EXISTS idx_snp_chromosome_position ON snp (chromosome, position)",
+        "CREATE INDEX IF NOT EXISTS idx_snp_position ON snp (position)",
+        "CREATE INDEX IF NOT EXISTS idx_snp_mapped_gene ON snp (mapped_gene)",
+        # /api/top_snps sorts on the FST columns
+        "CREATE INDEX IF NOT EXISTS idx_snp_fst_beb ON snp (fst_beb)",
+        "CREATE INDEX IF NOT EXISTS idx_snp_fst_pjl ON snp (fst_pjl)",
+        "CREATE INDEX IF NOT EXISTS idx_snp_delta_af ON snp (delta_af)",
+        # tables created by db.create_all() have no primary key on the link tables
+        "CREATE INDEX IF NOT EXISTS idx_snp_go_snp_id ON snp_go (snp_id)",
+        "CREATE INDEX IF NOT EXISTS idx_snp_pathway_snp_id ON snp_pathway (snp_id)",
+    ]),
+    (2, "FTS5 full-text index over rsIDs, alleles, genes, traits and phenotypes", [
+        # external content table: the text stays in snp, snp_fts only holds the index keyed on snp.rowid
+        # (after a VACUUM, which may renumber rowids, run: INSERT INTO snp_fts(snp_fts) VALUES ('rebuild'))
+        """CREATE VIRTUAL TABLE IF NOT EXISTS snp_fts USING fts5(
+            snp_id, risk_allele, mapped_gene, trait, phenotype,
+            content='snp', content_rowid='rowid', prefix='2 3 4'
+        )""",
+        # triggers keep the index in sync with every insert, update and delete on snp
+        """CREATE TRIGGER IF NOT EXISTS snp_fts_insert AFTER INSERT ON snp BEGIN
+            INSERT INTO snp_fts (rowid, snp_id, risk_allele, mapped_gene, trait, phenotype)
+            VALUES (new.rowid, new.snp_id, new.risk_allele, new.mapped_gene, new.trait, new.phenotype);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS snp_fts_delete AFTER DELETE ON snp BEGIN
+            INSERT INTO snp_fts (snp_fts, rowid, snp_id, risk_allele, mapped_gene, trait, phenotype)
+            VALUES ('delete', old.rowid, old.snp_id, old.risk_allele, old.mapped_gene, old.trait, old.phenotype);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS snp_fts_update AFTER UPDATE ON snp BEGIN
+            INSERT INTO snp_fts (snp_fts, rowid, snp_id, risk_allele, mapped_gene, trait, phenotype)
+            VALUES ('delete', old.rowid, old.snp_id, old.risk_allele, old.mapped_gene, old.trait, old.phenotype);
+            INSERT INTO snp_fts (rowid, snp_id, risk_allele, mapped_gene, trait, phenotype)
+            VALUES (new.rowid, new.snp_id, new.risk_allele, new.mapped_gene, new.trait, new.phenotype);
+        END""",
+        # index the rows that are already in the table
+        "INSERT INTO snp_fts (snp_fts) VALUES ('rebuild')",
+    ]),
+    (3, "index in the keyset order of the search result pages", [
+        # the search routes page through results ordered by (chromosome, position, snp_id)
+        "CREATE INDEX IF NOT EXISTS idx_snp_search_order ON snp (chromosome, position, snp_id)",
+    ]),
+    (4, "materialized per-chromosome FST summary", [
+        # read by fst_plotting.get_fst_data, bulk_load.py refreshes the chromosomes it loads (summaries.py)
+        """CREATE TABLE IF NOT EXISTS fst_chromosome_summary (
+            chromosome VARCHAR(5) PRIMARY KEY,
+            n_snps INTEGER NOT NULL,
+            n_fst_beb INTEGER NOT NULL,
+            mean_fst_beb REAL,
+            n_fst_pjl INTEGER NOT NULL,
+            mean_fst_pjl REAL
+        )""",
+        """INSERT OR REPLACE INTO fst_chromosome_summary
+        SELECT chromosome, count(*),
+            count(CASE WHEN typeof(fst_beb) IN ('integer', 'real') THEN fst_beb END),
+            avg(CASE WHEN typeof(fst_beb) IN ('integer', 'real') THEN fst_beb END),
+            count(CASE WHEN typeof(fst_pjl) IN ('integer', 'real') THEN fst_pjl END),
+            avg(CASE WHEN typeof(fst_pjl) IN ('integer', 'real') THEN fst_pjl END)
+        FROM snp WHERE chromosome IS NOT NULL GROUP BY chromosome""",
+    ]),
+    (5, "per-chromosome statistics of the DAF, delta_af and FST columns, replacing the FST summary", [
+        # one row per (chromosome, statistic), read through BackEnd/chromosome_stats.py by every
+        # chart and API; bulk_load.py refreshes the chromosomes it loads (summaries.py)
+        """CREATE TABLE IF NOT EXISTS chromosome_stats (
+            chromosome VARCHAR(5) NOT NULL,
+            statistic VARCHAR(20) NOT NULL,
+            n INTEGER NOT NULL,
+            mean REAL,
+            std REAL,
+            min REAL,
+            q1 REAL,
+            median REAL,
+            q3 REAL,
+            max REAL,
+            PRIMARY KEY (chromosome, statistic)
+        )""",
+        # quartiles are not available in SQLite, so the table is filled from python
+        refresh_chromosome_stats,
+        "DROP TABLE IF EXISTS fst_chromosome_summary",
+    ]),
+    (6, "generation counter of the snp data, the key of the memory-mapped column store", [
+        # column_store.py names each store after token-generation; the token tells apart databases
+        # created separately, the triggers count every change (bulk_load.py counts a load once)
+        """CREATE TABLE IF NOT EXISTS snp_generation (
+            token TEXT NOT NULL,
+            generation INTEGER NOT NULL
+        )""",
+        "INSERT INTO snp_generation SELECT lower(hex(randomblob(8))), 0 WHERE NOT EXISTS (SELECT 1 FROM snp_generation)",
+        """CREATE TRIGGER IF NOT EXISTS snp_generation_insert AFTER INSERT ON snp BEGIN
+            UPDATE snp_generation SET generation = generation + 1;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS snp_generation_update AFTER UPDATE ON snp BEGIN
+            UPDATE snp_generation SET generation = generation + 1;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS snp_generation_delete AFTER DELETE ON snp BEGIN
+            UPDATE snp_generation SET generation = generation + 1;
+        END""",
+    ]),
+    (7, "per-chromosome DAF and delta_af statistics from the frequency strings", [
+        # the stored daf_beb/daf_pjl/delta_af hold 0.0 where the risk allele is not listed,
+        # the statistics are now derived from risk_allele, beb and pjl (summaries.py)
+        refresh_chromosome_stats,
+    ]),
+]
+
+# newest schema version known to this module
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+# read the schema version stored in the database
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+# apply every migration newer than the database, each one in its own transaction
+def migrate(db_path):
+    """
+    Brings the database at db_path up to SCHEMA_VERSION and runs ANALYZE when anything changed.
+    Each migration is committed together with its version number, so an interrupted run can
+    simply be repeated. Returns the list of versions that were applied.
+    """
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    applied = []
+    try:
+        current = get_schema_version(conn)
+        for version, description, statements in MIGRATIONS:
+            if version <= current:
+                continue
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for statement in statements:
+                    if callable(statement):
+                        statement(conn)
+                    else:
+                        conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {int(version)}")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            print(f"applied migration {version}: {description}")
+            applied.append(version)
+        if applied:
+            # refresh the planner statistics so the new indexes are picked up
+            conn.execute("ANALYZE")
+    finally:
+        conn.close()
+    return applied
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply pending schema migrations to a genetics database.")
+    parser.add_argument("--db", default="genetics.db")
+    args = parser.parse_args()
+    applied = migrate(args.db)
+    print(f"database is at schema version {SCHEMA_VERSION}" + ("" if applied else " (nothing to apply)"))
@@ -70,6 +70,7 @@ conn.close()
 
 
 #then run this to fill the tables with the data
+#(for large workbooks use bulk_load.py, which batches the inserts in one transaction and supports --upsert)
 
 import sqlite3
 import pandas as pd
@@ -0,0 +1,71 @@
+#per-chromosome statistics derived from the snp table, refreshed by bulk_load.py for the chromosomes it touched
+#the chromosome_stats table itself is created (and filled for the first time) by the schema migrations in migrations.py
+
+import os
+import sys
+import pandas as pd
+
+# the DAF columns are derived by the same parser the web backend uses
+sys.path.append(os.path.join(os.path.abspath(os.path.dirname(__file__)), "..", "SummaryStatsCalculations"))
+from allele_freq import derive_daf_delta
+
+# snp columns summarised per chromosome
+STAT_COLUMNS = ["daf_beb", "daf_pjl", "delta_af", "fst_beb", "fst_pjl"]
+# snp columns the statistics are computed from, the DAF columns being derived from the first three
+SOURCE_COLUMNS = ["risk_allele", "beb", "pjl", "fst_beb", "fst_pjl"]
+# columns of the chromosome_stats table, one row per (chromosome, statistic)
+STATS_TABLE_COLUMNS = ["chromosome", "statistic", "n", "mean", "std", "min", "q1", "median", "q3", "max"]
+
+
+# summarise snp rows per chromosome
+def compute_chromosome_stats(df):
+    """
+    Returns one row per (chromosome, statistic) with the count, mean, sample standard deviation,
+    minimum, quartiles and maximum of the values of each STAT_COLUMNS column. daf_beb, daf_pjl and
+    delta_af are derived from risk_allele, beb and pjl rather than read from the stored columns,
+    which hold 0.0 where the risk allele is not listed; like the summary plots always did, the
+    DAFs of a SNP only count when both populations list the risk allele. Text such as '-'
+    counts as missing; a chromosome without any value of a column still gets its row with n = 0.
+    """
+    if df.empty:
+        return pd.DataFrame(columns=STATS_TABLE_COLUMNS)
+    values = derive_daf_delta(df[["chromosome"] + SOURCE_COLUMNS].copy())
+    both = values["daf_beb"].notna() & values["daf_pjl"].notna()
+    values["daf_beb"] = values["daf_beb"].where(both)
+    values["daf_pjl"] = values["daf_pjl"].where(both)
+    values = values[["chromosome"] + STAT_COLUMNS].copy()
+    values["chromosome"] = values["chromosome"].astype(str)
+    for column in STAT_COLUMNS:
+        values[column] = pd.to_numeric(values[column], errors="coerce")
+    long = values.melt(id_vars="chromosome", var_name="statistic", value_name="value")
+    grouped = long.groupby(["chromosome", "statistic"])["value"]
+    stats = grouped.agg(["count", "mean", "std", "min", "max"]).rename(columns={"count": "n"})
+    quartiles = grouped.quantile([0.25, 0.5, 0.75]).unstack()
+    stats["q1"], stats["median"], stats["q3"] = quartiles[0.25], quartiles[0.5], quartiles[0.75]
+    return stats.reset_index()[STATS_TABLE_COLUMNS]
+
+
+# recompute the chromosome_stats rows of some chromosomes
+def refresh_chromosome_stats(cursor, chromosomes=None):
+    """
+    Rebuilds the chromosome_stats rows of the given chromosomes (all of them when None) from the
+    snp table, reading only the rows of those chromosomes; chromosomes without SNPs lose their rows.
+    """
+    select = f"SELECT chromosome, {', '.join(SOURCE_COLUMNS)} FROM snp WHERE chromosome IS NOT NULL"
+    if chromosomes is None:
+        cursor.execute("DELETE FROM chromosome_stats")
+        rows = cursor.execute(select).fetchall()
+    else:
+        chromosomes = sorted(set(chromosomes))
+        if not chromosomes:
+            return
+        placeholders = ", ".join("?" for _ in chromosomes)
+        cursor.execute(f"DELETE FROM chromosome_stats WHERE chromosome IN ({placeholders})", chromosomes)
+        rows = cursor.execute(f"{select} AND chromosome IN ({placeholders})", chromosomes).fetchall()
+    stats = compute_chromosome_stats(pd.DataFrame(rows, columns=["chromosome"] + SOURCE_COLUMNS))
+    stats = stats.astype(object).where(stats.notna(), None)
+    cursor.executemany(
+        f"INSERT INTO chromosome_stats ({', '.join(STATS_TABLE_COLUMNS)}) "
+        f"VALUES ({', '.join('?' for _ in STATS_TABLE_COLUMNS)})",
+        stats.itertuples(index=False, name=None),
+    )
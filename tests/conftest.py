@@ -0,0 +1,9 @@
+#the scripts import each other by module name from their own directories, as they do when run from there
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+for directory in ("SummaryStatsCalculations", "instance", "BackEnd"):
+    path = os.path.join(ROOT, directory)
+    if path not in sys.path:
+        sys.path.append(path)
@@ -0,0 +1,99 @@
+#parity of the columnar allele frequency parser with the per-row regex it replaced
+import re
+import numpy as np
+import pandas as pd
+import pytest
+from allele_freq import (extract_frequencies, extract_frequency, parse_frequency_matrix,
+                         expand_frequencies, derive_daf_delta)
+
+# frequency strings as they appear in the beb/pjl columns, with indels, repeats, odd spacing and junk
+FREQUENCY_STRINGS = [
+    "A: 0.802, G: 0.198",
+    "C: 0.116, T: 0.884",
+    "CTAGC: 1.000",
+    "GA: 0.300, A: 0.700",
+    "A:0.5,G:0.5",
+    "A: 0.1, A: 0.9",
+    "T: 0.1.2, C: 0.4",
+    "-: 0.25, AT: 0.75",
+    "",
+    "no frequencies here",
+    None,
+]
+ALLELES = ["A", "G", "C", "T", "CTAGC", "TAGC", "AT", "-", "GA", "X"]
+
+
+#the per-row extractor of the original DAF.py and Flask_derive_delta.py
+def old_extract_frequency(allele_freq_str, allele):
+    try:
+        match = re.findall(rf"{allele}:\s*([\d\.]+)", str(allele_freq_str))
+        return float(match[0]) if match else None
+    except Exception:
+        return None
+
+
+def as_float(value):
+    return np.nan if value is None else value
+
+
+def test_extract_frequencies_matches_old_regex():
+    strings = [s for s in FREQUENCY_STRINGS for _ in ALLELES]
+    alleles = ALLELES * len(FREQUENCY_STRINGS)
+    expected = [as_float(old_extract_frequency(s, a)) for s, a in zip(strings, alleles)]
+    np.testing.assert_array_equal(extract_frequencies(strings, alleles), np.array(expected, dtype=float))
+
+
+def test_extract_frequency_scalar():
+    assert extract_frequency("A: 0.802, G: 0.198", "G") == 0.198
+    assert extract_frequency("A: 0.802, G: 0.198", "T") is None
+
+
+@pytest.mark.parametrize("allele", [".", "*", "A+", "(A)", "[AG]", "A|G"])
+def test_metacharacter_alleles_are_literal(allele):
+    # the old pattern interpreted these; the parser behaves like the old pattern with re.escape(allele)
+    strings = ["A: 0.6, G: 0.4", f"{allele}: 0.3, A: 0.7", f"T{allele}: 0.2"]
+    expected = [as_float(old_extract_frequency(s, re.escape(allele))) for s in strings]
+    np.testing.assert_array_equal(extract_frequencies(strings, [allele] * len(strings)), np.array(expected, dtype=float))
+    assert np.isnan(extract_frequencies(["A: 0.6, G: 0.4"], [allele])[0])
+
+
+def test_parse_frequency_matrix_keep():
+    alleles, first = parse_frequency_matrix(["A: 0.1, A: 0.9, G: 0.2", None], keep="first")
+    _, last = parse_frequency_matrix(["A: 0.1, A: 0.9, G: 0.2", None], keep="last")
+    assert alleles == ["A", "G"]
+    np.testing.assert_array_equal(first[0], [0.1, 0.2])
+    np.testing.assert_array_equal(last[0], [0.9, 0.2])
+    assert np.isnan(first[1]).all()
+
+
+#the dictionary parser of the original FST.py
+def old_parse_frequencies(freq_str):
+    if pd.isna(freq_str) or not isinstance(freq_str, str):
+        return {}
+    try:
+        return {allele_freq.split(':')[0].strip(): float(allele_freq.split(':')[1].strip())
+                for allele_freq in freq_str.split(',')}
+    except Exception:
+        return {}
+
+
+def test_expand_frequencies_matches_old_dictionaries():
+    strings = ["A: 0.802, G: 0.198", "CTAGC: 1.000", "A: 0.1, A: 0.9", "T: 0.5, C: 0.5", None]
+    rows, alleles, freqs = expand_frequencies(strings, keep="last")
+    expected = [(row, allele, freq) for row, s in enumerate(strings) for allele, freq in old_parse_frequencies(s).items()]
+    assert list(zip(rows.tolist(), alleles.tolist(), freqs.tolist())) == expected
+
+
+def test_derive_daf_delta_matches_old_processing():
+    df = pd.DataFrame({
+        "risk_allele": ["C", "A", "T", "G"],
+        "beb": ["C: 0.116, T: 0.884", "A: 0.802, G: 0.198", "C: 1.000", "G: 0.3, A: 0.7"],
+        "pjl": ["C: 0.078, T: 0.922", "A: 0.797, G: 0.203", "T: 0.2, C: 0.8", None],
+    })
+    out = derive_daf_delta(df.copy())
+    old_beb = pd.to_numeric(pd.Series([old_extract_frequency(b, a) for b, a in zip(df["beb"], df["risk_allele"])]), errors="coerce")
+    old_pjl = pd.to_numeric(pd.Series([old_extract_frequency(p, a) for p, a in zip(df["pjl"], df["risk_allele"])]), errors="coerce")
+    old_delta = (old_beb.fillna(0) - old_pjl.fillna(0)).abs().where(old_beb.notna() & old_pjl.notna())
+    np.testing.assert_array_equal(out["daf_beb"].to_numpy(), old_beb.to_numpy())
+    np.testing.assert_array_equal(out["daf_pjl"].to_numpy(), old_pjl.to_numpy())
+    np.testing.assert_array_equal(out["delta_af"].to_numpy(), old_delta.to_numpy())
@@ -0,0 +1,114 @@
+#the web app reads the database named by GENETICS_DB_PATH, migrated by the factory
+import os
+import sqlite3
+import pandas as pd
+import pytest
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "instance", "data_sql_fst.xlsx")
+
+
+@pytest.fixture(scope="module")
+def client(tmp_path_factory):
+    import app as web
+    db_path = str(tmp_path_factory.mktemp("instance") / "genetics.db")
+    conn = sqlite3.connect(db_path)
+    pd.read_excel(DATA, sheet_name="snp").to_sql("snp", conn, index=False)
+    conn.close()
+    return web.create_app({"GENETICS_DB_PATH": db_path, "TESTING": True}).test_client()
+
+
+def test_factory_migrates_the_configured_database(client):
+    from migrations import SCHEMA_VERSION
+    db_path = client.application.config["GENETICS_DB_PATH"]
+    assert client.application.config["SQLALCHEMY_DATABASE_URI"] == f"sqlite:///{db_path}"
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+    conn.close()
+
+
+def test_routes_read_the_configured_database(client):
+    response = client.get("/api/chromosome_stats?statistic=daf_beb")
+    assert response.status_code == 200
+    means = {row["chromosome"]: row["mean"] for row in response.json["stats"]}
+    assert round(means["12"], 3) == 0.532
+    assert client.get("/api/windows?statistic=delta_af").status_code == 200
+    columns = os.path.join(os.path.dirname(client.application.config["GENETICS_DB_PATH"]), "columns")
+    assert os.listdir(columns)
+
+
+def test_windows_scan_once_and_not_on_304(client, monkeypatch):
+    import app as web
+    calls = []
+    scan = web.scan_windows
+    monkeypatch.setattr(web, "scan_windows", lambda *args, **kwargs: calls.append(args) or scan(*args, **kwargs))
+    response = client.get("/api/windows?statistic=fst_beb&size=500kb")
+    assert response.status_code == 200 and len(calls) == 1
+    again = client.get("/api/windows?statistic=fst_beb&size=500kb", headers={"If-None-Match": response.headers["ETag"]})
+    assert again.status_code == 304 and len(calls) == 1
+    assert client.get("/api/windows?statistic=unknown").status_code == 400
+    assert client.get("/api/windows?statistic=fst_beb&chromosome=12").json["windows"]["chromosome"][0] == "12"
+
+
+def test_daf_data_etag_follows_the_store_snapshot(client, monkeypatch):
+    import app as web
+    with client.application.app_context():
+        store, version = web.get_column_store()
+    first = client.get("/api/daf-data/12")
+    assert first.status_code == 200 and first.json["summary"]["count"] > 0
+    # a snapshot of older data gives another ETag than the current one
+    monkeypatch.setattr(web, "get_column_store", lambda: (store, (version[0], "older")))
+    stale = client.get("/api/daf-data/12", headers={"If-None-Match": first.headers["ETag"]})
+    assert stale.status_code == 200 and stale.headers["ETag"] != first.headers["ETag"]
+
+
+def test_top_snps_are_not_cached_from_a_stale_background(client, monkeypatch):
+    import app as web
+    with client.application.app_context():
+        background, version = web.get_fst_background()
+    current = client.get("/api/top_snps/BEB/3").json
+    # the same arguments with a background of older data are built again, not served from the cache
+    stale = {population: values[:1] for population, values in background.items()}
+    monkeypatch.setattr(web, "get_fst_background", lambda: (stale, (version[0], "older")))
+    rebuilt = client.get("/api/top_snps/BEB/3").json
+    assert [r["SNP ID"] for r in rebuilt] == [r["SNP ID"] for r in current]
+    assert [r["Empirical P"] for r in rebuilt] != [r["Empirical P"] for r in current]
+
+
+def test_text_search_pages_in_relevance_order(client):
+    import app as web
+    conn = sqlite3.connect(client.application.config["GENETICS_DB_PATH"])
+    expression = web.fts_match_expression("type 2 diabetes")
+    expected = [row[0] for row in conn.execute(
+        "SELECT snp.snp_id FROM snp_fts JOIN snp ON snp.rowid = snp_fts.rowid "
+        "WHERE snp_fts MATCH ? ORDER BY snp_fts.rank, snp_fts.rowid", (expression,))]
+    conn.close()
+    assert len(expected) > 10
+
+    def page(cursor=None):
+        url = "/genetic_data?query=type+2+diabetes&page_size=4" + (f"&cursor={cursor}" if cursor else "")
+        with client.application.test_request_context(url):
+            matches, order = web.full_text_query("type 2 diabetes")
+            results, pagination = web.search_page(matches, order)
+            return [snp.snp_id for snp in results], pagination
+
+    seen, pages, cursor = [], [], None
+    while True:
+        ids, pagination = page(cursor)
+        seen += ids
+        pages.append((ids, pagination))
+        cursor = pagination["next"]
+        if cursor is None:
+            break
+    assert seen == expected
+    # going back from the last page gives the pages before it
+    ids, _ = page(pages[-1][1]["prev"])
+    assert ids == pages[-2][0]
+    with client.application.test_request_context("/genetic_data?cursor=bad"):
+        with pytest.raises(Exception) as error:
+            web.search_page(*web.full_text_query("diabetes"))
+        assert getattr(error.value, "code", None) == 400
+
+
+def test_malformed_cursor_is_a_bad_request(client):
+    assert client.get("/genetic_data?query=12&cursor=bad").status_code == 400
+    assert client.get("/genetic_data?query=12&page_size=2").status_code == 200
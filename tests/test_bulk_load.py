@@ -0,0 +1,83 @@
+#the bulk loader: upserts, a failed load leaves the database as it was, dropped indexes and triggers come back
+import sqlite3
+import pandas as pd
+import pytest
+from bulk_load import bulk_load, TABLES
+
+
+def snp_sheet(rows):
+    return pd.DataFrame(rows, columns=["snp_id", "risk_allele", "chromosome", "position", "beb", "pjl", "fst_beb", "fst_pjl"])
+
+
+SHEETS = {
+    "snp": snp_sheet([
+        ("rs1", "A", "1", 100, "A: 0.6, G: 0.4", "A: 0.5, G: 0.5", 0.1, 0.2),
+        ("rs2", "C", "1", 200, "C: 0.3, T: 0.7", "C: 0.1, T: 0.9", 0.3, "-"),
+        ("rs3", "G", "2", 50, "G: 0.9, A: 0.1", None, 0.05, 0.01),
+    ]),
+    "pathway": pd.DataFrame({"pathway_id": ["hsa04930"], "pathway_name": ["Type II diabetes mellitus"]}),
+    "snp_pathway": pd.DataFrame({"snp_id": ["rs1", "rs2"], "pathway_id": ["hsa04930", "hsa04930"]}),
+}
+
+
+def query(db_path, sql):
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute(sql).fetchall()
+    conn.close()
+    return rows
+
+
+def schema_objects(db_path):
+    placeholders = ", ".join(f"'{table}'" for table in TABLES)
+    return sorted(query(db_path, f"SELECT type, name FROM sqlite_master WHERE type IN ('index', 'trigger') "
+                                 f"AND sql IS NOT NULL AND tbl_name IN ({placeholders})"))
+
+
+def state(db_path):
+    return (query(db_path, "SELECT * FROM snp ORDER BY snp_id"), query(db_path, "SELECT * FROM snp_pathway ORDER BY 1, 2"),
+            query(db_path, "SELECT * FROM chromosome_stats ORDER BY 1, 2"), query(db_path, "SELECT * FROM snp_generation"),
+            schema_objects(db_path))
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    db_path = str(tmp_path / "genetics.db")
+    bulk_load(db_path, SHEETS)
+    return db_path
+
+
+def test_indexes_and_triggers_are_recreated(db_path):
+    objects = schema_objects(db_path)
+    assert any(kind == "index" for kind, _ in objects) and any(kind == "trigger" for kind, _ in objects)
+    bulk_load(db_path, {"snp": snp_sheet([("rs4", "T", "3", 10, None, None, 0.2, 0.2)])})
+    assert schema_objects(db_path) == objects
+    # the full-text index was rebuilt from the snp table although its sync triggers were dropped
+    assert query(db_path, "SELECT count(*) FROM snp_fts") == [(4,)]
+    assert query(db_path, "SELECT rowid FROM snp_fts WHERE snp_fts MATCH 'rs4'") == query(
+        db_path, "SELECT rowid FROM snp WHERE snp_id = 'rs4'")
+
+
+def test_upsert_updates_existing_rows(db_path):
+    generation = query(db_path, "SELECT generation FROM snp_generation")[0][0]
+    update = snp_sheet([("rs2", "C", "2", 75, "C: 0.5, T: 0.5", "C: 0.1, T: 0.9", 0.4, 0.3),
+                        ("rs5", "A", "2", 60, None, None, None, None)])
+    assert bulk_load(db_path, {"snp": update, "snp_pathway": SHEETS["snp_pathway"]}, upsert=True) == {"snp": 2, "snp_pathway": 2}
+    assert query(db_path, "SELECT snp_id, chromosome, position, fst_beb, fst_pjl FROM snp ORDER BY snp_id") == [
+        ("rs1", "1", 100, 0.1, 0.2), ("rs2", "2", 75, 0.4, 0.3), ("rs3", "2", 50, 0.05, 0.01), ("rs5", "2", 60, None, None)]
+    assert query(db_path, "SELECT count(*) FROM snp_pathway") == [(2,)]
+    assert query(db_path, "SELECT generation FROM snp_generation")[0][0] == generation + 1
+    # rs2 moved from chromosome 1 to 2, both chromosomes were refreshed
+    counts = dict(query(db_path, "SELECT chromosome, n FROM chromosome_stats WHERE statistic = 'fst_beb'"))
+    assert counts == {"1": 1, "2": 2}
+    with pytest.raises(sqlite3.IntegrityError):
+        bulk_load(db_path, {"snp": update})
+
+
+def test_failed_load_is_rolled_back(db_path):
+    before = state(db_path)
+    duplicate = snp_sheet([("rs6", "A", "4", 1, None, None, 0.1, 0.1), ("rs1", "A", "1", 100, None, None, 0.9, 0.9)])
+    with pytest.raises(sqlite3.IntegrityError):
+        bulk_load(db_path, {"snp": duplicate, "snp_pathway": pd.DataFrame({"snp_id": ["rs6"], "pathway_id": ["hsa04930"]})})
+    assert state(db_path) == before
+    # nothing of the failed load is left behind, the same rows load afterwards
+    assert bulk_load(db_path, {"snp": duplicate.iloc[:1]}) == {"snp": 1}
@@ -0,0 +1,76 @@
+#the per-chromosome statistics against the figures the original summary plots drew from the shipped data
+import os
+import re
+import sqlite3
+import numpy as np
+import pandas as pd
+import pytest
+from summaries import compute_chromosome_stats, refresh_chromosome_stats
+from migrations import MIGRATIONS
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "instance", "data_sql_fst.xlsx")
+
+
+@pytest.fixture(scope="module")
+def snp():
+    df = pd.read_excel(DATA, sheet_name="snp")
+    df["chromosome"] = df["chromosome"].astype(str).str.strip()
+    return df
+
+
+#the DAF processing and aggregation of the original Flask_derive_delta.py
+def old_chromosome_means(df):
+    def extract_frequency(allele_freq_str, allele):
+        try:
+            match = re.findall(rf"{allele}:\s*([\d\.]+)", str(allele_freq_str))
+            return float(match[0]) if match else None
+        except Exception:
+            return None
+
+    df = df.copy()
+    df["daf_beb"] = pd.to_numeric(pd.Series([extract_frequency(b, a) for b, a in zip(df["beb"], df["risk_allele"])], index=df.index), errors="coerce")
+    df["daf_pjl"] = pd.to_numeric(pd.Series([extract_frequency(p, a) for p, a in zip(df["pjl"], df["risk_allele"])], index=df.index), errors="coerce")
+    df["delta_af"] = abs(df["daf_beb"].fillna(0) - df["daf_pjl"].fillna(0))
+    df.loc[df["daf_beb"].isna() | df["daf_pjl"].isna(), "delta_af"] = None
+    daf = df.dropna(subset=["daf_beb", "daf_pjl"]).groupby("chromosome")[["daf_beb", "daf_pjl"]].mean()
+    delta = df.dropna(subset=["delta_af"]).groupby("chromosome")["delta_af"].mean()
+    return daf.assign(delta_af=delta)
+
+
+def means(stats):
+    table = stats.pivot(index="chromosome", columns="statistic", values="mean")
+    return table[["daf_beb", "daf_pjl", "delta_af"]].dropna(how="all")
+
+
+def test_daf_means_match_original_plots(snp):
+    expected = old_chromosome_means(snp)
+    actual = means(compute_chromosome_stats(snp))
+    pd.testing.assert_frame_equal(actual.sort_index(), expected.sort_index(), check_names=False)
+    assert round(actual.loc["12", "daf_beb"], 3) == 0.532
+    assert round(actual.loc["14", "daf_beb"], 3) == 0.465
+
+
+def test_absent_risk_allele_is_not_counted_as_zero():
+    df = pd.DataFrame({
+        "chromosome": ["1", "1", "1"],
+        "risk_allele": ["A", "T", "A"],
+        "beb": ["A: 0.6, G: 0.4", "A: 0.6, G: 0.4", "A: 0.2, G: 0.8"],
+        "pjl": ["A: 0.5, G: 0.5", "A: 0.5, G: 0.5", None],
+        "fst_beb": [0.1, 0.2, 0.3],
+        "fst_pjl": [0.1, 0.2, "-"],
+    })
+    stats = compute_chromosome_stats(df).set_index("statistic")
+    assert stats.loc["daf_beb", "n"] == 1 and stats.loc["daf_beb", "mean"] == 0.6
+    assert stats.loc["delta_af", "n"] == 1 and np.isclose(stats.loc["delta_af", "mean"], 0.1)
+    assert stats.loc["fst_beb", "n"] == 3 and stats.loc["fst_pjl", "n"] == 2
+
+
+def test_refresh_reads_the_frequency_strings(snp, tmp_path):
+    conn = sqlite3.connect(tmp_path / "genetics.db")
+    snp.to_sql("snp", conn, index=False)
+    create_stats = next(statements for version, _, statements in MIGRATIONS if version == 5)[0]
+    conn.execute(create_stats)
+    refresh_chromosome_stats(conn.cursor())
+    stats = pd.read_sql_query("SELECT * FROM chromosome_stats", conn)
+    conn.close()
+    pd.testing.assert_frame_equal(means(stats).sort_index(), means(compute_chromosome_stats(snp)).sort_index())
@@ -0,0 +1,91 @@
+#the --chunksize streaming mode and the --workers pool of the summary statistic scripts must match the in-memory run
+import argparse
+from functools import partial
+import numpy as np
+import pandas as pd
+import pytest
+from chunked import process_csv, add_chunksize_argument, READ_OPTIONS
+from parallel import run_by_chromosome, add_workers_arguments, check_workers_arguments, CHROMOSOME_ORDER
+from DAF import add_daf_columns
+from DELTA_AF import delta_af_table
+from FST import fst_table
+
+# a chunk size that splits the fixtures into several chunks, the last one shorter
+CHUNKSIZE = 7
+
+
+@pytest.fixture
+def delta_af_input(tmp_path):
+    rng = np.random.default_rng(1)
+    beb = [str(round(x, 3)) for x in rng.uniform(0, 1, 30)]
+    pjl = [str(round(x, 3)) for x in rng.uniform(0, 1, 30)]
+    # the first chunk holds whole numbers only, later chunks have NA and empty cells
+    beb[:CHUNKSIZE] = ["0", "1", "0", "1", "1", "0", "0"]
+    pjl[:CHUNKSIZE] = ["1", "1", "0", "0", "1", "0", "1"]
+    beb[10], pjl[12], beb[20] = "NA", "", "n/a"
+    path = tmp_path / "deltaaf.csv"
+    pd.DataFrame({"SNP_ID": [f"rs{i}" for i in range(30)], "BEB": beb, "PJL": pjl}).to_csv(path, index=False)
+    return path
+
+
+@pytest.fixture
+def daf_input(tmp_path):
+    rows = []
+    for i in range(30):
+        p, q = round((i % 11) / 10, 3), round((i % 7) / 6, 3)
+        rows.append({"SNP ID": f"rs{i}", "Risk Allele": "ACGT"[i % 4],
+                     "BEB": f"A: {p}, C: {round(1 - p, 3)}" if i % 9 else "",
+                     "PJL": f"G: {q}, T: {round(1 - q, 3)}", "EUR": f"A: {q}, C: {round(1 - q, 3)}",
+                     "chromosome": str(1 + i % 3)})
+    path = tmp_path / "final.csv"
+    pd.DataFrame(rows).to_csv(path, index=False)
+    return path
+
+
+def assert_chunked_matches(input_path, tmp_path, transform):
+    whole, chunked = tmp_path / "whole.csv", tmp_path / "chunked.csv"
+    rows = process_csv(input_path, whole, transform)
+    assert process_csv(input_path, chunked, transform, chunksize=CHUNKSIZE) == rows
+    assert chunked.read_bytes() == whole.read_bytes()
+
+
+def test_delta_af_chunked_matches_in_memory(delta_af_input, tmp_path):
+    assert_chunked_matches(delta_af_input, tmp_path, delta_af_table)
+    assert "0.0" in (tmp_path / "chunked.csv").read_text().splitlines()[1]
+
+
+def test_daf_chunked_matches_in_memory(daf_input, tmp_path):
+    assert_chunked_matches(daf_input, tmp_path, add_daf_columns)
+
+
+def test_fst_chunked_matches_in_memory(daf_input, tmp_path):
+    assert_chunked_matches(daf_input, tmp_path, partial(fst_table, pop1="EUR", pop2="BEB"))
+
+
+def test_header_only_input(tmp_path):
+    path = tmp_path / "empty.csv"
+    path.write_text("SNP_ID,BEB,PJL\n")
+    assert_chunked_matches(path, tmp_path, delta_af_table)
+    assert (tmp_path / "chunked.csv").read_text() == "SNP_ID,BEB,PJL,Delta_AF\n"
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+@pytest.mark.parametrize("transform", [add_daf_columns, partial(fst_table, pop1="EUR", pop2="BEB")])
+def test_by_chromosome_matches_the_serial_run(daf_input, workers, transform):
+    df = pd.read_csv(daf_input, **READ_OPTIONS)
+    # the pool returns the chromosomes in 1-22, X, Y order, each in its input order
+    rank = df["chromosome"].astype(str).map(CHROMOSOME_ORDER.index)
+    expected = transform(df.iloc[np.argsort(rank.to_numpy(), kind="stable")].reset_index(drop=True))
+    result, timings = run_by_chromosome(df, transform, workers)
+    pd.testing.assert_frame_equal(result, expected)
+    assert list(timings["chromosome"]) == ["1", "2", "3"] and timings["rows"].sum() == len(df)
+
+
+def test_chunksize_is_rejected_with_workers():
+    parser = argparse.ArgumentParser()
+    add_chunksize_argument(parser)
+    add_workers_arguments(parser)
+    with pytest.raises(SystemExit):
+        check_workers_arguments(parser, parser.parse_args(["--chunksize", "10", "--workers", "2"]))
+    check_workers_arguments(parser, parser.parse_args(["--chunksize", "10"]))
+    check_workers_arguments(parser, parser.parse_args(["--workers", "2"]))
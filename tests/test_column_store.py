@@ -0,0 +1,28 @@
+#the column store of a database the migrations have not reached yet
+import sqlite3
+import pandas as pd
+from column_store import open_column_store
+
+
+def test_store_of_unmigrated_database(tmp_path):
+    db = str(tmp_path / "genetics.db")
+    conn = sqlite3.connect(db)
+    pd.DataFrame({
+        "snp_id": ["rs1", "rs2", "rs3"], "risk_allele": ["A", "C", "G"],
+        "chromosome": ["2", "1", "X"], "position": [5, 10, 1],
+        "p_value": [0.1, 0.2, 0.3], "t2dkp_p_value": [None] * 3, "beta": [None] * 3,
+        "daf_beb": [0.5, "-", 0.2], "daf_pjl": [0.4, 0.1, 0.2], "delta_af": [0.1, None, 0.0],
+        "fst_beb": [0.01, 0.02, 0.03], "fst_pjl": [0.01, 0.02, 0.03],
+    }).to_sql("snp", conn, index=False)
+    conn.commit()
+    conn.close()
+
+    store = open_column_store(db)
+    assert store.chromosomes == ["1", "2", "X"]
+    assert open_column_store(db).directory == store.directory
+
+    conn = sqlite3.connect(db)
+    conn.execute("UPDATE snp SET position = 7 WHERE snp_id = 'rs1'")
+    conn.commit()
+    conn.close()
+    assert open_column_store(db).directory != store.directory
@@ -0,0 +1,61 @@
+#the streamed bulk download formats and their gzip encoding
+import csv
+import gzip
+import io
+import json
+from types import SimpleNamespace
+from export import export_chunks, gzip_chunks
+
+COLUMNS = ["snp_id", "trait", "position", "delta_af"]
+
+
+def snp(snp_id, trait, position=None, delta_af=None, pathways=(), go_terms=()):
+    return SimpleNamespace(
+        snp_id=snp_id, trait=trait, position=position, delta_af=delta_af, risk_allele="A", mapped_gene=None,
+        phenotype=None, t2dkp_p_value=None, beta=None, p_value=1e-8, odds_ratio=1.2, daf_beb=None, daf_pjl=None,
+        fst_beb=None, fst_pjl=None, study_accession="GCST1", pubmed_id="1",
+        pathways=[SimpleNamespace(pathway_id=pathway_id, pathway_name=name) for pathway_id, name in pathways],
+        go_terms=[SimpleNamespace(go_term=term) for term in go_terms],
+    )
+
+
+BATCHES = [
+    [snp("rs1", "type 2\tdiabetes\r\nand obesity", 100, 0.25, [("hsa04930", "Type II diabetes")], ["GO:1", "GO:2"])],
+    [snp("rs2", "fasting\nglucose"), snp("rs3", "BMI ✓", 5, 0.0)],
+]
+
+
+def test_tsv_keeps_one_row_per_snp():
+    text = "".join(export_chunks(BATCHES, "tsv", COLUMNS))
+    rows = list(csv.reader(io.StringIO(text), delimiter="\t"))
+    assert rows[0] == COLUMNS + ["pathways", "go_terms"]
+    assert rows[1] == ["rs1", "type 2 diabetes  and obesity", "100", "0.25", "hsa04930: Type II diabetes", "GO:1;GO:2"]
+    assert rows[2] == ["rs2", "fasting glucose", "", "", "", ""]
+    assert len(rows) == 4 and all(len(row) == len(COLUMNS) + 2 for row in rows)
+
+
+def test_jsonl_writes_one_record_per_line():
+    lines = "".join(export_chunks(BATCHES, "jsonl", COLUMNS)).splitlines()
+    records = [json.loads(line) for line in lines]
+    assert [record["snp_id"] for record in records] == ["rs1", "rs2", "rs3"]
+    assert records[0]["trait"] == "type 2\tdiabetes\r\nand obesity"
+    assert records[0]["pathways"] == [{"pathway_id": "hsa04930", "pathway_name": "Type II diabetes"}]
+    assert records[1] == {"snp_id": "rs2", "trait": "fasting\nglucose", "position": None, "delta_af": None,
+                          "pathways": [], "go_terms": []}
+
+
+def test_text_has_the_footer_and_one_chunk_per_batch():
+    chunks = list(export_chunks(BATCHES, "txt", COLUMNS, footer="metrics\n"))
+    assert len(chunks) == 3 and chunks[-1] == "metrics\n"
+    assert "rsID: rs1\n" in chunks[0] and " - hsa04930: Type II diabetes\n" in chunks[0]
+    assert "Pathways: -\n" in chunks[1] and "GO Terms: -\n" in chunks[1]
+    assert "metrics" not in "".join(export_chunks(BATCHES, "tsv", COLUMNS, footer="metrics\n"))
+
+
+def test_gzip_chunks_round_trip():
+    for export_format in ("txt", "tsv", "jsonl"):
+        chunks = list(export_chunks(BATCHES, export_format, COLUMNS, footer="metrics\n"))
+        compressed = list(gzip_chunks(iter(chunks)))
+        assert gzip.decompress(b"".join(compressed)).decode("utf-8") == "".join(chunks)
+        assert all(compressed)
+    assert gzip.decompress(b"".join(gzip_chunks([]))) == b""
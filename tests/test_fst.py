@@ -0,0 +1,86 @@
+#parity of the vectorised FST table with the per-row loop of the original FST.py
+import numpy as np
+import pandas as pd
+import pytest
+from FST import fst_table, calculate_fst, classify_fst, ESTIMATORS
+
+
+#the per-row FST script as it was, returning the DataFrame it wrote to Output.csv
+def old_fst_table(data):
+    def parse_frequencies(freq_str):
+        if pd.isna(freq_str) or not isinstance(freq_str, str):
+            return {}
+        try:
+            return {allele_freq.split(':')[0].strip(): float(allele_freq.split(':')[1].strip())
+                    for allele_freq in freq_str.split(',')}
+        except Exception:
+            return {}
+
+    def calculate(p1, p2):
+        p_bar = (p1 + p2) / 2
+        h_s = (p1 * (1 - p1) + p2 * (1 - p2)) / 2
+        h_t = p_bar * (1 - p_bar)
+        if h_t == 0:
+            return 0
+        return (h_t - h_s) / h_t
+
+    fst_values = []
+    for _, row in data.iterrows():
+        eur_freqs = parse_frequencies(row['EUR'])
+        pjl_freqs = parse_frequencies(row['PJL'])
+        for allele in eur_freqs:
+            if allele in pjl_freqs:
+                fst = calculate(eur_freqs[allele], pjl_freqs[allele])
+                if fst < 0.05:
+                    category = "Little genetic diff."
+                elif 0.05 <= fst < 0.15:
+                    category = "Moderate genetic diff."
+                elif 0.15 <= fst < 0.25:
+                    category = "Great genetic diff."
+                else:
+                    category = "Very great genetic diff."
+                fst_values.append({'SNP ID': row['SNP ID'], 'Allele': allele, 'FST': round(fst, 5), 'Category': category})
+    return pd.DataFrame(fst_values)
+
+
+@pytest.fixture
+def fst_input(tmp_path):
+    rng = np.random.default_rng(0)
+    n = 500
+    eur = np.round(rng.uniform(0, 1, n), 3)
+    pjl = np.abs(np.clip(np.round(eur + rng.normal(0, 0.2, n), 3), 0, 1))
+    rows = {
+        "SNP ID": [f"rs{i}" for i in range(n)],
+        "EUR": [f"A: {p}, G: {round(1 - p, 3)}" for p in eur],
+        "PJL": [f"A: {p}, G: {round(1 - p, 3)}" for p in pjl],
+    }
+    # fixed alleles, indels, alleles missing from one population and empty cells
+    rows["EUR"][:6] = ["A: 1.0, G: 0.0", "CTAGC: 0.4, C: 0.6", "T: 0.5, C: 0.5", "", "A: 0.3, A: 0.5, G: 0.5", "A: 0.25, G: 0.75"]
+    rows["PJL"][:6] = ["A: 1.0, G: 0.0", "CTAGC: 0.1, C: 0.9", "C: 0.2", "A: 0.5", "A: 0.4, G: 0.6", ""]
+    path = tmp_path / "DATA.csv"
+    pd.DataFrame(rows).to_csv(path, index=False)
+    return path
+
+
+def test_fst_table_matches_old_script(fst_input, tmp_path):
+    data = pd.read_csv(fst_input)
+    old_path, new_path = tmp_path / "old.csv", tmp_path / "new.csv"
+    old_fst_table(data).to_csv(old_path, index=False)
+    fst_table(data).to_csv(new_path, index=False)
+    assert new_path.read_bytes() == old_path.read_bytes()
+
+
+def test_estimators_agree_on_identical_populations():
+    p = np.array([0.1, 0.5, 0.9])
+    for name in ESTIMATORS:
+        np.testing.assert_allclose(calculate_fst(p, p, name, 86, 96), [0, 0, 0], atol=0.02)
+    with pytest.raises(ValueError):
+        calculate_fst(p, p, "wc")
+    with pytest.raises(ValueError):
+        calculate_fst(p, p, "unknown")
+
+
+def test_classify_fst_edges():
+    categories = classify_fst([0.0, 0.05, 0.15, 0.25, np.nan])
+    assert categories.tolist() == ["Little genetic diff.", "Moderate genetic diff.", "Great genetic diff.",
+                                   "Very great genetic diff.", "No data"]
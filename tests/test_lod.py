@@ -0,0 +1,51 @@
+#the level-of-detail downsampling of the scatter plots keeps the outliers and the shape of every bucket
+import numpy as np
+import pandas as pd
+import pytest
+from lod import downsample_scatter, default_threshold, screen_width
+
+
+@pytest.fixture(scope="module")
+def df():
+    rng = np.random.default_rng(11)
+    n = 20_000
+    frame = pd.DataFrame({
+        "chromosome": rng.choice(["1", "2", "X"], n),
+        "position": rng.integers(0, 50_000_000, n).astype(object),
+        "fst": rng.exponential(0.05, n).round(4).astype(object),
+    })
+    frame.loc[::97, "fst"] = "-"
+    frame.loc[::101, "position"] = None
+    return frame
+
+
+def buckets(df, bins):
+    x = df["position"].astype(float)
+    low = x.groupby(df["chromosome"]).transform("min")
+    high = x.groupby(df["chromosome"]).transform("max")
+    return df["chromosome"] + ":" + np.minimum(((x - low) / (high - low) * bins).astype(int), bins - 1).astype(str)
+
+
+@pytest.mark.parametrize("threshold, bins", [(0.2, 50), (0.2, 1), (None, 300), (10.0, 1200)])
+def test_outliers_and_bucket_extremes_are_kept(df, threshold, bins):
+    kept = downsample_scatter(df, "position", "fst", threshold=threshold, bins=bins)
+    numeric = df.assign(position=pd.to_numeric(df["position"]), fst=pd.to_numeric(df["fst"], errors="coerce")).dropna()
+    cut = default_threshold(numeric["fst"]) if threshold is None else threshold
+    outliers = numeric[numeric["fst"] >= cut]
+    assert set(outliers.index) <= set(kept.index)
+    assert set(kept.index) <= set(numeric.index)
+    assert len(kept) <= 2 * bins * 3 + len(outliers)
+    background = numeric[numeric["fst"] < cut]
+    kept_background = kept.loc[kept.index.isin(background.index)]
+    # the y range of each bucket of the background is drawn as in the full data
+    full = background["fst"].groupby(buckets(background, bins)).agg(["min", "max"])
+    drawn = kept_background["fst"].groupby(buckets(background, bins).loc[kept_background.index]).agg(["min", "max"])
+    pd.testing.assert_frame_equal(drawn, full)
+
+
+def test_small_plots_and_widths():
+    df = pd.DataFrame({"chromosome": ["1", "1"], "position": [5, 5], "fst": [0.1, 0.2]})
+    assert list(downsample_scatter(df, "position", "fst", threshold=1.0, bins=10).index) == [0, 1]
+    assert list(downsample_scatter(df, "position", "fst").index) == [0, 1]
+    assert default_threshold([0.3, np.nan, 0.1, 0.2], max_outliers=2) == 0.2
+    assert [screen_width(value) for value in (None, "abc", "5", "800", "99999")] == [1200, 1200, 100, 800, 4000]
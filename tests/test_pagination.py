@@ -0,0 +1,80 @@
+#keyset pagination over a table whose sort columns hold NULLs, as the snp table does for unmapped SNPs
+import pytest
+from sqlalchemy import create_engine, Column, Integer, String
+from sqlalchemy.orm import declarative_base, Session
+from pagination import keyset_page, count_estimate, encode_cursor, decode_cursor
+
+Base = declarative_base()
+
+
+class Snp(Base):
+    __tablename__ = "snp"
+    snp_id = Column(String, primary_key=True)
+    chromosome = Column(String)
+    position = Column(Integer)
+
+
+ORDER = [Snp.chromosome, Snp.position, Snp.snp_id]
+
+
+def key_of(snp):
+    return [snp.chromosome, snp.position, snp.snp_id]
+
+
+@pytest.fixture
+def session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        rows = [(None, None), (None, 5), ("1", None), ("1", None), ("1", 10), ("1", 10), ("1", 20),
+                ("2", None), ("2", 3), (None, None), ("X", 7), ("X", 1)]
+        session.add_all(Snp(snp_id=f"rs{i:02d}", chromosome=chromosome, position=position)
+                        for i, (chromosome, position) in enumerate(rows))
+        session.commit()
+        yield session
+
+
+def sorted_ids(session):
+    # SQLite sorts NULL before every value
+    rows = session.query(Snp).all()
+    return [snp.snp_id for snp in sorted(rows, key=lambda snp: [(value is not None, value or 0) for value in key_of(snp)])]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 12, 50])
+def test_pages_forward_and_back_cover_every_row_once(session, size):
+    pages, cursor = [], None
+    while True:
+        rows, next_cursor, prev_cursor = keyset_page(session.query(Snp), ORDER, key_of, cursor, size)
+        pages.append(([snp.snp_id for snp in rows], prev_cursor))
+        assert (prev_cursor is None) == (cursor is None)
+        if next_cursor is None:
+            break
+        cursor = next_cursor
+    assert [snp_id for ids, _ in pages for snp_id in ids] == sorted_ids(session)
+    assert all(len(ids) == size for ids, _ in pages[:-1])
+    # the prev cursors lead back through the same pages, the first one has none
+    for index in range(len(pages) - 1, 0, -1):
+        rows, next_cursor, prev_cursor = keyset_page(session.query(Snp), ORDER, key_of, pages[index][1], size)
+        assert [snp.snp_id for snp in rows] == pages[index - 1][0]
+        assert next_cursor is not None and (prev_cursor is None) == (index == 1)
+
+
+def test_cursors_at_null_keys(session):
+    after = keyset_page(session.query(Snp), ORDER, key_of, encode_cursor([None, None, "rs00"], "after"), 50)[0]
+    assert [snp.snp_id for snp in after] == sorted_ids(session)[1:]
+    before = keyset_page(session.query(Snp), ORDER, key_of, encode_cursor(["1", None, "rs03"], "before"), 50)[0]
+    assert [snp.snp_id for snp in before] == ["rs00", "rs09", "rs01", "rs02"]
+    assert keyset_page(session.query(Snp), ORDER, key_of, encode_cursor([None, None, "rs00"], "before"), 50)[0] == []
+
+
+def test_malformed_cursors_are_rejected(session):
+    for cursor in ("bad", "e30", encode_cursor(["1", 10], "after"), encode_cursor(["1", 10, "rs04"], "sideways")):
+        with pytest.raises(ValueError):
+            keyset_page(session.query(Snp), ORDER, key_of, cursor)
+    assert decode_cursor(encode_cursor(["1", None, "rs02"], "before")) == ("before", ["1", None, "rs02"])
+
+
+def test_count_is_capped(session):
+    assert count_estimate(session.query(Snp), 5) == "5+"
+    assert count_estimate(session.query(Snp), 12) == "12"
+    assert count_estimate(session.query(Snp).filter(Snp.chromosome.is_(None)), 5) == "3"
@@ -0,0 +1,36 @@
+#the stale-while-rebuild cache of the web process keeps serving its snapshot when a rebuild fails
+import logging
+import threading
+from Flask_derive_delta import ProcessedDataCache
+
+
+def wait_for_rebuilds():
+    for thread in threading.enumerate():
+        if thread is not threading.current_thread() and thread.daemon:
+            thread.join(5)
+
+
+def test_failed_rebuild_is_logged_and_not_retried_for_the_same_version(caplog):
+    version = ["v1"]
+    builds = []
+
+    def build():
+        builds.append(version[0])
+        if version[0] == "v2":
+            raise RuntimeError("database locked")
+        return version[0]
+
+    cache = ProcessedDataCache(build, lambda: version[0])
+    assert cache.get() == "v1"
+    version[0] = "v2"
+    with caplog.at_level(logging.ERROR, logger="Flask_derive_delta"):
+        for _ in range(3):
+            assert cache.get() == "v1"
+            wait_for_rebuilds()
+    assert builds == ["v1", "v2"]
+    assert "v2" in caplog.text and "RuntimeError" in caplog.text
+    # the next change of the data is built again
+    version[0] = "v3"
+    cache.get()
+    wait_for_rebuilds()
+    assert cache.snapshot() == ("v3", "v3")
@@ -0,0 +1,62 @@
+#region strings and the interval index the /genetic_data region search and /api/region read
+import pandas as pd
+import pytest
+from region_index import REGION_COLUMNS, RegionIndex, parse_region, parse_size, is_region_query
+
+
+@pytest.fixture
+def index():
+    rows = [
+        ("rs1", "1", 100, "TCF7L2"), ("rs2", "1", 200, "TCF7L2, SOX4"), ("rs3", "1", 200, None),
+        ("rs4", "1", 201, "LINC01 - CDKAL1"), ("rs5", "chr10", 150, "TCF7L2"), ("rs6", "10", 5_000, "SOX4"),
+        ("rs7", "X", 99, "tcf7l2"), ("rs8", None, 150, "SOX4"), ("rs9", "2", None, "SOX4"),
+    ]
+    df = pd.DataFrame(rows, columns=["snp_id", "chromosome", "position", "mapped_gene"])
+    for column in REGION_COLUMNS:
+        if column not in df:
+            df[column] = None
+    return RegionIndex(df)
+
+
+def ids(index, region):
+    return list(index.rows(index.intervals(parse_region(region)))["snp_id"])
+
+
+def test_sizes_and_intervals_parse():
+    assert [parse_size(size) for size in ("1,500", "50kb", "50 KB", "1.5Mb", "2m", "300bp", "7")] == \
+        [1_500, 50_000, 50_000, 1_500_000, 2_000_000, 300, 7]
+    assert parse_region("chr1:100-200") == {"chromosome": "1", "start": 100, "end": 200}
+    assert parse_region("CHRx: 1.5Mb - 2Mb") == {"chromosome": "X", "start": 1_500_000, "end": 2_000_000}
+    assert parse_region("10:112,950,000-113,170,000") == {"chromosome": "10", "start": 112_950_000, "end": 113_170_000}
+    assert parse_region("tcf7l2+50kb") == {"gene": "TCF7L2", "flank": 50_000}
+    assert parse_region("TCF7L2", flank=10) == {"gene": "TCF7L2", "flank": 10}
+    for region in ("chr1:200-100", "chr1:100-", "1:-5-10", "chr1:1kb-2xb", ":100-200", "TCF7L2+", "12abc:1-2-3"):
+        with pytest.raises(ValueError):
+            parse_region(region)
+    with pytest.raises(ValueError):
+        parse_size("kb")
+    assert is_region_query("chr1:1-2") and is_region_query("SOX4 +1kb")
+    assert not is_region_query("SOX4") and not is_region_query("type 2 diabetes")
+
+
+def test_interval_bounds_are_inclusive_at_equal_positions(index):
+    assert ids(index, "chr1:200-200") == ["rs2", "rs3"]
+    assert ids(index, "1:100-200") == ["rs1", "rs2", "rs3"]
+    assert ids(index, "1:101-199") == []
+    assert ids(index, "1:201-10kb") == ["rs4"]
+    assert ids(index, "chr10:0-1Mb") == ["rs5", "rs6"]
+    assert ids(index, "chr7:1-100") == []
+    # SNPs without a chromosome or a position are not indexed
+    assert "rs8" not in list(index.df["snp_id"]) and "rs9" not in list(index.df["snp_id"])
+
+
+def test_gene_windows_with_a_flank(index):
+    # the window spans the SNPs between the gene's first and last position, mapped or not
+    assert ids(index, "TCF7L2") == ["rs1", "rs2", "rs3", "rs5", "rs7"]
+    # the flank widens the span of the gene's SNPs on each chromosome, never below position 0
+    assert ids(index, "TCF7L2+1bp") == ["rs1", "rs2", "rs3", "rs4", "rs5", "rs7"]
+    assert index.intervals(parse_region("TCF7L2+1kb"))[0] == ("1", 0, 1_200)
+    assert ids(index, "CDKAL1") == ["rs4"]
+    assert ids(index, "SOX4") == ["rs2", "rs3", "rs6"]
+    assert ids(index, "SOX4+5kb") == ["rs1", "rs2", "rs3", "rs4", "rs5", "rs6"]
+    assert ids(index, "UNKNOWN+5kb") == []
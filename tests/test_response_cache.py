@@ -0,0 +1,49 @@
+#the API response cache: its byte budget, LRU order, data version and counters
+from response_cache import ResponseCache
+
+
+def cached(cache, version, key, size, builds):
+    def build():
+        builds.append(key)
+        return key.encode().ljust(size, b".")
+    return cache.get_or_build(version, build, key)
+
+
+def test_hits_and_misses_are_counted():
+    cache, builds = ResponseCache(max_bytes=100), []
+    assert cached(cache, 1, "a", 10, builds) == b"a" + b"." * 9
+    assert cached(cache, 1, "a", 10, builds) == b"a" + b"." * 9
+    cached(cache, 1, "b", 10, builds)
+    assert builds == ["a", "b"]
+    assert cache.stats() == {"hits": 1, "misses": 2, "evictions": 0, "invalidations": 0,
+                             "entries": 2, "bytes": 20, "max_bytes": 100}
+
+
+def test_least_recently_used_bodies_are_evicted_to_fit_the_budget():
+    cache, builds = ResponseCache(max_bytes=100, max_entry_bytes=40), []
+    for key in ("a", "b", "c"):
+        cached(cache, 1, key, 30, builds)
+    cached(cache, 1, "a", 30, builds)  # a is now the most recently used
+    cached(cache, 1, "d", 30, builds)  # 120 bytes, b goes
+    assert cache.stats()["bytes"] == 90 and cache.evictions == 1
+    builds.clear()
+    for key in ("a", "c", "d", "b"):
+        cached(cache, 1, key, 30, builds)
+    assert builds == ["b"]
+    # a body above max_entry_bytes is returned but never cached
+    assert len(cached(cache, 1, "large", 50, builds)) == 50
+    cached(cache, 1, "large", 50, builds)
+    assert builds == ["b", "large", "large"] and cache.size <= cache.max_bytes
+
+
+def test_a_new_data_version_invalidates_every_entry():
+    cache, builds = ResponseCache(max_bytes=100), []
+    cached(cache, 1, "a", 10, builds)
+    cached(cache, 2, "a", 10, builds)
+    assert builds == ["a", "a"] and cache.invalidations == 1 and cache.stats()["entries"] == 1
+    # a body built while the data changed is not cached under the newer version
+    cache.get_or_build(3, lambda: cached(cache, 4, "b", 10, builds), "c")
+    cached(cache, 4, "c", 10, builds)
+    assert builds == ["a", "a", "b", "c"]
+    cache.clear()
+    assert cache.stats()["entries"] == 0 and cache.size == 0
@@ -0,0 +1,84 @@
+#the selection scan against scores computed SNP by SNP
+import numpy as np
+import pandas as pd
+import pytest
+from selection_scan import SelectionScan, percentile_ranks, check_scan
+
+
+@pytest.fixture(scope="module")
+def df():
+    rng = np.random.default_rng(7)
+    n = 300
+    frame = pd.DataFrame({
+        "snp_id": [f"rs{i}" for i in range(n)],
+        "chromosome": rng.choice(["1", "2", "X"], n),
+        "position": rng.integers(1, 1_000_000, n),
+        # few distinct values, so many scores tie at the top-k boundary
+        "fst_beb": rng.integers(0, 5, n) / 10,
+        "fst_pjl": rng.random(n),
+        "delta_af": rng.random(n),
+        "daf_beb": rng.random(n),
+        "daf_pjl": rng.random(n),
+        "p_value": 10.0 ** -rng.uniform(0, 12, n),
+        "t2dkp_p_value": rng.random(n),
+        "beta": rng.normal(0, 1, n),
+    }).astype({"fst_pjl": object, "position": float})
+    frame.loc[::17, "fst_pjl"] = "-"
+    frame.loc[::23, "delta_af"] = np.nan
+    frame.loc[5, "position"] = np.nan
+    return frame
+
+
+def expected_scores(df, statistics, weights, method):
+    normalised = []
+    for name in statistics:
+        values = pd.to_numeric(df[name], errors="coerce").to_numpy(dtype=float)
+        if name == "p_value":
+            values = -np.log10(values)
+        elif name == "beta":
+            values = np.abs(values)
+        if method == "rank":
+            normalised.append(percentile_ranks(values))
+        else:
+            present = values[~np.isnan(values)]
+            normalised.append((values - present.mean()) / present.std())
+    return sum(w * column for w, column in zip(weights, normalised)) / sum(weights)
+
+
+@pytest.mark.parametrize("method", ["rank", "z"])
+@pytest.mark.parametrize("statistics, weights", [(["fst_beb"], None), (["fst_pjl", "delta_af", "p_value", "beta"], [2, 1, 0.5, 0])])
+@pytest.mark.parametrize("k", [1, 10, 37, 1000])
+def test_scan_returns_the_best_k_in_order(df, method, statistics, weights, k):
+    scan = SelectionScan(df)
+    expected = expected_scores(df, statistics, weights or [1] * len(statistics), method)
+    rows, scored = scan.scan(statistics, weights, method, k=k)
+    assert scored == int((~np.isnan(expected)).sum())
+    assert len(rows) == min(k, scored)
+    scores = [row["score"] for row in rows]
+    # ties at the boundary may pick either SNP, the scores are those of the best k all the same
+    np.testing.assert_allclose(scores, np.sort(expected[~np.isnan(expected)])[::-1][:len(rows)])
+    for row in rows:
+        i = int(row["snp_id"][2:])
+        assert np.isclose(row["score"], expected[i])
+        assert row["position"] is None if i == 5 else row["position"] == int(df.loc[i, "position"])
+
+
+def test_scan_bounds_use_the_raw_values(df):
+    scan = SelectionScan(df)
+    rows, scored = scan.scan(["delta_af", "p_value"], bounds={"p_value": (None, 5e-8), "delta_af": (0.2, 0.9)}, k=1000)
+    values = df.assign(delta_af=pd.to_numeric(df["delta_af"]))
+    inside = values[(values["p_value"] <= 5e-8) & values["delta_af"].between(0.2, 0.9)]
+    assert scored == len(inside) and sorted(row["snp_id"] for row in rows) == sorted(inside["snp_id"])
+    # a bound on a statistic that is not scored still filters
+    rows, scored = scan.scan(["fst_beb"], bounds={"delta_af": (0.5, None)}, k=1000)
+    assert scored == int((values["delta_af"] >= 0.5).sum())
+    assert sorted(row["snp_id"] for row in rows) == sorted(values.loc[values["delta_af"] >= 0.5, "snp_id"])
+    assert scan.scan(["fst_beb"], k=0) == ([], len(df))
+
+
+def test_invalid_scans_are_rejected():
+    for arguments in ([[]], [["unknown"]], [["fst_beb"], None, "median"], [["fst_beb"], [1, 2]],
+                      [["fst_beb"], [-1]], [["fst_beb"], [0]], [["fst_beb"], None, "rank", {"unknown": (0, 1)}]):
+        with pytest.raises(ValueError):
+            check_scan(*arguments)
+    np.testing.assert_array_equal(check_scan(["fst_beb", "beta"]), [1.0, 1.0])
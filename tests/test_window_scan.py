@@ -0,0 +1,89 @@
+#window scans of the column store and the significance of their delta_af means
+import argparse
+import os
+import sqlite3
+import numpy as np
+import pandas as pd
+import pytest
+from column_store import open_column_store
+from window_scan import check_window_scan, scan_windows, window_significance, parse_window, window_ranges, sliding_max
+from resampling import add_resampling_arguments, check_resampling_arguments
+from chunked import add_chunksize_argument
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "instance", "data_sql_fst.xlsx")
+
+
+@pytest.fixture(scope="module")
+def store(tmp_path_factory):
+    db_path = str(tmp_path_factory.mktemp("instance") / "genetics.db")
+    conn = sqlite3.connect(db_path)
+    pd.read_excel(DATA, sheet_name="snp").to_sql("snp", conn, index=False)
+    conn.close()
+    return open_column_store(db_path)
+
+
+def test_empty_chromosome_list_scans_nothing(store):
+    assert len(scan_windows(store, ["delta_af"], 1_000_000, 500_000, chromosomes=[])["n_snps"]) == 0
+    assert len(scan_windows(store, ["delta_af"], 1_000_000, 500_000)["n_snps"]) > 0
+    with pytest.raises(ValueError):
+        check_window_scan(store, ["unknown"], 1_000_000, 500_000)
+    assert parse_window("100kb") == (100_000, 50_000)
+    assert parse_window("20", "5", mode="snps") == (20, 5)
+
+
+@pytest.mark.parametrize("mode, size, step", [("bp", 10_000_000, 5_000_000), ("snps", 5, 2)])
+def test_window_significance_follows_the_scan(store, mode, size, step):
+    windows = scan_windows(store, ["delta_af"], size, step, mode)
+    significance = window_significance(store, size, step, mode, permutations=50, bootstrap=50, seed=1, workers=1)
+    assert set(significance) == {"delta_af_empirical_p", "delta_af_ci_low", "delta_af_ci_high"}
+    for values in significance.values():
+        assert len(values) == len(windows["n_snps"])
+    pvalues = significance["delta_af_empirical_p"]
+    assert np.nanmin(pvalues) >= 1 / 51 and np.nanmax(pvalues) <= 1
+    assert (significance["delta_af_ci_low"] <= significance["delta_af_ci_high"] + 1e-12).all()
+    again = window_significance(store, size, step, mode, permutations=50, seed=1, workers=1)
+    np.testing.assert_array_equal(again["delta_af_empirical_p"], pvalues)
+
+
+def test_window_significance_of_one_chromosome(store):
+    one = window_significance(store, 10_000_000, 5_000_000, chromosomes=["12"], permutations=20, seed=3, workers=1)
+    windows = scan_windows(store, ["delta_af"], 10_000_000, 5_000_000, chromosomes=["12"])
+    assert len(one["delta_af_empirical_p"]) == len(windows["n_snps"])
+    assert len(window_significance(store, 10_000_000, 5_000_000, chromosomes=[], permutations=20)["delta_af_empirical_p"]) == 0
+
+
+def test_chunksize_is_rejected_with_resampling():
+    parser = argparse.ArgumentParser()
+    add_chunksize_argument(parser)
+    add_resampling_arguments(parser)
+    for options in (["--chunksize", "10", "--permutations", "5"], ["--chunksize", "10", "--bootstrap", "5"]):
+        with pytest.raises(SystemExit):
+            check_resampling_arguments(parser, parser.parse_args(options))
+    check_resampling_arguments(parser, parser.parse_args(["--chunksize", "10"]))
+    check_resampling_arguments(parser, parser.parse_args(["--permutations", "5"]))
+
+
+def test_windows_larger_than_the_step_reach_back_over_the_first_snp():
+    positions = np.array([950_000, 1_020_000, 2_500_000], dtype=np.int64)
+    lo, hi, start, end = window_ranges(positions, 1_000_000, 100_000)
+    # every window start that is a multiple of the step and overlaps the first SNP is kept
+    assert list(start[:10]) == list(range(0, 1_000_000, 100_000))
+    for window in range(len(lo)):
+        inside = (positions >= start[window]) & (positions <= end[window])
+        assert inside.sum() == hi[window] - lo[window] and inside[lo[window]:hi[window]].all()
+    assert start[-1] == 2_500_000 and hi[-1] - lo[-1] == 1
+    lo, hi, start, end = window_ranges(positions, 100_000, 100_000)
+    assert list(start) == [900_000, 1_000_000, 2_500_000]
+
+
+@pytest.mark.parametrize("mode, size, step", [("bp", 300, 70), ("bp", 50, 200), ("snps", 7, 3), ("snps", 1, 1)])
+def test_sliding_max_matches_every_window(mode, size, step):
+    rng = np.random.default_rng(5)
+    positions = np.sort(rng.choice(5_000, 400, replace=False)).astype(np.int64)
+    values = rng.random(400)
+    values[rng.random(400) < 0.3] = np.nan
+    values[100:140] = np.nan
+    lo, hi, _, _ = window_ranges(positions, size, step, mode)
+    expected = [np.nan if np.isnan(values[a:b]).all() else np.nanmax(values[a:b]) for a, b in zip(lo, hi)]
+    np.testing.assert_array_equal(sliding_max(values, lo, hi), expected)
+    assert len(sliding_max(values, lo[:0], hi[:0])) == 0